@@ -0,0 +1,10 @@
+# NOTE: The import has a _ not - in the module name.
+from pigpio_dht import DHTBus, DHT11, DHT22
+
+bus = DHTBus()
+
+bus.add(DHT11, 20) # BCM Numbering
+bus.add(DHT22, 21)
+
+results = bus.sweep()
+print(results)
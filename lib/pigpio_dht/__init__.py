@@ -1,3 +1,11 @@
 from .dhtxx import DHTXX
 from .dht11 import DHT11
 from .dht22 import DHT22
+from .bus import DHTBus
+from .aio import AsyncDHT
+from .poller import Poller
+from .reading import Reading, ReadingHistory
+from .sampler import Sampler
+from .estimator import Estimator
+from .timeseries import TimeSeriesLog
+from .metrics import REGISTRY as METRICS
@@ -0,0 +1,273 @@
+import asyncio
+from .sampler import Sampler
+from .stats import RollingStats
+
+"""
+asyncio interface to a DHT sensor
+"""
+class AsyncDHT:
+
+    def __init__(self, sensor):
+        """
+        AsyncDHT Constructor.
+        Wraps a DHT11, DHT22 or other DHTXX instance so it can be read from an asyncio event loop
+        without blocking it. The start pulse, sensor response and read throttling are all awaited.
+
+        :param sensor: the sensor to read
+        :type sensor: DHTXX
+        """
+        self.sensor = sensor
+
+
+    async def read(self, retries=0):
+        """
+        One-shot sensor read. Same as DHTXX.read() but awaitable.
+
+        :param retries: number of times to retry when checksum validation fails
+        :type retries: integer
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        :raises TimeoutError: If the sensor on gpio does not respond
+        """
+        retries = abs(retries) + 1
+
+        for i in range(retries):
+            result = await self._read()
+
+            if result['valid'] == True:
+                break
+
+        return result
+
+
+    async def read_filtered(self, retries=0):
+        """
+        One-shot sensor read smoothed by the sensor's running estimate. Same as DHTXX.read_filtered() but awaitable.
+
+        :param retries: number of times to retry when checksum validation fails
+        :type retries: integer
+        :return: the estimate, like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}. See DHTXX.read_filtered().
+        :rtype: Dictionary
+        :raises TimeoutError: If the sensor on gpio does not respond
+        """
+        retries = abs(retries) + 1
+
+        for i in range(retries):
+            reading = await self._read(raw=True)
+
+            if reading.valid:
+                break
+
+        return self.sensor._filter(reading)
+
+
+    async def sample(self, samples=5, max_retries=None, sampler=None):
+        """
+        Sample sensor and return normalised data. Same as DHTXX.sample() but awaitable.
+
+        :param samples: number of samples to take. Ignored when sampler is given.
+        :type samples: integer
+        :param max_retries: maximum retries per sample before raising exception. Default 2 * samples
+        :type max_retries: integer
+        :param sampler: stop as soon as the readings converge (see Sampler)
+        :type sampler: Sampler
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        :raises TimeoutError: If the sensor on gpio does not respond, or max_retries is reached
+        """
+        fixed = sampler is None
+        if fixed:
+            samples = max(2, samples)
+            sampler = Sampler(tolerance=None, min_samples=samples, max_samples=samples)
+
+        samples = sampler.max_samples
+
+        if max_retries is None:
+            max_retries = samples * 2
+
+        retries = 0
+        temperatures = []
+        humidities = []
+        initial_result = None
+
+        while not sampler.done(temperatures, humidities):
+            result = await self.read(retries=0)
+
+            if (len(temperatures) == 0):
+                initial_result = result
+
+            if result['valid']:
+                temperatures.append(result['temp_c'])
+                humidities.append(result['humidity'])
+            else:
+                retries += 1
+
+            if retries >= max_retries:
+                raise TimeoutError("Maximum retries of {} reached.".format(max_retries))
+
+        if fixed:
+            return self.sensor._summarise(temperatures, humidities, initial_result)
+
+        return sampler.result(temperatures, humidities)
+
+
+    def stream(self, window=5, retries=0):
+        """
+        Continuously read the sensor, as fast as its max_read_rate_secs allows, yielding one smoothed result per valid read.
+        Same as DHTXX.stream() but asynchronous. Invalid reads are skipped.
+        Use as: async for result in AsyncDHT(sensor).stream(): ...
+
+        :param window: number of recent reads to smooth over
+        :type window: integer
+        :param retries: number of times to retry each read when checksum validation fails
+        :type retries: integer
+        :return: asynchronous iterator of sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: AsyncIterator
+        :raises TimeoutError: If the sensor on gpio does not respond
+        """
+        return _ReadStream(self, window, retries)
+
+
+    async def _read(self, raw=False):
+        """
+        One-Shot read implementation. Mirrors DHTXX._read() with the waits awaited: a read already in progress,
+        from this or another thread, is joined, and the sensor (and GPIO, with shared set) is held for the read.
+        :param raw: return a Reading rather than a dictionary
+        :type raw: boolean
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        """
+        sensor = self.sensor
+        loop = asyncio.get_event_loop()
+        flight, leading = sensor._join_flight()
+
+        if not leading:
+            joined = loop.create_future()
+            flight.add_done_callback(lambda flight: _resolve_threadsafe(loop, joined))
+            await joined
+            reading = flight.wait(0)
+            return reading if raw else reading.as_dict()
+
+        try:
+            reading = await self._read_exclusive(loop)
+        except asyncio.CancelledError:
+            sensor._end_flight(flight, error=TimeoutError("The read being joined was cancelled."))
+            raise
+        except BaseException as e:
+            sensor._end_flight(flight, error=e)
+            raise
+
+        sensor._end_flight(flight, reading)
+        return reading if raw else reading.as_dict()
+
+
+    async def _read_exclusive(self, loop):
+        """
+        _read() for the caller leading a read.
+        :rtype: Reading
+        """
+        sensor = self.sensor
+
+        # Wait for other threads and processes in a worker thread so the event loop is not blocked.
+        await _acquire(loop, sensor._read_lock.acquire, sensor._read_lock.release, try_acquire=lambda: sensor._read_lock.acquire(False))
+        try:
+            if sensor.shared is None:
+                return await self._capture(loop)
+
+            await _acquire(loop, sensor.shared.acquire, sensor.shared.release)
+            try:
+                return await self._capture(loop)
+            finally:
+                sensor.shared.release()
+        finally:
+            sensor._read_lock.release()
+
+
+    async def _capture(self, loop):
+        """
+        _read() once the sensor and any shared GPIO lock are held. The same steps as DHTXX._read_locked().
+        :rtype: Reading
+        """
+        sensor = self.sensor
+
+        pause_secs = sensor._prepare_read()
+        if pause_secs > 0:
+            await asyncio.sleep(pause_secs)
+
+        frame_done = loop.create_future()
+
+        def on_frame_done():
+            # Called from the pigpio callback thread.
+            _resolve_threadsafe(loop, frame_done)
+
+        capture, pulse_secs = sensor._begin_read(on_done=on_frame_done)
+
+        try:
+            try:
+                if pulse_secs > 0:
+                    await asyncio.sleep(pulse_secs)
+            finally:
+                release_secs = sensor._release_pulse(capture) # Even if cancelled, so the line is not left held low.
+
+            await asyncio.wait_for(frame_done, release_secs + sensor.timeout_secs)
+        except asyncio.TimeoutError:
+            pass # _end_capture() raises the appropriate TimeoutError.
+        except asyncio.CancelledError:
+            sensor._stop_capture(capture)
+            raise
+
+        return sensor._end_capture(capture, raw=True)
+
+
+class _ReadStream:
+    """
+    Asynchronous iterator returned by AsyncDHT.stream()
+    """
+
+    def __init__(self, dht, window, retries):
+        self._dht = dht
+        self._retries = retries
+        self._temperatures = RollingStats(window)
+        self._humidities = RollingStats(window)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            result = await self._dht.read(retries=self._retries)
+
+            if result['valid']:
+                return self._dht.sensor._smooth(self._temperatures, self._humidities, result)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _resolve_threadsafe(loop, future):
+    try:
+        loop.call_soon_threadsafe(_resolve, future)
+    except RuntimeError:
+        pass # The loop has closed, no one is waiting.
+
+
+async def _acquire(loop, acquire, release, try_acquire=None):
+    """
+    Await acquire() run in a worker thread. If the wait is cancelled the lock is released as soon as the worker gets it.
+    :param try_acquire: fn() that takes the lock only if it is free, to skip the worker thread when uncontended
+    """
+    if try_acquire is not None and try_acquire():
+        return
+
+    def release_once_acquired(future):
+        if not future.cancelled() and future.exception() is None:
+            release()
+
+    acquired = loop.run_in_executor(None, acquire)
+    try:
+        await asyncio.shield(acquired)
+    except asyncio.CancelledError:
+        acquired.add_done_callback(release_once_acquired)
+        raise
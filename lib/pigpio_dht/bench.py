@@ -0,0 +1,279 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+from collections import namedtuple
+from datetime import datetime
+from . import decoder
+from . import metrics
+from .bus import DHTBus
+from .capture import Capture
+from .dht22 import DHT22
+from .simulator import FakePi, encode, frame_edges
+from .trigger import ScriptTrigger
+
+"""
+Benchmarks for the hot paths, run against simulated sensors so no Pi is needed.
+
+Every result is simulator-only. They time the library's own code against FakePi, to catch regressions between
+versions. They are not the latency of a real sensor or pigpiod. In particular, read_triggered_ms runs FakePi's
+stand-in for a pigpiod script, so it says nothing about ScriptTrigger on real hardware.
+
+    python -m pigpio_dht.bench --output bench.json
+    python -m pigpio_dht.bench --baseline bench.json --threshold 0.2 --threshold-for sweep_256_ms=0.5
+
+Results are written as JSON. With --baseline, results more than their threshold worse than the baseline are
+reported as regressions and the exit status is 1.
+"""
+
+LOWER = 'lower' # Smaller values are better, eg. times.
+HIGHER = 'higher' # Larger values are better, eg. rates.
+
+GPIO = 21
+DEFAULT_THRESHOLD = 0.25 # Fraction a result may be worse than its baseline before it is a regression.
+
+Result = namedtuple('Result', 'name value unit better')
+
+
+def synthetic_frame(temp_c=21.5, humidity=45.0):
+    """
+    Edge train of one DHT22 frame, start pulse included, as delivered to a pigpio callback.
+
+    :return: (ticks, levels) lists of decoder.EDGES_PER_FRAME edges
+    :rtype: tuple
+    """
+    bits = [(byte >> (7 - i)) & 1 for byte in encode(temp_c, humidity) for i in range(8)]
+    released = 18000 # The start pulse, from tick 0.
+    edges = [(0, 0), (1, released)] + frame_edges(bits, released)
+    return [tick for level, tick in edges], [level for level, tick in edges]
+
+
+def bench_edge_callback(repeat=5, number=2000):
+    """
+    Cost of the per-edge callback, the code run by the pigpio callback thread for every edge of a frame.
+    Includes creating the frame's Capture, spread over its edges.
+    """
+    ticks, levels = synthetic_frame()
+    edges = list(zip(levels, ticks))
+
+    def frame():
+        capture = Capture(GPIO)
+        edge = capture.edge
+        for level, tick in edges:
+            edge(GPIO, level, tick)
+
+    secs = min(timeit.Timer(frame).repeat(repeat, number)) / number
+    return [Result('edge_callback_ns', secs / len(edges) * 1e9, 'ns/edge', LOWER)]
+
+
+def bench_parse_data(repeat=5, number=5000):
+    """
+    Frames per second through DHTXX._parse_data(), from 40 bits to a result dictionary.
+    """
+    pi = FakePi()
+    sensor = DHT22(GPIO, pi=pi)
+    ticks, levels = synthetic_frame()
+    sensor.data = decoder.edges_to_bits(ticks, levels)
+
+    try:
+        secs = min(timeit.Timer(sensor._parse_data).repeat(repeat, number))
+    finally:
+        _discard([sensor])
+
+    return [Result('parse_data_fps', number / secs, 'frames/s', HIGHER)]
+
+
+def bench_read(repeat=5, number=10):
+    """
+    read() latency against a FakePi: with the 18ms start pulse timed in Python, and with a ScriptTrigger. Simulator-only,
+    the FakePi answers instantly and runs the trigger's script itself, so neither reflects a real sensor or pigpiod.
+    """
+    pi = FakePi(seed=1)
+    pi.add_sensor(GPIO)
+    sensor = DHT22(GPIO, pi=pi, max_read_rate_secs=0)
+    results = []
+
+    try:
+        results.append(Result('read_ms', _median_secs(sensor.read, repeat, number) * 1000, 'ms', LOWER))
+        sensor.trigger = ScriptTrigger(pi)
+        results.append(Result('read_triggered_ms', _median_secs(sensor.read, repeat, number) * 1000, 'ms', LOWER))
+    finally:
+        _discard([sensor])
+
+    return results
+
+
+def bench_sample(repeat=5, number=1, samples=5):
+    """
+    Wall time of sample() against a FakePi, without the read rate limit.
+    """
+    pi = FakePi(seed=1)
+    pi.add_sensor(GPIO)
+    sensor = DHT22(GPIO, pi=pi, max_read_rate_secs=0)
+
+    try:
+        secs = _median_secs(lambda: sensor.sample(samples=samples), repeat, number)
+    finally:
+        _discard([sensor])
+
+    return [Result('sample_secs', secs, 's', LOWER)]
+
+
+def bench_sweep(repeat=5, number=1, max_sensors=256):
+    """
+    DHTBus.sweep() time for 1, 2, 4 ... max_sensors sensors on one FakePi.
+    """
+    results = []
+    count = 1
+
+    while count <= max_sensors:
+        pi = FakePi(seed=1)
+        bus = DHTBus(pi=pi)
+        for gpio in range(count):
+            pi.add_sensor(gpio)
+            bus.add(DHT22, gpio, max_read_rate_secs=0)
+
+        try:
+            secs = _median_secs(bus.sweep, repeat, number)
+        finally:
+            bus.close()
+            _discard(bus.sensors.values())
+
+        results.append(Result('sweep_{}_ms'.format(count), secs * 1000, 'ms', LOWER))
+        count *= 2
+
+    return results
+
+
+BENCHMARKS = {'edge_callback': bench_edge_callback,
+              'parse_data': bench_parse_data,
+              'read': bench_read,
+              'sample': bench_sample,
+              'sweep': bench_sweep}
+
+
+def run(names=None, repeat=5, max_sensors=256):
+    """
+    Run benchmarks.
+
+    :param names: names from BENCHMARKS to run. Default all.
+    :type names: list
+    :return: results keyed by result name, like {'read_ms': {'value': 18.4, 'unit': 'ms', 'better': 'lower'}}
+    :rtype: Dictionary
+    """
+    results = {}
+
+    for name in names or BENCHMARKS:
+        if name == 'sweep':
+            found = bench_sweep(repeat, max_sensors=max_sensors)
+        else:
+            found = BENCHMARKS[name](repeat)
+
+        for result in found:
+            results[result.name] = {'value': result.value, 'unit': result.unit, 'better': result.better}
+
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, thresholds=None):
+    """
+    Find results that are worse than their baseline by more than their threshold.
+    Results missing from the baseline are not compared.
+
+    :param results: as returned by run()
+    :param baseline: an earlier run(), or the 'results' of an earlier output file
+    :param threshold: fraction a result may be worse than its baseline, eg. 0.25 for 25%
+    :type threshold: float
+    :param thresholds: threshold overrides keyed by result name
+    :type thresholds: Dictionary
+    :return: regressions like {'name': 'read_ms', 'value': 25.0, 'baseline': 18.4, 'change': 0.36, 'threshold': 0.25}
+    :rtype: list
+    """
+    thresholds = thresholds or {}
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        if name not in baseline or not baseline[name]['value']:
+            continue
+
+        base = baseline[name]['value']
+        change = (result['value'] - base) / base
+        if result['better'] == HIGHER:
+            change = -change
+
+        allowed = thresholds.get(name, threshold)
+        if change > allowed:
+            regressions.append({'name': name, 'value': result['value'], 'baseline': base, 'change': change, 'threshold': allowed})
+
+    return regressions
+
+
+def main(argv=None):
+    """
+    Console entry point. See the module documentation.
+
+    :param argv: command line arguments. Default sys.argv[1:]
+    :return: regressions found, see compare()
+    :rtype: list
+    """
+    parser = argparse.ArgumentParser(prog='python -m pigpio_dht.bench', description="Benchmark pigpio-dht against simulated sensors. Results are simulator-only, for comparing versions, not real hardware.")
+    parser.add_argument('--only', metavar='NAME', action='append', choices=sorted(BENCHMARKS), help="run only this benchmark. May be repeated")
+    parser.add_argument('--repeat', type=int, default=5, help="timing runs per benchmark (default 5)")
+    parser.add_argument('--max-sensors', type=int, default=256, help="largest bus swept (default 256)")
+    parser.add_argument('--output', metavar='PATH', help="write JSON results to PATH instead of stdout")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON results of an earlier run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction a result may be worse than the baseline (default {})".format(DEFAULT_THRESHOLD))
+    parser.add_argument('--threshold-for', metavar='NAME=FRACTION', action='append', default=[], help="threshold for one result. May be repeated")
+    args = parser.parse_args(argv)
+
+    thresholds = {}
+    for override in args.threshold_for:
+        name, sep, fraction = override.partition('=')
+        try:
+            thresholds[name] = float(fraction)
+        except ValueError:
+            parser.error("expected NAME=FRACTION, not {}".format(override))
+
+    output = {'time': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(),
+              'machine': platform.machine(),
+              'simulated': True, # Against FakePi, see the module documentation.
+              'results': run(args.only, args.repeat, args.max_sensors)}
+    regressions = []
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(output['results'], baseline.get('results', baseline), args.threshold, thresholds)
+        output['regressions'] = regressions
+
+    text = json.dumps(output, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    for regression in regressions:
+        print("REGRESSION {name}: {value:.4g} vs baseline {baseline:.4g} ({change:+.0%}, threshold {threshold:.0%})".format(**regression), file=sys.stderr)
+
+    return regressions
+
+
+def _median_secs(fn, repeat, number):
+    return statistics.median(timeit.Timer(fn).repeat(repeat, number)) / number
+
+
+def _discard(sensors):
+    """
+    Drop benchmark sensors from the process-wide metrics.
+    """
+    for sensor in sensors:
+        metrics.REGISTRY.unregister(sensor.metrics)
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
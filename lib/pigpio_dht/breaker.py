@@ -0,0 +1,117 @@
+from threading import Lock
+from time import monotonic
+
+"""
+Process-wide, per-GPIO circuit breaking for sensors that stop responding
+"""
+class CircuitBreaker:
+
+    CLOSED = 'closed' # Sensor is read normally.
+    OPEN = 'open' # Sensor is skipped until the backoff has passed.
+    HALF_OPEN = 'half_open' # One probe read is in progress.
+
+    _by_key = {} # Shared instances, see for_gpio().
+    _by_key_lock = Lock()
+
+    def __init__(self, failure_threshold=3, backoff_secs=5, max_backoff_secs=300):
+        """
+        CircuitBreaker Constructor.
+        Opens after failure_threshold reads in a row get no response from the sensor. While open, reads fail straight away
+        instead of waiting for a sensor that is not there. Once the backoff has passed a single probe read is allowed:
+        a response closes the breaker again, silence re-opens it with twice the backoff, up to max_backoff_secs.
+        Use for_gpio() rather than constructing directly so that every sensor object on a GPIO shares one breaker.
+
+        :param failure_threshold: consecutive non-responses that open the breaker
+        :type failure_threshold: integer
+        :param backoff_secs: time the breaker first stays open
+        :type backoff_secs: float
+        :param max_backoff_secs: longest time the breaker stays open
+        :type max_backoff_secs: float
+        """
+        self.failure_threshold = failure_threshold
+        self.backoff_secs = backoff_secs
+        self.max_backoff_secs = max_backoff_secs
+        self._lock = Lock()
+        self.reset()
+
+
+    @classmethod
+    def for_gpio(cls, gpio, pi=None):
+        """
+        The process-wide CircuitBreaker for gpio on the Pi that pi is connected to.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param pi: pigpio.pi() instance. GPIOs on different pigpiod hosts are tracked separately.
+        :type pi: pigpio
+        :rtype: CircuitBreaker
+        """
+        key = (getattr(pi, '_host', None), getattr(pi, '_port', None), gpio)
+
+        with cls._by_key_lock:
+            if key not in cls._by_key:
+                cls._by_key[key] = cls()
+            return cls._by_key[key]
+
+
+    def reset(self):
+        with self._lock:
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0 # Consecutive non-responses.
+            self.opened = 0 # Times opened in a row, sets the backoff.
+            self._retry_at = None # monotonic() from which the next probe is allowed, while not closed.
+
+
+    def allow(self):
+        """
+        Ask to read the sensor. Moves an open breaker whose backoff has passed to half open.
+
+        :return: True if the sensor may be read now
+        :rtype: boolean
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+
+            if monotonic() >= self._retry_at:
+                # Backoff passed, or a probe never reported back (eg. it raised) within a backoff.
+                self.state = CircuitBreaker.HALF_OPEN
+                self._retry_at = monotonic() + self.backoff_secs
+                return True
+
+            return False # Still backing off, or another caller is probing.
+
+
+    def wait_secs(self):
+        """
+        :return: seconds until allow() will next return True, 0 if it will now
+        :rtype: float
+        """
+        with self._lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return 0.0
+            return max(0.0, self._retry_at - monotonic())
+
+
+    def record(self, responded):
+        """
+        Record the outcome of an allowed read.
+
+        :param responded: True if the sensor responded, even if its data was then invalid
+        :type responded: boolean
+        """
+        with self._lock:
+            if responded:
+                self.state = CircuitBreaker.CLOSED
+                self.failures = 0
+                self.opened = 0
+                self._retry_at = None
+                return
+
+            self.failures += 1
+
+            if self.state == CircuitBreaker.HALF_OPEN or self.failures >= self.failure_threshold:
+                backoff_secs = min(self.max_backoff_secs, self.backoff_secs * 2 ** self.opened)
+                self.state = CircuitBreaker.OPEN
+                self.opened += 1
+                self._retry_at = monotonic() + backoff_secs
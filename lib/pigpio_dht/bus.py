@@ -0,0 +1,241 @@
+import pigpio
+from time import sleep, monotonic
+from .dhtxx import DHTXX
+from . import tracing
+from .notify import NotifyCapture
+from . import connection
+
+"""
+Read many DHT sensors concurrently over one pigpio connection
+"""
+class DHTBus:
+
+    CAPTURE_CALLBACK = 'callback'
+    CAPTURE_NOTIFY = 'notify'
+
+    def __init__(self, pi=None, capture=CAPTURE_CALLBACK):
+        """
+        DHTBus Constructor.
+
+        :param pi: Custom instance of pigpio.pi(). If None the bus shares a pooled connection to the local pigpiod (see connection.POOL).
+        :type pi: pigpio
+        :param capture: how edges are captured. DHTBus.CAPTURE_CALLBACK uses a pigpio callback per sensor,
+                        DHTBus.CAPTURE_NOTIFY reads all sensors in bulk from one notification pipe (local pigpiod only).
+        :type capture: string
+        """
+        assert(capture in (DHTBus.CAPTURE_CALLBACK, DHTBus.CAPTURE_NOTIFY))
+
+        self.capture = capture
+        self._notify = None
+        if pi != None:
+            self._pi = pi
+            self._owns_pi = False
+        else:
+            self._pi = connection.POOL.acquire()
+            self._owns_pi = True
+
+        self.sensors = {} # Keyed by gpio.
+        self.trigger = None # Optional ScriptTrigger that pulses every sensor from one pigpiod script.
+
+
+    @property
+    def pi(self):
+        """
+        The pigpio.pi() instance shared by all sensors on the bus.
+        """
+        return self._pi
+
+
+    def add(self, sensor_class, gpio, **kwargs):
+        """
+        Create a sensor on the bus.
+
+        :param sensor_class: DHT11, DHT22 or another DHTXX subclass
+        :type sensor_class: class
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param kwargs: additional constructor arguments for sensor_class
+        :return: the new sensor
+        :rtype: DHTXX
+        """
+        if gpio in self.sensors:
+            raise ValueError("GPIO {} is already on the bus.".format(gpio))
+
+        sensor = sensor_class(gpio, pi=self._pi, **kwargs)
+        self.sensors[gpio] = sensor
+        self._close_notify() # gpios changed.
+        return sensor
+
+
+    def remove(self, gpio):
+        """
+        Remove the sensor on gpio from the bus.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        """
+        del self.sensors[gpio]
+        self._close_notify() # gpios changed.
+
+
+    def sweep(self):
+        """
+        Read every sensor on the bus once.
+        The start pulses for all sensors are sent together and their responses are captured concurrently,
+        so the time taken by a sweep is about the same as a single read() regardless of the number of sensors.
+        sweep() will pause if any sensor would otherwise be read more than once per its max_read_rate_secs.
+        Sensors whose circuit breaker is open (see CircuitBreaker) are skipped until they are due a probe.
+
+        :return: Dictionary keyed by gpio. Values are sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True},
+                 or the TimeoutError raised for a sensor that did not respond.
+        :rtype: Dictionary
+        """
+        sensors = list(self.sensors.values())
+        results = {}
+
+        if not sensors:
+            return results
+
+        locked = list(sensors)
+        for sensor in locked:
+            sensor._read_lock.acquire()
+
+        # Always take shared GPIO locks in the same order, so sweeps in two processes cannot deadlock.
+        shared = sorted((sensor.shared for sensor in sensors if sensor.shared is not None), key=lambda state: state.path)
+        for state in shared:
+            state.acquire()
+
+        try:
+            for sensor in list(sensors):
+                try:
+                    sensor._check_breaker()
+                except TimeoutError as e:
+                    results[sensor.gpio] = e
+                    sensors.remove(sensor)
+
+            if not sensors:
+                return results
+
+            # Honour the slowest sensor's read rate with a single pause rather than one per sensor.
+            pause_secs = max(sensor._throttle_secs() for sensor in sensors)
+            if pause_secs > 0:
+                tracing.message("Bus pausing for secs", pause_secs)
+                for sensor in sensors:
+                    sensor.metrics.record_throttle(pause_secs)
+                sleep(pause_secs)
+
+            if self.capture == DHTBus.CAPTURE_NOTIFY:
+                captures = self._sweep_notify(sensors)
+            else:
+                captures = self._sweep_callback(sensors)
+
+            for sensor, capture in zip(sensors, captures):
+                try:
+                    results[sensor.gpio] = sensor._end_capture(capture)
+                except TimeoutError as e:
+                    results[sensor.gpio] = e
+        finally:
+            for state in shared:
+                state.release()
+            for sensor in locked:
+                sensor._read_lock.release()
+
+        return results
+
+
+    def _sweep_callback(self, sensors):
+        """
+        Capture edges with a pigpio callback per sensor.
+        :return: a Capture for each of sensors
+        :rtype: list
+        """
+        captures = [sensor._begin_capture() for sensor in sensors]
+
+        released = self._start_pulse(sensors, captures)
+
+        for sensor, capture in zip(sensors, captures):
+            capture.done.wait(max(0, released + sensor.timeout_secs - monotonic()))
+
+        return captures
+
+
+    def _sweep_notify(self, sensors):
+        """
+        Capture edges for all sensors from one notification pipe and decode each frame in one pass.
+        :return: a Capture for each of sensors
+        :rtype: list
+        """
+        if self._notify is None:
+            self._notify = NotifyCapture(self._pi, [sensor.gpio for sensor in sensors])
+
+        captures = [sensor._reset_capture() for sensor in sensors]
+
+        self._notify.drain()
+        released = self._start_pulse(sensors, captures)
+        timeout_secs = max(0, released + max(sensor.timeout_secs for sensor in sensors) - monotonic())
+
+        edges = self._notify.capture(timeout_secs, DHTXX.SUCCESS_EDGE_COUNT)
+
+        for sensor, capture in zip(sensors, captures):
+            ticks, levels = edges[sensor.gpio]
+            capture.load_edges(ticks, levels)
+
+        return captures
+
+
+    def _start_pulse(self, sensors, captures):
+        """
+        Send the start pulse to all sensors together.
+        :return: monotonic() time when the sensors were released to respond
+        :rtype: float
+        """
+        if self.trigger is not None:
+            release_at = self.trigger.fire([sensor.gpio for sensor in sensors])
+            for sensor, capture in zip(sensors, captures):
+                sensor._arm_watchdog(capture, self.trigger.PULSE_MILLIS)
+            return release_at
+
+        for sensor in sensors:
+            self._pi.set_mode(sensor.gpio, pigpio.OUTPUT)
+            self._pi.write(sensor.gpio, pigpio.LOW)
+
+        sleep(0.018)  # 18ms pause as per datasheet
+
+        for sensor in sensors:
+            self._pi.set_mode(sensor.gpio, pigpio.INPUT)
+
+        released = monotonic()
+
+        for sensor, capture in zip(sensors, captures):
+            sensor._arm_watchdog(capture)
+
+        return released
+
+
+    def _close_notify(self):
+        if self._notify is not None:
+            self._notify.close()
+            self._notify = None
+
+
+    def get_latest(self, max_age=None):
+        """
+        Newest valid reading for every sensor on the bus, without touching the sensors.
+
+        :param max_age: maximum age of a reading in seconds. Default None accepts any age.
+        :type max_age: float
+        :return: Dictionary keyed by gpio. Values are sensor data, or None if there is no reading (young enough)
+        :rtype: Dictionary
+        """
+        return dict((gpio, sensor.get_latest(max_age=max_age)) for gpio, sensor in self.sensors.items())
+
+
+    def close(self):
+        """
+        Release the pigpio connection if it was opened by the bus.
+        """
+        self._close_notify()
+
+        if self._owns_pi:
+            self._owns_pi = False
+            connection.POOL.release(self._pi)
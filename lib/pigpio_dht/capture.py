@@ -0,0 +1,254 @@
+import pigpio
+from threading import Event, Lock
+from time import monotonic
+from . import decoder
+from . import tracing
+
+"""
+Per-read state: the frame being captured, and the read other callers can join
+"""
+class Capture:
+
+    def __init__(self, gpio, bit_threshold=decoder.BIT_THRESHOLD_MICROS, keep_widths=False, keep_trace=False, tracer=None):
+        """
+        Capture Constructor.
+        Holds everything about one frame, so that a late edge from one read can never land in another read's data.
+        DHTXX creates one per start pulse, see DHTXX._begin_capture().
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param bit_threshold: HIGH pulse width in microseconds from which a bit is a 1
+        :type bit_threshold: integer
+        :param keep_widths: keep the HIGH pulse widths, for an AdaptiveThreshold
+        :type keep_widths: boolean
+        :param keep_trace: keep the tick and level of every edge, for a TraceRecorder
+        :type keep_trace: boolean
+        :param tracer: tracer to send each edge to, see tracing.set_tracer()
+        :type tracer: tracing.Tracer
+        """
+        self.gpio = gpio
+        self.bit_threshold = bit_threshold
+        self.tracer = tracer
+        self.edge_count = 0
+        self.bit_count = 0
+        self.data = []
+        self.read_success = False
+        self.sensor_responded = False
+        self.widths = [] if keep_widths else None # HIGH pulse widths, kept only with an adaptive threshold.
+        self.trace_ticks = [] if keep_trace else None # Edge ticks and levels, kept only when recording.
+        self.trace_levels = [] if keep_trace else None
+        self.done = Event() # Set when the frame is complete or known to be invalid.
+        self.on_done = None # Optional fn() called from the pigpio thread when done is set.
+        self.started_at = None # monotonic() of the start pulse.
+        self.watchdog_armed = False
+        self.last_tick = -1
+        self.c0 = -1 # timing variables for debugging and testing.
+        self.c1 = -1
+        self._callback = None
+
+
+    def start(self, pi, tick):
+        """
+        Start listening for edges from pi. Must be followed by the start pulse and then stop().
+
+        :param tick: pigpio tick just before the start pulse
+        :type tick: integer
+        """
+        self.begin(tick)
+        edge_callback = self.edge if self.tracer is None else self.edge_traced
+        self._callback = pi.callback(self.gpio, pigpio.EITHER_EDGE, edge_callback)
+
+
+    def begin(self, tick):
+        """
+        Mark the start pulse, when edges are collected some other way (see load_edges()).
+        """
+        self.last_tick = tick
+        self.c0 = tick
+        self.started_at = monotonic()
+
+
+    def stop(self):
+        """
+        Stop listening for edges.
+        """
+        if self._callback is not None:
+            self._callback.cancel()
+            self._callback = None
+
+
+    def signal_done(self):
+        """
+        Signal that the frame is complete (or known to be invalid) to any waiting reader.
+        """
+        self.done.set()
+
+        if self.on_done:
+            self.on_done()
+
+
+    def edge(self, gpio, level, tick):
+        """
+        pigpio callback handler that monitors GPIO pin and collects sensor response.
+        """
+
+        if self.done.is_set():
+            return # Late or spurious edge after the frame has finished.
+
+        if level == pigpio.TIMEOUT:
+            # Watchdog: the line has gone quiet before the frame was complete.
+            self.c1 = tick
+            self.signal_done()
+            return
+
+        if self.trace_ticks is not None:
+            self.trace_ticks.append(tick)
+            self.trace_levels.append(level)
+
+        if self.edge_count <= 1:
+          pass # RPI->DHT Request Data
+
+        elif self.edge_count <= 3:
+          self.sensor_responded = True
+
+        elif self.edge_count <= 4:
+          pass # Initial data stream LOW
+
+        elif self.edge_count <= 84:
+          elapsed = decoder.tick_diff(self.last_tick, tick)
+          self.last_tick = tick
+
+          if elapsed > decoder.MAX_PULSE_MICROS:
+              # Missed edge(s). The frame cannot be decoded so stop waiting for it.
+              self.c1 = tick
+              self.signal_done()
+              return
+
+          if level == 0:
+              self.data.append(1 if elapsed >= self.bit_threshold else 0)
+              if self.widths is not None:
+                  self.widths.append(elapsed)
+              self.bit_count += 1
+
+        else:
+          self.stop()
+          self.read_success = len(self.data) == decoder.DATA_BITS
+          self.c1 = tick
+          self.signal_done()
+          assert(level == pigpio.HIGH)  # GPIO is high when transmission is complete (sensor 'free' state per datasheet)
+          assert(self.edge_count == decoder.EDGES_PER_FRAME-1) # -1 because edge_count += 1 below.
+
+        self.last_tick = tick
+        self.edge_count += 1
+
+
+    def edge_traced(self, gpio, level, tick):
+        """
+        edge() plus an edge event for the tracer. Only bound when a tracer is installed.
+        """
+        if self.done.is_set():
+            return
+
+        index = self.edge_count
+        delta = decoder.tick_diff(self.last_tick, tick)
+        bit_count = self.bit_count
+
+        self.edge(gpio, level, tick)
+
+        bit = self.data[-1] if self.bit_count > bit_count else tracing.NO_BIT
+        self.tracer.edge(gpio, index, level, delta, bit)
+
+
+    def load_edges(self, ticks, levels):
+        """
+        Decode a complete capture in one pass, as an alternative to edge() being called per edge.
+        Edge indexes have the same meaning as in edge(), ie. ticks[0] is the start of the start pulse.
+
+        :param ticks: pigpio tick of each edge
+        :type ticks: list
+        :param levels: level after each edge
+        :type levels: list
+        """
+        edge_count = min(len(ticks), decoder.EDGES_PER_FRAME)
+        widths = decoder.high_pulse_widths(ticks[:edge_count], levels[:edge_count])
+        data = decoder.classify(widths, self.bit_threshold)
+
+        if self.widths is not None:
+            self.widths = widths
+
+        self.edge_count = edge_count
+        self.bit_count = len(data)
+        self.data = data
+        self.sensor_responded = edge_count > 2
+        self.read_success = edge_count == decoder.EDGES_PER_FRAME and len(data) == decoder.DATA_BITS
+
+        if self.trace_ticks is not None:
+            self.trace_ticks = ticks
+            self.trace_levels = levels
+
+        if edge_count:
+            self.c1 = ticks[edge_count - 1]
+
+        self.done.set()
+
+
+class Flight:
+    """
+    A read in progress that other callers can join instead of starting their own
+    """
+
+    def __init__(self):
+        self._done = Event()
+        self._result = None
+        self._error = None
+        self._lock = Lock()
+        self._callbacks = [] # Called once done, see add_done_callback().
+        self.joined = 0 # Callers sharing the result, besides the one reading.
+
+
+    def finish(self, result=None, error=None):
+        """
+        Hand the result, or the exception raised, to every caller that joined.
+        """
+        self._result = result
+        self._error = error
+
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for fn in callbacks:
+            fn(self)
+
+
+    def add_done_callback(self, fn):
+        """
+        Have fn(flight) called when the read finishes, straight away if it has. Lets AsyncDHT join without blocking.
+
+        :param fn: called from the thread that finishes the read
+        :type fn: callable
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+
+        fn(self)
+
+
+    def wait(self, timeout_secs=None):
+        """
+        Wait for the read to finish.
+
+        :param timeout_secs: longest wait. Default None waits until the read finishes.
+        :type timeout_secs: float
+        :return: the read's result
+        :raises TimeoutError: If the read did not finish in timeout_secs, or raised TimeoutError itself
+        """
+        if not self._done.wait(timeout_secs):
+            raise TimeoutError("Joined read did not finish in {} seconds.".format(timeout_secs))
+
+        if self._error is not None:
+            raise self._error
+
+        return self._result
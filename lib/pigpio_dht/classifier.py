@@ -0,0 +1,158 @@
+import os
+import re
+from threading import Lock
+from . import decoder
+from . import tracing
+
+"""
+Adaptive bit classification
+"""
+class AdaptiveThreshold:
+
+    _by_key = {} # Shared instances, see for_gpio().
+    _by_key_lock = Lock()
+    directory = None # Where for_gpio() saves each learned midpoint so it survives restarts. None keeps them in memory only.
+    SAVE_CHANGE_MICROS = 0.5 # Save once the midpoint has moved this far from the saved value.
+
+    def __init__(self, midpoint=decoder.BIT_THRESHOLD_MICROS, smoothing=0.25, min_separation=20, path=None):
+        """
+        AdaptiveThreshold Constructor.
+        Learns where to split 0 and 1 pulse widths for one sensor. Long cables and busy Pis stretch or shrink pulses,
+        so a fixed 70us threshold can misread bits. Each valid frame nudges the learned midpoint towards the split
+        between its short and long pulses, and a frame that fails its checksum is given a second chance with its
+        own best split before the read is retried.
+
+        :param midpoint: starting threshold in microseconds
+        :type midpoint: float
+        :param smoothing: weight of each valid frame when updating the midpoint (0..1)
+        :type smoothing: float
+        :param min_separation: minimum difference between the short and long pulse means for a frame to be split
+        :type min_separation: float
+        :param path: file the midpoint is loaded from, if it exists, and saved to as it is learned. Default None, not saved.
+        :type path: string
+        """
+        self.smoothing = smoothing
+        self.min_separation = min_separation
+        self.path = path
+        self.recovered = 0 # Count of frames that passed their checksum only after reclassification.
+        self._lock = Lock() # Sensors on the same GPIO share an instance, and may read from different threads.
+        self.midpoint = midpoint if path is None else self._load(midpoint)
+        self._saved_midpoint = self.midpoint
+
+
+    @classmethod
+    def for_gpio(cls, gpio, pi=None):
+        """
+        The process-wide AdaptiveThreshold for gpio on the Pi that pi is connected to, so what is learnt survives
+        sensor objects being recreated. Set AdaptiveThreshold.directory before creating sensors to also keep it
+        across restarts, in a small file per host, port and gpio.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param pi: pigpio.pi() instance. Sensors on the same GPIO of different pigpiod hosts learn separately.
+        :type pi: pigpio
+        :rtype: AdaptiveThreshold
+        """
+        key = (getattr(pi, '_host', None), getattr(pi, '_port', None), gpio)
+
+        with cls._by_key_lock:
+            if key not in cls._by_key:
+                path = None
+                if cls.directory is not None:
+                    host = re.sub(r'[^A-Za-z0-9_.-]', '_', str(key[0] or 'localhost'))
+                    name = 'pigpio-dht-{}-{}-{}.threshold'.format(host, key[1] or 8888, gpio)
+                    path = os.path.join(cls.directory, name)
+                cls._by_key[key] = cls(path=path)
+            return cls._by_key[key]
+
+
+    def classify(self, widths):
+        """
+        :param widths: HIGH pulse widths of a frame
+        :type widths: list
+        :return: bits using the learned midpoint
+        :rtype: list
+        """
+        return decoder.classify(widths, self.midpoint)
+
+
+    def resolve(self, widths, bits):
+        """
+        Check a frame's bits against its checksum, reclassify them with the frame's own split if that fails
+        (or every bit is 0), and learn from the frame if it ends up valid.
+
+        :param widths: HIGH pulse widths of a frame
+        :type widths: list
+        :param bits: bits as first classified
+        :type bits: list
+        :return: the best bits for the frame
+        :rtype: list
+        """
+        if len(widths) != decoder.DATA_BITS:
+            return bits
+
+        # A frame of all zeros passes the checksum, but is what a fixed threshold makes of pulses that are all too short.
+        if not any(bits) or not decoder.checksum_valid(decoder.bits_to_bytes(bits)):
+            split = decoder.split_threshold(widths, self.min_separation)
+
+            if split is None:
+                return bits
+
+            recovered = decoder.classify(widths, split)
+
+            if not decoder.checksum_valid(decoder.bits_to_bytes(recovered)):
+                return bits
+
+            with self._lock:
+                self.recovered += 1
+            bits = recovered
+
+        self.learn(widths)
+        return bits
+
+
+    def learn(self, widths):
+        """
+        Move the midpoint towards the split of a valid frame's pulse widths.
+        Frames that are not bimodal (eg. all zero bits) are ignored.
+
+        :param widths: HIGH pulse widths of a frame
+        :type widths: list
+        """
+        split = decoder.split_threshold(widths, self.min_separation)
+
+        if split is None:
+            return
+
+        with self._lock:
+            self.midpoint += self.smoothing * (split - self.midpoint)
+
+            if self.path is not None and abs(self.midpoint - self._saved_midpoint) >= self.SAVE_CHANGE_MICROS:
+                self._save()
+
+
+    def _load(self, default):
+        """
+        :return: the midpoint saved at path, or default if there is none
+        :rtype: float
+        """
+        try:
+            with open(self.path) as f:
+                return float(f.read())
+        except (OSError, ValueError):
+            return default
+
+
+    def _save(self):
+        """
+        Write the midpoint to path, replacing the file in one step so a reader never sees it half written.
+        Call while holding _lock.
+        """
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(temp_path, 'w') as f:
+                f.write('{}\n'.format(self.midpoint))
+            os.replace(temp_path, self.path)
+            self._saved_midpoint = self.midpoint
+        except OSError as e:
+            tracing.message("Unable to save threshold", self.path, e) # Keep learning in memory.
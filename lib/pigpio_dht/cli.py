@@ -0,0 +1,252 @@
+import argparse
+import csv
+import io
+import json
+import os
+import signal
+import sys
+from datetime import datetime
+from threading import Event
+from time import time, monotonic
+from .bus import DHTBus
+from .dht11 import DHT11
+from .dht22 import DHT22
+from .sampler import Sampler
+
+"""
+pigpio-dht console script: read DHT sensors continuously and log their readings as CSV or JSON lines.
+
+    pigpio-dht --dht22 21 --dht11 4 --interval 60 --sample 3 --format csv --output dht.csv --rotate-bytes 1000000
+"""
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+
+COLUMNS = ('time', 'sensor', 'gpio', 'temp_c', 'temp_f', 'humidity', 'valid')
+
+
+class ReadingWriter:
+
+    def __init__(self, path=None, format=FORMAT_CSV, flush_secs=10, rotate_bytes=0, backup_count=5):
+        """
+        ReadingWriter Constructor.
+        Buffers rows and writes them out at most every flush_secs, optionally rotating the output file by size.
+
+        :param path: output file, or None for stdout
+        :type path: string
+        :param format: FORMAT_CSV or FORMAT_JSONL
+        :type format: string
+        :param flush_secs: maximum time a row is buffered before being written
+        :type flush_secs: float
+        :param rotate_bytes: rotate the file once it reaches this size, 0 to never rotate. Rotated files are path.1, path.2 ...
+        :type rotate_bytes: integer
+        :param backup_count: number of rotated files kept
+        :type backup_count: integer
+        """
+        assert(format in (FORMAT_CSV, FORMAT_JSONL))
+
+        self.path = path
+        self.format = format
+        self.flush_secs = flush_secs
+        self.rotate_bytes = rotate_bytes if path is not None else 0
+        self.backup_count = backup_count
+        self._buffer = []
+        self._flushed_at = monotonic()
+        self._file = None
+
+
+    def write(self, row):
+        """
+        Buffer one row, flushing if flush_secs has passed since the last flush.
+
+        :param row: Dictionary with the COLUMNS keys
+        :type row: Dictionary
+        """
+        self._buffer.append(row)
+
+        if monotonic() - self._flushed_at >= self.flush_secs:
+            self.flush()
+
+
+    def flush(self):
+        """
+        Write out buffered rows.
+        """
+        self._flushed_at = monotonic()
+
+        if not self._buffer:
+            return
+
+        rows, self._buffer = self._buffer, []
+        out = self._open()
+        text = self._format(rows, header=out.tell() == 0 if self.path is not None else False)
+        out.write(text)
+        out.flush()
+
+        if self.rotate_bytes and out.tell() >= self.rotate_bytes:
+            self._rotate()
+
+
+    def close(self):
+        self.flush()
+
+        if self._file is not None and self.path is not None:
+            self._file.close()
+        self._file = None
+
+
+    def _open(self):
+        if self._file is None:
+            if self.path is None:
+                self._file = sys.stdout
+                if self.format == FORMAT_CSV:
+                    self._file.write(self._format([], header=True))
+            else:
+                self._file = open(self.path, 'a', newline='')
+        return self._file
+
+
+    def _format(self, rows, header):
+        if self.format == FORMAT_JSONL:
+            return ''.join(json.dumps(row) + '\n' for row in rows)
+
+        text = io.StringIO()
+        writer = csv.DictWriter(text, COLUMNS, lineterminator='\n')
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return text.getvalue()
+
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        for i in range(self.backup_count - 1, 0, -1):
+            source = "{}.{}".format(self.path, i)
+            if os.path.exists(source):
+                os.replace(source, "{}.{}".format(self.path, i + 1))
+
+        if self.backup_count > 0:
+            os.replace(self.path, self.path + '.1')
+        else:
+            os.remove(self.path)
+
+
+def read_round(bus, samples=1, max_retries=None, sampler=None):
+    """
+    Read every sensor on the bus, taking samples valid readings of each where possible.
+
+    :param bus: the sensors
+    :type bus: DHTBus
+    :param samples: valid readings per sensor, combined by sampler's aggregator when more than 1
+    :type samples: integer
+    :param max_retries: maximum number of extra sweeps for failed readings. Default 2 * samples
+    :type max_retries: integer
+    :param sampler: combines each sensor's readings. Default a Sampler using trimmed_mode, as DHTXX.sample() does.
+    :type sampler: Sampler
+    :return: Dictionary keyed by gpio of sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+    :rtype: Dictionary
+    """
+    if max_retries is None:
+        max_retries = samples * 2
+
+    if sampler is None:
+        sampler = Sampler()
+
+    temperatures = dict((gpio, []) for gpio in bus.sensors)
+    humidities = dict((gpio, []) for gpio in bus.sensors)
+    first_valid = {}
+
+    for attempt in range(samples + max_retries):
+        if all(len(temperatures[gpio]) >= samples for gpio in bus.sensors):
+            break
+
+        for gpio, result in bus.sweep().items():
+            if isinstance(result, TimeoutError) or len(temperatures[gpio]) >= samples:
+                continue
+            if result['valid']:
+                first_valid.setdefault(gpio, result)
+                temperatures[gpio].append(result['temp_c'])
+                humidities[gpio].append(result['humidity'])
+
+    results = {}
+
+    for gpio in bus.sensors:
+        if len(temperatures[gpio]) >= 2:
+            results[gpio] = sampler.result(temperatures[gpio], humidities[gpio])
+        elif gpio in first_valid:
+            results[gpio] = first_valid[gpio]
+        else:
+            results[gpio] = {'temp_c': None, 'temp_f': None, 'humidity': None, 'valid': False}
+
+    return results
+
+
+def main(argv=None, pi=None, stop=None):
+    """
+    Console script entry point. See the module documentation.
+
+    :param argv: command line arguments. Default sys.argv[1:]
+    :param pi: Custom instance of pigpio.pi()
+    :param stop: Event that ends the run when set. Default runs until interrupted or --count rounds.
+    """
+    parser = argparse.ArgumentParser(prog='pigpio-dht', description="Read DHT11/DHT22 sensors continuously and log their readings.")
+    parser.add_argument('--dht11', metavar='GPIO', type=int, action='append', default=[], help="BCM GPIO of a DHT11. May be repeated")
+    parser.add_argument('--dht22', metavar='GPIO', type=int, action='append', default=[], help="BCM GPIO of a DHT22. May be repeated")
+    parser.add_argument('--interval', type=float, default=60, help="seconds between readings (default 60)")
+    parser.add_argument('--sample', metavar='N', type=int, default=1, help="normalise N readings per sensor each interval, as sample() does (default 1)")
+    parser.add_argument('--retries', metavar='N', type=int, help="extra reads allowed each interval for failed readings (default 2 * --sample)")
+    parser.add_argument('--format', choices=(FORMAT_CSV, FORMAT_JSONL), default=FORMAT_CSV, help="output format (default csv)")
+    parser.add_argument('--output', metavar='PATH', help="append to PATH instead of writing to stdout")
+    parser.add_argument('--flush-secs', type=float, default=10, help="maximum seconds output is buffered (default 10)")
+    parser.add_argument('--rotate-bytes', type=int, default=0, help="rotate the output file at this size, 0 to never rotate (default)")
+    parser.add_argument('--backup-count', type=int, default=5, help="rotated files to keep (default 5)")
+    parser.add_argument('--count', type=int, default=0, help="stop after this many intervals, 0 to run until interrupted (default)")
+    args = parser.parse_args(argv)
+
+    if not args.dht11 and not args.dht22:
+        parser.error("at least one --dht11 or --dht22 GPIO is required")
+
+    bus = DHTBus(pi=pi)
+    try:
+        for gpio in args.dht11:
+            bus.add(DHT11, gpio)
+        for gpio in args.dht22:
+            bus.add(DHT22, gpio)
+    except ValueError as e:
+        bus.close()
+        parser.error(str(e))
+
+    if stop is None:
+        stop = Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    writer = ReadingWriter(args.output, args.format, args.flush_secs, args.rotate_bytes, args.backup_count)
+    rounds = 0
+    next_at = monotonic()
+
+    try:
+        while not stop.is_set():
+            now = datetime.fromtimestamp(time()).strftime('%Y-%m-%dT%H:%M:%S')
+
+            for gpio, result in sorted(read_round(bus, samples=max(1, args.sample), max_retries=args.retries).items()):
+                row = {'time': now, 'sensor': bus.sensors[gpio].__class__.__name__, 'gpio': gpio}
+                row.update((key, result[key]) for key in ('temp_c', 'temp_f', 'humidity', 'valid'))
+                writer.write(row)
+
+            rounds += 1
+            if args.count and rounds >= args.count:
+                break
+
+            next_at += args.interval
+            stop.wait(max(0, next_at - monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        bus.close()
+
+
+if __name__ == '__main__':
+    main()
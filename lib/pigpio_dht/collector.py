@@ -0,0 +1,481 @@
+import argparse
+import errno
+import json
+import os
+import signal
+import socket
+import socketserver
+import tempfile
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread, Event, Lock
+from time import time
+from .dht11 import DHT11
+from .dht22 import DHT22
+from .poller import Poller
+from . import connection
+from . import metrics
+
+"""
+Collector daemon that reads many sensors and serves their latest readings to clients.
+
+One collector owns the sensors, so any number of applications can share each physical read.
+Run it with a JSON config file:
+
+    python -m pigpio_dht.collector collector.json
+
+where collector.json looks like:
+
+    {
+      "socket": "/tmp/pigpio-dht.sock",
+      "http": "127.0.0.1:8042",
+      "sensors": [
+        {"name": "attic", "type": "DHT22", "gpio": 21},
+        {"name": "garage", "type": "DHT11", "gpio": 4, "host": "garage-pi", "samples": 5}
+      ]
+    }
+
+Sensor entries take the DHT11/DHT22 constructor arguments (timeout_secs, use_internal_pullup, adaptive_threshold,
+max_read_rate_secs), plus host and port of the pigpiod to use, retries for each read and samples to poll with sample()
+instead of read().
+"""
+
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), 'pigpio-dht.sock')
+
+SENSOR_CLASSES = {'DHT11': DHT11, 'DHT22': DHT22}
+
+SENSOR_OPTIONS = ('timeout_secs', 'use_internal_pullup', 'adaptive_threshold', 'max_read_rate_secs')
+
+
+class Collector:
+
+    def __init__(self, sensors):
+        """
+        Collector Constructor.
+
+        :param sensors: sensor entries, see the module documentation
+        :type sensors: list of Dictionary
+        :raises ValueError: If an entry is not valid
+        """
+        self._lock = Lock()
+        self._encoded = {} # Response line per sensor name, rebuilt on each new reading.
+        self._encoded_all = b'{}\n'
+        self.sensors = []
+
+        names = set()
+        try:
+            for config in sensors:
+                entry = CollectedSensor(config)
+                if entry.name in names:
+                    entry.close()
+                    raise ValueError("Duplicate sensor name {}.".format(entry.name))
+                names.add(entry.name)
+                self.sensors.append(entry)
+        except BaseException:
+            for entry in self.sensors:
+                entry.close() # Release the connections of the entries already made.
+            raise
+
+        for entry in self.sensors:
+            self._update(entry)
+
+
+    def start(self):
+        """
+        Start polling every sensor.
+        """
+        for entry in self.sensors:
+            entry.start(self._update)
+
+
+    def stop(self):
+        """
+        Stop polling and release the sensors' pigpio connections.
+        """
+        for entry in self.sensors:
+            entry.stop()
+
+        for entry in self.sensors:
+            entry.close()
+
+
+    def encoded(self, name=None):
+        """
+        :param name: sensor name, or None for every sensor
+        :type name: string
+        :return: latest reading(s) as a JSON line, or None if there is no sensor called name
+        :rtype: bytes
+        """
+        if name is None:
+            return self._encoded_all
+        return self._encoded.get(name)
+
+
+    def latest(self, name=None):
+        """
+        :param name: sensor name, or None for every sensor
+        :type name: string
+        :return: Dictionary like {'name': 'attic', 'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True, 'time': ...},
+                 or a Dictionary of those keyed by name. None if there is no sensor called name.
+        :rtype: Dictionary
+        """
+        encoded = self.encoded(name)
+        return None if encoded is None else json.loads(encoded.decode())
+
+
+    def _update(self, entry):
+        # Called from sensor threads. Responses are encoded once here so serving them is just a write.
+        encoded = json.dumps(entry.as_dict(), separators=(',', ':')).encode() + b'\n'
+
+        with self._lock:
+            self._encoded[entry.name] = encoded
+            self._encoded_all = b'{' + b','.join(json.dumps(name).encode() + b':' + line.rstrip(b'\n')
+                                                   for name, line in sorted(self._encoded.items())) + b'}\n'
+
+
+class CollectedSensor:
+
+    def __init__(self, config):
+        """
+        CollectedSensor Constructor.
+        A sensor polled by a Collector in its own thread, with a Poller.
+
+        :param config: sensor entry, see the collector module documentation
+        :type config: Dictionary
+        :raises ValueError: If config is not valid
+        """
+        config = dict(config)
+        sensor_type = str(config.pop('type', 'DHT22')).upper()
+
+        if sensor_type not in SENSOR_CLASSES:
+            raise ValueError("Unknown sensor type {}. Expected one of {}.".format(sensor_type, ', '.join(sorted(SENSOR_CLASSES))))
+
+        if 'gpio' not in config:
+            raise ValueError("Sensor entry {} has no gpio.".format(config))
+
+        self.gpio = int(config.pop('gpio'))
+        self.name = str(config.pop('name', "{}-{}".format(sensor_type.lower(), self.gpio)))
+        self.host = config.pop('host', None)
+        self.port = config.pop('port', None)
+        self.retries = int(config.pop('retries', 0))
+        self.samples = int(config.pop('samples', 1))
+
+        options = dict((key, config.pop(key)) for key in SENSOR_OPTIONS if key in config)
+
+        if config:
+            raise ValueError("Unknown sensor setting(s) {} for {}.".format(', '.join(sorted(config)), self.name))
+
+        self._pi = connection.POOL.acquire(self.host, self.port)
+        try:
+            self.sensor = SENSOR_CLASSES[sensor_type](self.gpio, pi=self._pi, **options)
+        except BaseException:
+            self.close()
+            raise
+
+        self.result = None # Latest valid result.
+        self.result_time = None # time() of self.result.
+        self._on_update = None
+        self._poller = Poller(self.sensor, retries=self.retries, samples=self.samples, on_update=self._updated)
+
+
+    @property
+    def errors(self):
+        """
+        Count of reads that raised TimeoutError.
+        """
+        return self._poller.errors
+
+
+    def as_dict(self):
+        result = {'name': self.name,
+                  'sensor': self.sensor.__class__.__name__,
+                  'gpio': self.gpio,
+                  'host': self._pi._host,
+                  'temp_c': None,
+                  'temp_f': None,
+                  'humidity': None,
+                  'valid': False,
+                  'time': self.result_time,
+                  'errors': self.errors}
+
+        if self.result is not None:
+            for key in ('temp_c', 'temp_f', 'humidity', 'valid'):
+                result[key] = self.result[key]
+
+        return result
+
+
+    def start(self, on_update):
+        """
+        Start polling.
+
+        :param on_update: fn(entry) called from the polling thread after each new valid result or error
+        :type on_update: callable
+        """
+        self._on_update = on_update
+        self._poller.start()
+
+
+    def stop(self, timeout_secs=None):
+        self._poller.stop(timeout_secs)
+
+
+    def close(self):
+        if self._pi is not None:
+            connection.POOL.release(self._pi)
+            self._pi = None
+
+
+    def _updated(self, result):
+        if isinstance(result, TimeoutError):
+            self._on_update(self)
+        elif result['valid']:
+            self.result = result
+            self.result_time = time()
+            self._on_update(self)
+
+
+class UnixSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves a Collector's readings over a Unix socket.
+
+    Clients send one request per line, "GET" for every sensor or "GET name" for one, and receive one JSON line back.
+    Connections stay open for further requests. See CollectorClient.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, collector, path=DEFAULT_SOCKET_PATH):
+        """
+        :raises OSError: if another collector is already serving on path
+        """
+        self.collector = collector
+
+        if os.path.exists(path):
+            _remove_stale_socket(path)
+
+        socketserver.UnixStreamServer.__init__(self, path, _UnixSocketHandler)
+
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def _remove_stale_socket(path):
+    """
+    Remove a socket left behind by a previous run, one that nothing is listening on.
+    :raises OSError: if a collector is still listening on path
+    """
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    except FileNotFoundError:
+        return # Removed meanwhile.
+    finally:
+        probe.close()
+
+    raise OSError(errno.EADDRINUSE, "{} is in use by a running collector.".format(path))
+
+
+class _UnixSocketHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            words = line.decode(errors='replace').split()
+
+            if not words or words[0].upper() != 'GET' or len(words) > 2:
+                response = b'{"error":"expected GET or GET <name>"}\n'
+            else:
+                response = self.server.collector.encoded(words[1] if len(words) == 2 else None)
+                if response is None:
+                    response = json.dumps({'error': "unknown sensor {}".format(words[1])}).encode() + b'\n'
+
+            self.wfile.write(response)
+
+
+class HTTPCollectorServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    Serves a Collector's readings over HTTP: GET /readings, /readings/<name> and /metrics (Prometheus text format).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, collector, address):
+        self.collector = collector
+        HTTPServer.__init__(self, address, _HTTPHandler)
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = self.path.split('?')[0].rstrip('/')
+        content_type = 'application/json'
+
+        if path in ('', '/readings'):
+            body = self.server.collector.encoded()
+        elif path.startswith('/readings/'):
+            body = self.server.collector.encoded(path[len('/readings/'):])
+        elif path == '/metrics':
+            body = metrics.REGISTRY.prometheus().encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            body = None
+
+        if body is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep the daemon quiet.
+
+
+class CollectorClient:
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, timeout_secs=1.0):
+        """
+        CollectorClient Constructor.
+        Reads the latest readings from a collector's Unix socket. The connection is opened on first use and kept open.
+
+        :param path: the collector's socket
+        :type path: string
+        :param timeout_secs: socket timeout in seconds
+        :type timeout_secs: float
+        """
+        self.path = path
+        self.timeout_secs = timeout_secs
+        self._socket = None
+        self._file = None
+
+
+    def read(self, name=None):
+        """
+        :param name: sensor name, or None for every sensor
+        :type name: string
+        :return: Sensor data like {'name': 'attic', 'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True, 'time': ...},
+                 or a Dictionary of those keyed by name when name is None
+        :rtype: Dictionary
+        :raises KeyError: If the collector has no sensor called name
+        """
+        request = b'GET\n' if name is None else 'GET {}\n'.format(name).encode()
+
+        try:
+            response = self._request(request)
+        except OSError:
+            self.close() # The collector may have restarted. Try once more on a new connection.
+            response = self._request(request)
+
+        result = json.loads(response.decode())
+
+        if 'error' in result:
+            raise KeyError(result['error'])
+
+        return result
+
+
+    def get_latest(self, name, max_age=None):
+        """
+        :param name: sensor name
+        :type name: string
+        :param max_age: maximum age of the reading in seconds. Default None accepts any age.
+        :type max_age: float
+        :return: see read(), or None if there is no valid reading (young enough)
+        :rtype: Dictionary
+        """
+        result = self.read(name)
+
+        if not result['valid']:
+            return None
+
+        if max_age is not None and time() - result['time'] > max_age:
+            return None
+
+        return result
+
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+            self._file = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def _request(self, request):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(self.timeout_secs)
+            self._socket.connect(self.path)
+            self._file = self._socket.makefile('rb')
+
+        self._socket.sendall(request)
+        response = self._file.readline()
+
+        if not response:
+            raise ConnectionResetError("Collector closed the connection.")
+
+        return response
+
+
+def main(argv=None):
+    """
+    Collector entry point. See the module documentation.
+    """
+    parser = argparse.ArgumentParser(prog='pigpio-dht-collector', description="Read DHT sensors and serve their latest readings.")
+    parser.add_argument('config', help="JSON config file")
+    parser.add_argument('--socket', help="Unix socket to serve on. Default from config, else {}".format(DEFAULT_SOCKET_PATH))
+    parser.add_argument('--http', metavar='HOST:PORT', help="also serve over HTTP. Default from config")
+    args = parser.parse_args(argv)
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    collector = Collector(config.get('sensors', []))
+    servers = [UnixSocketServer(collector, args.socket or config.get('socket', DEFAULT_SOCKET_PATH))]
+
+    http = args.http or config.get('http')
+    if http:
+        host, port = http.rsplit(':', 1)
+        servers.append(HTTPCollectorServer(collector, (host, int(port))))
+
+    stopped = Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+
+    collector.start()
+    threads = [Thread(target=server.serve_forever, name="pigpio-dht-server") for server in servers]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        collector.stop()
+
+
+if __name__ == '__main__':
+    main()
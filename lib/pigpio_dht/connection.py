@@ -0,0 +1,257 @@
+import os
+import struct
+import pigpio
+from threading import Lock
+from time import monotonic
+
+"""
+Shared, reference counted connections to pigpiod
+"""
+
+DEFAULT_HOST = 'localhost' # As pigpio.pi(), overridden by the PIGPIO_ADDR environment variable.
+DEFAULT_PORT = 8888 # As pigpio.pi(), overridden by the PIGPIO_PORT environment variable.
+
+RECONNECT_ERRORS = (OSError, struct.error) # Raised by pigpio.pi() methods once the daemon has gone.
+RECONNECT_MIN_SECS = 1 # Wait after a failed connection attempt, doubled for each further failure ...
+RECONNECT_MAX_SECS = 30 # ... up to this.
+
+
+class SharedPi:
+
+    def __init__(self, host, port, factory):
+        """
+        SharedPi Constructor.
+        Stands in for pigpio.pi() and forwards every call to a connection that is reopened if pigpiod restarts.
+        Obtain one from ConnectionPool.acquire() rather than constructing directly.
+
+        A read in progress when pigpiod restarts fails with TimeoutError. The next read uses the new connection.
+        While pigpiod cannot be reached calls fail with ConnectionError, and new connections are attempted no more often
+        than every RECONNECT_MIN_SECS, doubling to RECONNECT_MAX_SECS.
+
+        :param host: pigpiod host
+        :type host: string
+        :param port: pigpiod port
+        :type port: integer
+        :param factory: fn(host, port) that opens a connection, eg. pigpio.pi
+        :type factory: callable
+        """
+        self._host = host
+        self._port = port
+        self._factory = factory
+        self._lock = Lock()
+        self._refs = 0
+        self._methods = {}
+        self._pi = None
+        self._connecting = False
+        self._backoff_secs = 0
+        self._retry_at = 0 # monotonic() time of the next connection attempt after a failure.
+        self.reconnects = 0 # Times the connection has been reopened.
+
+
+    @property
+    def connected(self):
+        pi = self._pi
+        return pi is not None and bool(pi.connected)
+
+
+    def reconnect(self):
+        """
+        Close the connection and open a new one.
+
+        :raises ConnectionError: if pigpiod cannot be reached
+        """
+        self._connect(stale=self._pi)
+
+
+    def close(self):
+        """
+        Close the connection. Called by ConnectionPool.release() for the last user.
+        """
+        with self._lock:
+            pi, self._pi = self._pi, None
+        if pi is not None:
+            _stop(pi)
+
+
+    def _current(self):
+        """
+        :return: the underlying pigpio.pi(), reopened first if it is not connected
+        :rtype: pigpio.pi
+        :raises ConnectionError: if pigpiod cannot be reached
+        """
+        pi = self._pi
+        if pi is not None and pi.connected:
+            return pi
+        return self._connect()
+
+
+    def _connect(self, stale=None):
+        """
+        Replace the connection with a new one, unless another thread is already connecting or the last attempt failed
+        less than the backoff ago. The lock is not held while connecting, so a slow or failing connect only holds up
+        the calls that need it.
+
+        :param stale: a connection to replace even if it still reports connected
+        :type stale: pigpio.pi
+        :return: the new connection
+        :rtype: pigpio.pi
+        :raises ConnectionError: if pigpiod cannot be reached
+        """
+        with self._lock:
+            pi = self._pi
+            if pi is not None and pi is not stale and pi.connected:
+                return pi # Another thread reconnected.
+            if self._connecting:
+                raise ConnectionError("Connecting to pigpiod on {}:{}.".format(self._host, self._port))
+            wait_secs = self._retry_at - monotonic()
+            if wait_secs > 0:
+                raise ConnectionError("Unable to connect to pigpiod on {}:{}. Retrying in {:.1f} seconds."
+                                      .format(self._host, self._port, wait_secs))
+            self._connecting = True
+            self._pi = None
+            if pi is not None:
+                self.reconnects += 1
+
+        if pi is not None:
+            _stop(pi)
+
+        pi = None
+        try:
+            pi = self._factory(self._host, self._port)
+            connected = bool(pi.connected)
+        except RECONNECT_ERRORS:
+            connected = False
+
+        with self._lock:
+            self._connecting = False
+            if connected:
+                self._pi = pi
+                self._backoff_secs = 0
+                self._retry_at = 0
+                return pi
+            self._backoff_secs = min(max(self._backoff_secs * 2, RECONNECT_MIN_SECS), RECONNECT_MAX_SECS)
+            self._retry_at = monotonic() + self._backoff_secs
+
+        if pi is not None:
+            _stop(pi)
+        raise ConnectionError("Unable to connect to pigpiod on {}:{}. Is pigpiod running?".format(self._host, self._port))
+
+
+    def __getattr__(self, name):
+        # Only called for names not found on SharedPi, ie. the pigpio.pi() API.
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        method = self._methods.get(name)
+        if method is not None:
+            return method
+
+        value = getattr(self._current(), name)
+        if not callable(value):
+            return value
+
+        def method(*args, **kwargs):
+            pi = self._current()
+            try:
+                return getattr(pi, name)(*args, **kwargs)
+            except RECONNECT_ERRORS:
+                pi = self._connect(stale=pi)
+            return getattr(pi, name)(*args, **kwargs)
+
+        self._methods[name] = method
+        return method
+
+
+    def __repr__(self):
+        return "SharedPi({}:{}, refs={})".format(self._host, self._port, self._refs)
+
+
+class ConnectionPool:
+
+    def __init__(self, factory=None):
+        """
+        ConnectionPool Constructor.
+        Hands out one SharedPi per pigpiod (host, port), so sensors on the same daemon share its sockets and callback thread.
+        Use the module level POOL.
+
+        :param factory: fn(host, port) that opens a connection. Default pigpio.pi.
+        :type factory: callable
+        """
+        self._factory = factory if factory is not None else pigpio.pi
+        self._lock = Lock()
+        self._by_key = {}
+
+
+    def acquire(self, host=None, port=None):
+        """
+        The shared connection to pigpiod on host:port, opened if necessary. Pair every acquire() with a release().
+
+        :param host: pigpiod host. Default as pigpio.pi().
+        :type host: string
+        :param port: pigpiod port. Default as pigpio.pi().
+        :type port: integer
+        :rtype: SharedPi
+        :raises ConnectionError: if pigpiod cannot be reached
+        """
+        key = _key(host, port)
+
+        with self._lock:
+            shared = self._by_key.get(key)
+            if shared is None:
+                shared = SharedPi(key[0], key[1], self._factory)
+                self._by_key[key] = shared
+            shared._refs += 1
+
+        # Connect outside the pool lock, so a daemon that is down doesn't hold up sensors on other hosts.
+        try:
+            shared._current()
+        except ConnectionError:
+            self.release(shared)
+            raise
+        return shared
+
+
+    def release(self, shared):
+        """
+        Give up a connection from acquire(). The connection is closed once it has no users.
+
+        :param shared: the connection
+        :type shared: SharedPi
+        """
+        key = (shared._host, shared._port)
+
+        with self._lock:
+            shared._refs -= 1
+            if shared._refs > 0:
+                return
+            if self._by_key.get(key) is shared:
+                del self._by_key[key]
+
+        shared.close()
+
+
+    def connections(self):
+        """
+        :return: the open connections
+        :rtype: list of SharedPi
+        """
+        with self._lock:
+            return list(self._by_key.values())
+
+
+def _key(host, port):
+    if host is None:
+        host = os.getenv('PIGPIO_ADDR', DEFAULT_HOST)
+    if port is None:
+        port = os.getenv('PIGPIO_PORT', DEFAULT_PORT)
+    return (host, int(port))
+
+
+def _stop(pi):
+    try:
+        pi.stop()
+    except RECONNECT_ERRORS:
+        pass # Already gone.
+
+
+POOL = ConnectionPool()
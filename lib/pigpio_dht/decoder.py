@@ -0,0 +1,296 @@
+"""
+Stateless DHT frame decoding.
+
+A frame is the list of edges seen on the sensor GPIO from the start of the start pulse:
+
+- edges 0-1 start pulse sent by the Pi
+- edges 2-3 sensor response
+- edge  4   start of the first data bit
+- edges 5-84 data. Each falling edge (6, 8, .., 84) ends a HIGH pulse whose width encodes one bit.
+- edge  85  sensor releases the bus
+
+These functions need no pigpio connection, so captured frames can be decoded offline.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EDGES_PER_FRAME = 86 # Expected number of edges for a successful sensor communication.
+DATA_BITS = 40 # Expected number of data bits to be returned from the sensor.
+FIRST_DATA_EDGE = 5
+LAST_DATA_EDGE = 84
+BIT_THRESHOLD_MICROS = 70 # HIGH pulses at least this long are a 1.
+MAX_PULSE_MICROS = 200 # Longest plausible data pulse. Anything longer means the frame is broken.
+
+
+def tick_diff(t1, t2):
+    """
+    Microseconds from tick t1 to tick t2, allowing for the 32 bit tick wrapping.
+    """
+    return (t2 - t1) & 0xFFFFFFFF
+
+
+def edges_to_bits(ticks, levels, threshold=BIT_THRESHOLD_MICROS):
+    """
+    Classify the data pulses of a frame into bits.
+    Decoding stops at the first pulse longer than MAX_PULSE_MICROS (a missed edge), so a broken frame yields fewer than DATA_BITS bits.
+
+    :param ticks: pigpio tick of each edge
+    :type ticks: sequence of integer
+    :param levels: level after each edge
+    :type levels: sequence of integer
+    :param threshold: HIGH pulse width in microseconds at or above which a bit is 1
+    :type threshold: integer
+    :return: bits
+    :rtype: list
+    """
+    return classify(high_pulse_widths(ticks, levels), threshold)
+
+
+def high_pulse_widths(ticks, levels):
+    """
+    Widths of the HIGH data pulses of a frame, one per bit.
+    Stops at the first pulse longer than MAX_PULSE_MICROS (a missed edge).
+
+    :param ticks: pigpio tick of each edge
+    :type ticks: sequence of integer
+    :param levels: level after each edge
+    :type levels: sequence of integer
+    :return: pulse widths in microseconds
+    :rtype: list
+    """
+    widths = []
+
+    for i in range(FIRST_DATA_EDGE, min(len(ticks), LAST_DATA_EDGE + 1)):
+        elapsed = tick_diff(ticks[i - 1], ticks[i])
+
+        if elapsed > MAX_PULSE_MICROS:
+            break
+
+        if levels[i] == 0:
+            widths.append(elapsed)
+
+    return widths
+
+
+def classify(widths, threshold=BIT_THRESHOLD_MICROS):
+    """
+    :param widths: HIGH pulse widths in microseconds
+    :type widths: sequence of integer
+    :param threshold: width at or above which a bit is 1
+    :type threshold: float
+    :return: bits
+    :rtype: list
+    """
+    return [1 if width >= threshold else 0 for width in widths]
+
+
+def split_threshold(widths, min_separation=20):
+    """
+    Find the threshold that best splits a frame's HIGH pulse widths into short (0) and long (1) pulses,
+    by iterating a two cluster (1D k-means) split until it settles.
+
+    :param widths: HIGH pulse widths in microseconds
+    :type widths: sequence of integer
+    :param min_separation: minimum difference in microseconds between the cluster means for the split to count
+    :type min_separation: float
+    :return: midpoint between the cluster means, or None if the widths are not bimodal (eg. all bits the same)
+    :rtype: float
+    """
+    if not widths:
+        return None
+
+    low = min(widths)
+    high = max(widths)
+    if high - low < min_separation:
+        return None
+
+    threshold = (low + high) / 2
+
+    for _ in range(10):
+        zeros = [width for width in widths if width < threshold]
+        ones = [width for width in widths if width >= threshold]
+        if not zeros or not ones:
+            return None
+
+        low = sum(zeros) / len(zeros)
+        high = sum(ones) / len(ones)
+        updated = (low + high) / 2
+
+        if updated == threshold:
+            break
+        threshold = updated
+
+    if high - low < min_separation:
+        return None
+
+    return threshold
+
+
+def bits_to_bytes(bits):
+    """
+    Pack bits (most significant first) into bytes.
+
+    :param bits: DATA_BITS bits
+    :type bits: sequence of integer
+    :return: the 5 raw bytes
+    :rtype: bytes
+    """
+    raw = bytearray()
+    byte = 0
+
+    for i in range(len(bits)):
+        byte = (byte << 1) | bits[i]
+        if ((i + 1) % 8 == 0):
+            raw.append(byte)
+            byte = 0
+
+    return bytes(raw)
+
+
+def checksum_valid(raw):
+    """
+    :param raw: the 5 raw bytes
+    :type raw: sequence of integer
+    :return: True if the checksum byte matches the data
+    :rtype: boolean
+    """
+    return (raw[0] + raw[1] + raw[2] + raw[3]) & 255 == raw[4]
+
+
+def decode_raw(raw, datum_byte_count):
+    """
+    Convert the 5 raw bytes into temperature and humidity.
+
+    :param raw: the 5 raw bytes
+    :type raw: sequence of integer
+    :param datum_byte_count: number of bytes used to represent temperature and humidity data for sensor (DHT11 1, DHT22 2)
+    :type datum_byte_count: integer in range 1..2
+    :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}. Values are 0 when not valid.
+    :rtype: Dictionary
+    """
+    assert(len(raw) == 5)
+
+    valid = checksum_valid(raw)
+
+    if not valid:
+        return {'temp_c': 0,
+                'temp_f': 0,
+                'humidity': 0,
+                'valid': False}
+
+    if datum_byte_count == 1:
+        # Data is single byte, eg DHT11
+        temp_c = round(raw[2])
+        humidity = round(raw[0], 1)
+
+    else:
+        # Data is 2 bytes, eg DHT22
+        multiplier = 1  # Positive or negative temp multiplier
+        temp_high = raw[2]
+
+        if temp_high & 0b10000000:
+            multiplier = -1
+            temp_high = temp_high ^ 0b10000000
+
+        temp_c = round(multiplier * float(temp_high * 256 + raw[3]) / 10, 1)
+        humidity = round(float(raw[0] * 256 + raw[1]) / 10, 1)
+
+    temp_f = round((temp_c * 9/5) + 32, 1)
+
+    return {'temp_c': temp_c,
+            'temp_f': temp_f,
+            'humidity': humidity,
+            'valid': valid}
+
+
+def decode_frame(ticks, levels, datum_byte_count, threshold=BIT_THRESHOLD_MICROS):
+    """
+    Decode one captured frame.
+
+    :param ticks: pigpio tick of each edge
+    :type ticks: sequence of integer
+    :param levels: level after each edge
+    :type levels: sequence of integer
+    :param datum_byte_count: 1 for DHT11, 2 for DHT22
+    :type datum_byte_count: integer in range 1..2
+    :param threshold: HIGH pulse width in microseconds at or above which a bit is 1
+    :type threshold: integer
+    :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True, 'raw': b'...'}.
+             raw is None if the frame was incomplete.
+    :rtype: Dictionary
+    """
+    bits = edges_to_bits(ticks, levels, threshold)
+
+    if len(ticks) < EDGES_PER_FRAME or len(bits) != DATA_BITS:
+        return {'temp_c': 0,
+                'temp_f': 0,
+                'humidity': 0,
+                'valid': False,
+                'raw': None}
+
+    raw = bits_to_bytes(bits)
+    result = decode_raw(raw, datum_byte_count)
+    result['raw'] = raw
+    return result
+
+
+def decode_frames(ticks, datum_byte_count, threshold=BIT_THRESHOLD_MICROS):
+    """
+    Decode many complete frames at once.
+    With NumPy installed the frames are decoded with vectorised array operations, otherwise frame by frame.
+    Levels are not needed as edges of a complete frame strictly alternate.
+
+    :param ticks: frames of EDGES_PER_FRAME ticks each, eg. a NumPy array of shape (frames, 86)
+    :type ticks: 2D array or sequence of sequences
+    :param datum_byte_count: 1 for DHT11, 2 for DHT22
+    :type datum_byte_count: integer in range 1..2
+    :param threshold: HIGH pulse width in microseconds at or above which a bit is 1
+    :type threshold: integer
+    :return: Dictionary of columns 'raw' (frames x 5), 'valid', 'temp_c', 'temp_f', 'humidity'.
+             NumPy arrays when NumPy is installed, otherwise lists.
+    :rtype: Dictionary
+    """
+    if numpy is None:
+        return _decode_frames_python(ticks, datum_byte_count, threshold)
+
+    ticks = numpy.asarray(ticks, dtype=numpy.int64).reshape(-1, EDGES_PER_FRAME)
+
+    # Widths of all data pulses, then the HIGH pulses (ending on the falling edges 6, 8, .., 84).
+    widths = (ticks[:, FIRST_DATA_EDGE:LAST_DATA_EDGE + 1] - ticks[:, FIRST_DATA_EDGE - 1:LAST_DATA_EDGE]) & 0xFFFFFFFF
+    high_widths = widths[:, 1::2]
+    pulses_ok = (widths <= MAX_PULSE_MICROS).all(axis=1)
+
+    raw = numpy.packbits(high_widths >= threshold, axis=1)
+    wide = raw.astype(numpy.int64)
+    valid = pulses_ok & (((wide[:, 0] + wide[:, 1] + wide[:, 2] + wide[:, 3]) & 255) == wide[:, 4])
+
+    if datum_byte_count == 1:
+        temp_c = wide[:, 2].astype(numpy.float64)
+        humidity = wide[:, 0].astype(numpy.float64)
+    else:
+        sign = numpy.where(wide[:, 2] & 0b10000000, -1.0, 1.0)
+        temp_c = numpy.round(sign * ((wide[:, 2] & 0b01111111) * 256 + wide[:, 3]) / 10, 1)
+        humidity = numpy.round((wide[:, 0] * 256 + wide[:, 1]) / 10, 1)
+
+    temp_f = numpy.round((temp_c * 9/5) + 32, 1)
+
+    return {'raw': raw,
+            'valid': valid,
+            'temp_c': numpy.where(valid, temp_c, 0),
+            'temp_f': numpy.where(valid, temp_f, 0),
+            'humidity': numpy.where(valid, humidity, 0)}
+
+
+def _decode_frames_python(ticks, datum_byte_count, threshold):
+    columns = {'raw': [], 'valid': [], 'temp_c': [], 'temp_f': [], 'humidity': []}
+    levels = [i % 2 for i in range(EDGES_PER_FRAME)] # Edge 0 is falling, then alternating.
+
+    for frame in ticks:
+        result = decode_frame(frame, levels, datum_byte_count, threshold)
+        for key in columns:
+            columns[key].append(result[key])
+
+    return columns
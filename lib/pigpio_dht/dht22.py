@@ -6,7 +6,7 @@ DHT22 Temperature and Humidity Sensor
 """
 class DHT22(DHTXX):
 
-    def __init__(self, gpio, timeout_secs=0.5, use_internal_pullup=True, pi=None):
+    def __init__(self, gpio, timeout_secs=0.5, use_internal_pullup=True, pi=None, adaptive_threshold=False, max_read_rate_secs=2):
         """
         DHT22 Constructor
 
@@ -18,10 +18,14 @@ class DHT22(DHTXX):
         :type use_internal_pullup: boolean
         :param pi: Custom instance of pigpio.pi()
         :type pi: pigpio
+        :param adaptive_threshold: learn the 0/1 pulse width threshold for this gpio instead of using a fixed 70us
+        :type adaptive_threshold: boolean
+        :param max_read_rate_secs: minimum seconds between reads. The datasheet allows one read every 2 seconds.
+        :type max_read_rate_secs: float
         """
 
-        # for DHT22 datum_byte_count = 2, max_read_rate_secs = 2
-        super(DHT22, self).__init__(gpio, pi=pi, timeout_secs=timeout_secs, use_internal_pullup=True, max_read_rate_secs=2, datum_byte_count=2)
+        # for DHT22 datum_byte_count = 2
+        super(DHT22, self).__init__(gpio, pi=pi, timeout_secs=timeout_secs, use_internal_pullup=True, adaptive_threshold=adaptive_threshold, max_read_rate_secs=max_read_rate_secs, datum_byte_count=2)
 
 
 if __name__ == "__main__":
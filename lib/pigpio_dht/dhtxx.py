@@ -1,19 +1,35 @@
 import pigpio
-from time import time, sleep
-from datetime import datetime
+import weakref
+from time import time, sleep, monotonic
+from threading import Lock
 import statistics
-
-DEBUG = False
+from . import decoder
+from .poller import Poller
+from .stats import RollingStats
+from .classifier import AdaptiveThreshold
+from .ratelimit import RateLimiter
+from .breaker import CircuitBreaker
+from .reading import Reading
+from .sampler import Sampler, trimmed_mode
+from .capture import Capture, Flight
+from .estimator import Estimator
+from . import metrics
+from . import tracing
+from . import connection
 
 """
 DHT Sensor Base Constructor
 """
 class DHTXX:
 
-    SUCCESS_EDGE_COUNT = 86 # Expected number of edges for a successful sensor communication.
-    EXPECTED_DATA_BITS = 40 # Expected number of data bytes to be returned from the sensor.
+    SUCCESS_EDGE_COUNT = decoder.EDGES_PER_FRAME # Expected number of edges for a successful sensor communication.
+    EXPECTED_DATA_BITS = decoder.DATA_BITS # Expected number of data bytes to be returned from the sensor.
+    MAX_PULSE_MICROS = decoder.MAX_PULSE_MICROS # Longest plausible data pulse. Anything longer means the frame is broken.
+    WATCHDOG_MILLIS = 5 # The line idle this long after the start pulse means the sensor is not (or no longer) sending.
+    TEMP_RANGE = (-40, 80) # Temperatures (C) a DHT sensor can report, whatever its accuracy. Anything else is a read error.
+    HUMIDITY_RANGE = (0, 100)
 
-    def __init__(self, gpio, timeout_secs=0.5, use_internal_pullup=True, pi=None, max_read_rate_secs=2, datum_byte_count=1):
+    def __init__(self, gpio, timeout_secs=0.5, use_internal_pullup=True, pi=None, max_read_rate_secs=2, datum_byte_count=1, adaptive_threshold=False):
         """
         Base Constructor.
 
@@ -23,89 +39,330 @@ class DHTXX:
         :type timeout_secs: integer
         :param use_internal_pullup: enable internal pull-up resistor on gpio
         :type use_internal_pullup: boolean
-        :param pi: Custom instance of pigpio.pi()
+        :param pi: Custom instance of pigpio.pi(). If None the sensor shares a pooled connection to the local pigpiod (see connection.POOL).
         :type pi: pigpio
         :param max_read_rate_secs: time in seconds between allowed sensor reads.
         :type max_read_rate_secs: integer
         :param datum_byte_count: number of bytes used to represent temperature and humidity data for sensor
         :type datum_byte_count: integer in range 1..2
+        :param adaptive_threshold: learn the 0/1 pulse width threshold for this gpio instead of using a fixed 70us (see AdaptiveThreshold)
+        :type adaptive_threshold: boolean
         """
         assert(datum_byte_count in (1,2))
 
         self.gpio = gpio
         self.timeout_secs = timeout_secs
-        self.read_success = False
-        self.sensor_responded = False
-        self.data = []
 
         if pi != None:
             self._pi = pi
+            self._release_pi = None
         else:
-            self._pi = pigpio.pi()
+            self._pi = connection.POOL.acquire()
+            self._release_pi = weakref.finalize(self, connection.POOL.release, self._pi) # Also released if never closed.
 
         if use_internal_pullup:
             self._pi.set_pull_up_down(gpio, pigpio.PUD_UP)
 
         self._datum_byte_count = datum_byte_count
+        self.adaptive_threshold = AdaptiveThreshold.for_gpio(gpio, self._pi) if adaptive_threshold else None
         self._max_read_rate_secs = max_read_rate_secs
-        self._bit_count = -1
-        self._last_tick = -1
-        self._edge_count = -1
-        self._last_read_time = None
-
-        self._c0 = -1 # timing variables for debugging and testing.
-        self._c1 = -1
-
-
-    def read(self, retries=0):
+        self._rate_limiter = RateLimiter.for_gpio(gpio, self._pi) # Shared by every sensor object on this gpio.
+        self.circuit_breaker = CircuitBreaker.for_gpio(gpio, self._pi) # Shared by every sensor object on this gpio. None to disable.
+        self.watchdog_ms = DHTXX.WATCHDOG_MILLIS # pigpio watchdog armed after the start pulse, 0 to wait the full timeout_secs.
+        host = getattr(self._pi, '_host', None) # Labels the metrics, so the same gpio on different pigpiods is told apart.
+        host = None if host is None else '{}:{}'.format(host, getattr(self._pi, '_port', None))
+        self.metrics = metrics.REGISTRY.register(metrics.SensorMetrics(self.__class__.__name__, gpio, host))
+        self.recorder = None # Optional TraceRecorder that every captured frame is written to.
+        self.history = None # Optional ReadingHistory that every valid reading is added to.
+        self.timeseries = None # Optional TimeSeriesLog that every decoded reading is written to.
+        self.estimator = Estimator(self.TEMP_RANGE, self.HUMIDITY_RANGE) # Running estimate for read_filtered().
+        self.shared = None # Optional SharedState coordinating reads of this gpio with other processes.
+        self.trigger = None # Optional ScriptTrigger that times the start pulse in pigpiod.
+        self._capture = Capture(gpio) # The latest frame. Each read captures into its own Capture.
+        self._read_lock = Lock() # Serialises reads between threads, AsyncDHT and DHTBus. Not an RLock, as AsyncDHT acquires it in a worker thread.
+        self._flight = None # The read in progress, that concurrent callers join. See _read().
+        self._flight_lock = Lock()
+
+        self.latest_reading = None # Newest valid Reading, see the latest property.
+        self.deadline_max_age = 60 # Oldest cached reading, in seconds, that read(deadline=...) falls back to. None for any age.
+        self.latest_time = None # time() when self.latest was read.
+        self._poller = None
+
+
+    def read(self, retries=0, deadline=None, budget_secs=None, max_age=None):
         """
         One-shot sensor read.
         read() will add in a pause if you try and call it more than once per max_read_rate_secs.
 
         :param retries: number of times to retry when checksum validation fails
         :type retries: integer
+        :param budget_secs: keep retrying invalid reads for up to this many seconds, instead of a fixed number of retries
+        :type budget_secs: float
+        :param deadline: seconds within which a result is needed. If a fresh read cannot be completed in time the latest cached valid reading
+                         is returned instead, marked 'cached' True with its 'age_secs'. Ignored while there is no cached reading up to
+                         deadline_max_age seconds old.
+        :type deadline: float
+        :param max_age: return a valid reading up to this many seconds old, if there is one, instead of reading the sensor.
+                        With shared set this includes readings taken by other processes.
+        :type max_age: float
         :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
         :rtype: Dictionary
         :raises TimeoutError: If the sensor on gpio does not respond
         """
+        if max_age is not None:
+            cached = self._cached(max_age)
+            if cached is not None:
+                return cached.as_dict()
+
         retries = abs(retries) + 1
+        expires_at = None if deadline is None else monotonic() + deadline
+        budget_ends_at = None if budget_secs is None else monotonic() + budget_secs
+        attempts = 0
+
+        while True:
+            if expires_at is not None and self._deadline_fallback() is not None:
+                remaining_secs = expires_at - monotonic() - self._throttle_secs()
+
+                if remaining_secs <= 0:
+                    tracing.message("Deadline reached, using cached reading")
+                    return self._deadline_fallback()
+
+                try:
+                    result = self._read(timeout_secs=min(self.timeout_secs, remaining_secs))
+                except TimeoutError:
+                    fallback = self._deadline_fallback()
+                    if fallback is None:
+                        raise # The cached reading aged out while reading.
+                    tracing.message("Read not completed by deadline, using cached reading")
+                    return fallback
+            else:
+                result = self._read(max_age=max_age if attempts == 0 else None)
 
-        for i in range(retries):
-            result = self._read()
+            attempts += 1
 
             if result['valid'] == True:
                 break
 
+            if budget_ends_at is not None:
+                if self.next_available_at() >= budget_ends_at:
+                    break
+            elif attempts >= retries:
+                break
+
+        if expires_at is not None and not result['valid']:
+            fallback = self._deadline_fallback()
+            if fallback is not None:
+                return fallback
+
         return result
 
 
-    def sample(self, samples=5, max_retries=None):
+    def read_raw(self, retries=0):
+        """
+        One-shot sensor read, like read() but returning a Reading. temp_c, temp_f and humidity are only decoded
+        from the raw bytes if used, so this is the cheaper call when readings are stored or forwarded.
+
+        :param retries: number of times to retry when checksum validation fails
+        :type retries: integer
+        :return: the reading. Check its valid attribute.
+        :rtype: Reading
+        :raises TimeoutError: If the sensor on gpio does not respond
+        """
+        retries = abs(retries) + 1
+
+        for i in range(retries):
+            reading = self._read(raw=True)
+
+            if reading.valid:
+                break
+
+        return reading
+
+
+    def read_filtered(self, retries=0):
+        """
+        One-shot sensor read, smoothed by a running estimate of temperature and humidity (see Estimator).
+        Readings the sensor could not physically have produced, eg. a jump of 30 degrees between reads, are rejected.
+        Gives results comparable to sample() for the cost of a single read().
+
+        :param retries: number of times to retry when checksum validation fails
+        :type retries: integer
+        :return: the estimate, like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}. When this read fails its
+                 checksum or is rejected, the estimate from earlier readings is returned with 'valid' False, plus
+                 'rejected' True if it was rejected. Until a reading has been accepted, the reading is returned instead.
+        :rtype: Dictionary
+        :raises TimeoutError: If the sensor on gpio does not respond
+        """
+        return self._filter(self.read_raw(retries=retries))
+
+
+    @property
+    def data(self):
+        """
+        Bits of the latest frame.
+        """
+        return self._capture.data
+
+
+    @data.setter
+    def data(self, bits):
+        self._capture.data = bits
+
+
+    @property
+    def read_success(self):
+        """
+        True if the latest frame had every edge and bit, even if its checksum was then invalid.
+        """
+        return self._capture.read_success
+
+
+    @property
+    def sensor_responded(self):
+        """
+        True if the sensor answered the latest start pulse.
+        """
+        return self._capture.sensor_responded
+
+
+    @property
+    def latest(self):
+        """
+        Newest valid reading, like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}, or None.
+        """
+        reading = self.latest_reading
+        return None if reading is None else reading.as_dict()
+
+
+    def stream(self, window=5, retries=0):
+        """
+        Generator that reads the sensor continuously and yields one smoothed result per valid read.
+        Results are normalised over a sliding window of the last window reads using rolling statistics,
+        so each result costs one read rather than a full sample().
+        Invalid reads are skipped.
+
+        :param window: number of recent reads to smooth over
+        :type window: integer
+        :param retries: number of times to retry each read when checksum validation fails
+        :type retries: integer
+        :return: generator of sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Generator
+        :raises TimeoutError: If the sensor on gpio does not respond
+        """
+        temperatures = RollingStats(window)
+        humidities = RollingStats(window)
+
+        while True:
+            result = self.read(retries=retries)
+
+            if result['valid']:
+                yield self._smooth(temperatures, humidities, result)
+
+
+    def next_available_at(self):
+        """
+        When the sensor may next be read without read() pausing, shared across every sensor object on the same gpio.
+        Lets schedulers plan reads rather than sleep.
+
+        :return: time.monotonic() time
+        :rtype: float
+        """
+        return self._rate_limiter.next_available_at(self._max_read_rate_secs)
+
+
+    def get_latest(self, max_age=None):
+        """
+        Return the newest valid reading without touching the sensor.
+        The cache is updated by every successful read, so use with start_polling() to keep it fresh.
+
+        :param max_age: maximum age of the reading in seconds. Default None accepts any age.
+        :type max_age: float
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}, or None if there is no reading (young enough)
+        :rtype: Dictionary
+        """
+        reading = self.latest_reading # Read once, another thread may replace it.
+
+        if reading is None:
+            return None
+
+        if max_age is not None and monotonic() - reading.at > max_age:
+            return None
+
+        return reading.as_dict()
+
+
+    def start_polling(self, retries=0):
+        """
+        Start reading the sensor in a background thread as fast as max_read_rate_secs allows.
+        Readings are available instantly from get_latest().
+
+        :param retries: number of times to retry each read when checksum validation fails
+        :type retries: integer
+        """
+        if self._poller is None:
+            self._poller = Poller(self, retries=retries)
+            self._poller.start()
+
+
+    def stop_polling(self):
+        """
+        Stop background polling started with start_polling().
+        """
+        if self._poller is not None:
+            self._poller.stop()
+            self._poller = None
+
+
+    def close(self):
+        """
+        Stop polling and release the pooled pigpio connection, if the sensor was created without pi=.
+        The sensor cannot be read once closed.
+        """
+        self.stop_polling()
+
+        if self._release_pi is not None:
+            self._release_pi()
+
+
+    def sample(self, samples=5, max_retries=None, budget_secs=None, sampler=None):
         """
         Sample sensor and return normalised data.
 
-        :param samples: number of samples to take
+        :param samples: number of samples to take. Ignored when sampler is given.
         :type samples: integer
-        :param max_retries: maximum retries per sample before raising exception. Default 2 * samples
+        :param max_retries: maximum retries per sample before raising exception. Default 2 * samples, or no limit when budget_secs is given
         :type max_retries: integer
+        :param budget_secs: overall time allowed for sampling, retries included
+        :type budget_secs: float
+        :param sampler: stop as soon as the readings converge, and combine them with sampler's aggregator (see Sampler)
+        :type sampler: Sampler
         :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
         :rtype: Dictionary
-        :raises TimeoutError: If the sensor on gpio does not respond, or max_retries is reached
+        :raises TimeoutError: If the sensor on gpio does not respond, or max_retries or budget_secs is reached
         """
-        samples = max(2, samples)
+        fixed = sampler is None
+        if fixed:
+            samples = max(2, samples)
+            sampler = Sampler(tolerance=None, min_samples=samples, max_samples=samples)
+
+        samples = sampler.max_samples
+        budget_ends_at = None if budget_secs is None else monotonic() + budget_secs
 
-        if max_retries is None:
+        if max_retries is None and budget_secs is None:
             max_retries = samples * 2
 
         sample_num = 0
-        trim_sd = 1  # Number of standard deviations to trim.
         retries = 0
         temperatures = []
         humidities = []
         initial_result = None  # For debugging and testing results.
 
-        while len(temperatures) < samples:
+        while not sampler.done(temperatures, humidities):
+            if budget_ends_at is not None and self.next_available_at() >= budget_ends_at:
+                raise TimeoutError("Time budget of {} seconds reached after {} of {} samples.".format(budget_secs, len(temperatures), samples))
+
             sample_num += 1
-            _debug("--- SAMPLE {} ----".format(sample_num))
+            tracing.message("--- SAMPLE", sample_num, "----")
             result = self.read(retries=0)
 
             if (len(temperatures) == 0):
@@ -118,252 +375,456 @@ class DHTXX:
             else:
                 retries += 1
 
-            if retries >= max_retries:
+            if max_retries is not None and retries >= max_retries:
                 raise TimeoutError("Maximum retries of {} reached.".format(max_retries))
 
-        _debug("Retries:", retries)
-
-        # Temperature
-        temp_sd = statistics.stdev(temperatures)
-        temp_mean = statistics.mean(temperatures)
-        if temp_sd == 0:
-            temperatures_norm = temperatures
-        else:
-            temperatures_norm = [x for x in temperatures if (x > temp_mean - trim_sd * temp_sd)]
-            temperatures_norm = [x for x in temperatures_norm if (x < temp_mean + trim_sd * temp_sd)]
-
-        _debug("temps, norm", temperatures, temperatures_norm)
+        tracing.message("Retries:", retries, "Samples:", len(temperatures))
 
-        temp_mean = statistics.mean(temperatures_norm)
-        temp_mode = None
-        try:
-            temp_mode = statistics.mode(temperatures_norm)
-        except:
-            pass # no mode.
-
-        _debug("temps, sd, mean, mode =", temperatures, temperatures_norm, temp_sd, temp_mean, temp_mode)
-        temp_c = temp_mode if temp_mode else temp_mean
-        temp_c = round(temp_c, 1)
-
-        # Humidity
-        humidity_sd = statistics.stdev(humidities)
-        humidity_mean = statistics.mean(humidities)
-        if humidity_sd == 0:
-            humidities_norm = humidities
-        else:
-            humidities_norm = [x for x in humidities if (x > humidity_mean - trim_sd * humidity_sd)]
-            humidities_norm = [x for x in humidities_norm if (x < humidity_mean + trim_sd * humidity_sd)]
+        if fixed:
+            return self._summarise(temperatures, humidities, initial_result)
 
-        _debug("humidities, norm", humidities, humidities_norm)
+        return sampler.result(temperatures, humidities)
 
-        humidity_mean = statistics.mean(humidities_norm)
-        humidity_mode = None
-        try:
-            humidity_mode = statistics.mode(humidities_norm)
-        except:
-            pass # no mode.
 
-        _debug("humidities, sd, mean, mode =", humidities, humidities_norm, humidity_sd, humidity_mean, humidity_mode)
-        humidity = humidity_mode if humidity_mode else humidity_mean
-        humidity = round(humidity, 1)
+    def _summarise(self, temperatures, humidities, initial_result):
+        """
+        Normalise sampled temperatures and humidities into a single result, with sampler.trimmed_mode():
+        values more than 1 standard deviation from the mean are trimmed, then the mode (or mean if there is no mode) is used.
+
+        :param temperatures: valid sampled temperatures (C)
+        :type temperatures: list
+        :param humidities: valid sampled humidities
+        :type humidities: list
+        :param initial_result: first read() result, reported when a verbose tracer is installed
+        :type initial_result: Dictionary
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        """
+        result = Sampler(aggregator=trimmed_mode).result(temperatures, humidities)
 
-        temp_f = (temp_c * 9/5) + 32
-        temp_f = round(temp_f, 1)
-        valid = True # Else would have thrown exception above.
+        tracing.message("temps, humidities =", temperatures, humidities, "->", result['temp_c'], result['humidity'])
 
-        if DEBUG:
-            temp_fixed = initial_result['temp_c'] != temp_c
-            humidity_fixed = initial_result['humidity'] != humidity
+        tracer = tracing.get_tracer()
 
+        if tracer is not None and tracer.verbose:
             result = {
                 'init_temp_c': initial_result['temp_c'],
                 'init_temp_f': initial_result['temp_f'],
                 'init_humidity': initial_result['humidity'],
-                'temp_c': temp_c,
-                'temp_f': temp_f,
-                'temp_fixed': temp_fixed,
-                'humidity': humidity,
-                'humidity_fixed': humidity_fixed,
-                'samples': samples,
-                'valid': valid,
-                'temp_sd': temp_sd,
-                'temp_mean': temp_mean,
-                'temp_mode': temp_mode,
-                'humidity_sd': humidity_sd,
-                'humidity_mean': humidity_mean,
-                'humidity_mode': humidity_mode}
-        else:
-            result = {
-                'temp_c': temp_c,
+                'temp_c': result['temp_c'],
+                'temp_f': result['temp_f'],
+                'temp_fixed': initial_result['temp_c'] != result['temp_c'],
+                'humidity': result['humidity'],
+                'humidity_fixed': initial_result['humidity'] != result['humidity'],
+                'samples': len(temperatures),
+                'valid': result['valid'],
+                'temp_sd': statistics.stdev(temperatures),
+                'temp_mean': statistics.mean(temperatures),
+                'humidity_sd': statistics.stdev(humidities),
+                'humidity_mean': statistics.mean(humidities)}
+
+        return result
+
+
+    def _smooth(self, temperatures, humidities, result):
+        """
+        Add a valid result to a stream's rolling statistics.
+        :return: the result smoothed over the stream's window
+        :rtype: Dictionary
+        """
+        temp_c = round(temperatures.push(result['temp_c']), 1)
+        humidity = round(humidities.push(result['humidity']), 1)
+        temp_f = round((temp_c * 9/5) + 32, 1)
+
+        tracing.message("stream temp sd, humidity sd =", temperatures.stdev, humidities.stdev)
+
+        return {'temp_c': temp_c,
                 'temp_f': temp_f,
                 'humidity': humidity,
-                'valid': valid}
+                'valid': True}
+
+
+    def _filter(self, reading):
+        """
+        Add reading to the estimator.
+        :return: the estimate, or reading as a dictionary if there is none yet. 'valid' is False unless reading was
+                 accepted into the estimate, and 'rejected' is True if reading passed its checksum but was implausible.
+        :rtype: Dictionary
+        """
+        accepted = reading.valid and self.estimator.update(reading.temp_c, reading.humidity, reading.at)
+        estimate = self.estimator.estimate()
+        result = estimate if estimate is not None else reading.as_dict()
+
+        if reading.valid and not accepted:
+            tracing.message("Rejected implausible reading", reading.temp_c, reading.humidity)
+            result['rejected'] = True
+
+        if not accepted:
+            result['valid'] = False # Any estimate is from earlier readings.
 
         return result
 
 
-    def _read(self):
+    def _read(self, timeout_secs=None, raw=False, max_age=None):
         """
         One-Shot read implementation.
-        _read() monitors the read rate self._max)read_rate_secs and will pause between successive calls.
+        _read() monitors the read rate self._max_read_rate_secs and will pause between successive calls.
+        Callers arriving while another thread is reading the sensor join that read and get its result (or exception),
+        rather than queueing for a read of their own.
+        :param timeout_secs: override self.timeout_secs for this read
+        :type timeout_secs: float
+        :param raw: return a Reading rather than a dictionary
+        :type raw: boolean
+        :param max_age: use a shared reading up to this old if another process takes one while we wait for the GPIO
+        :type max_age: float
         :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
         :rtype: Dictionary
         """
+        flight, leading = self._join_flight()
+
+        if not leading:
+            reading = flight.wait(timeout_secs)
+            return reading if raw else reading.as_dict()
+
+        try:
+            reading = self._read_exclusive(self.timeout_secs if timeout_secs is None else timeout_secs, max_age)
+        except BaseException as e:
+            self._end_flight(flight, error=e)
+            raise
+
+        self._end_flight(flight, reading)
+        return reading if raw else reading.as_dict()
+
+
+    def _join_flight(self):
+        """
+        Join the read in progress, or start one. Shared by _read() and AsyncDHT.
+        :return: (flight, leading). The caller leading the flight must read the sensor, then call _end_flight().
+        :rtype: tuple
+        """
+        with self._flight_lock:
+            flight = self._flight
+            leading = flight is None
+            if leading:
+                flight = self._flight = Flight()
+            else:
+                flight.joined += 1
+                tracing.message("Joining read in progress")
+
+        return flight, leading
+
+
+    def _end_flight(self, flight, reading=None, error=None):
+        """
+        Hand the leader's reading, or the exception it raised, to every caller that joined flight.
+        """
+        try:
+            flight.finish(reading, error)
+        finally:
+            with self._flight_lock:
+                self._flight = None
+
+
+    def _read_exclusive(self, timeout_secs, max_age):
+        """
+        _read() for the caller leading a read. Takes the sensor (and GPIO, with shared set) for the read.
+        :return: the reading
+        :rtype: Reading
+        """
+        with self._read_lock:
+            if self.shared is None:
+                return self._read_locked(timeout_secs)
+
+            with self.shared.lock():
+                if max_age is not None:
+                    cached = self.shared.latest(max_age)
+                    if cached is not None:
+                        return cached
+
+                return self._read_locked(timeout_secs)
+
+
+    def _read_locked(self, timeout_secs):
+        """
+        _read() once the GPIO is held by this sensor object (and process).
+        AsyncDHT takes the same steps, awaiting the pauses instead of sleeping.
+        :rtype: Reading
+        """
+        pause_secs = self._prepare_read()
+        if pause_secs > 0:
+            sleep(pause_secs)
+
+        capture, pulse_secs = self._begin_read()
+        if pulse_secs > 0:
+            sleep(pulse_secs)
+        release_secs = self._release_pulse(capture)
+
+        # Wait while the capture's edge callback is called. timeout_secs is only the upper bound,
+        # the capture signals as soon as the frame is complete (or known to be invalid).
+        capture.done.wait(release_secs + timeout_secs)
+
+        return self._end_capture(capture, raw=True)
+
+
+    def _prepare_read(self):
+        """
+        First step of a read, once the GPIO is held: check the circuit breaker and claim the next read slot.
+        :return: seconds to pause before _begin_read(), to honour max_read_rate_secs
+        :rtype: float
+        :raises TimeoutError: If the circuit breaker says the sensor is not responding and is not due a probe
+        """
+        self._check_breaker()
 
         # Throttle reads so we are not reading more than once per self._max_read_rate_secs
-        if (self._last_read_time):
-            elapsed_since_last_read = (datetime.now() - self._last_read_time).microseconds / 1000000
+        pause_secs = self._rate_limiter.reserve(self._max_read_rate_secs)
+        if self.shared is not None:
+            pause_secs = max(pause_secs, self.shared.wait_secs(self._max_read_rate_secs))
+        if pause_secs > 0:
+            tracing.message("Pausing for secs", pause_secs)
+            self.metrics.record_throttle(pause_secs)
+
+        return pause_secs
 
-            if (elapsed_since_last_read < self._max_read_rate_secs):
-                pause_secs = self._max_read_rate_secs - elapsed_since_last_read
-                _debug("Pausing for secs", pause_secs)
-                sleep(pause_secs)
 
-        self._edge_count = 0
-        self._bit_count = 0
-        self.read_success = False
-        self.sensor_responded = False
-        self.data = []
-        self._last_tick = self._pi.get_current_tick()
-        self._last_read_time = datetime.now()
-        self._c0 = self._last_tick
+    def _begin_read(self, on_done=None):
+        """
+        Start a new frame and, unless a trigger times it, pull the line low to start the start pulse. Does not block.
+        Must be followed by _release_pulse() once pulse_secs have passed, then _end_capture().
+        :param on_done: fn() called from the pigpio thread when the frame is done, see Capture.on_done
+        :type on_done: callable
+        :return: (capture, pulse_secs)
+        :rtype: tuple
+        """
+        capture = self._begin_capture()
+        capture.on_done = on_done
 
-        self._edge_callback_fn = self._pi.callback(self.gpio, pigpio.EITHER_EDGE, self._edge_callback)
+        if self.trigger is not None:
+            return capture, 0.0 # The whole pulse is sent by _release_pulse().
 
         self._pi.set_mode(self.gpio, pigpio.OUTPUT)
         self._pi.write(self.gpio, pigpio.LOW)
-        sleep(0.018)  # 18ms pause as per datasheet
+        return capture, 0.018 # 18ms pause as per datasheet
+
+
+    def _release_pulse(self, capture):
+        """
+        End the start pulse (or have the trigger send it) and arm the watchdog. Does not block.
+        :return: seconds until the sensor is released to respond, 0 if it already has been
+        :rtype: float
+        """
+        if self.trigger is not None:
+            release_at = self.trigger.fire([self.gpio])
+            self._arm_watchdog(capture, self.trigger.PULSE_MILLIS)
+            return max(0.0, release_at - monotonic())
+
         #No! self._pi.write(self.gpio, pigpio.HIGH)
         self._pi.set_mode(self.gpio, pigpio.INPUT)
+        self._arm_watchdog(capture)
+        return 0.0
 
-        # Sleep while __edge_callback is called.
-        timer = 0
-        while timer < self.timeout_secs:
-            timer += 0.01
-            sleep(0.01)
 
-        self._edge_callback_fn.cancel()
+    def _check_breaker(self):
+        """
+        :raises TimeoutError: If the circuit breaker says the sensor is not responding and is not due a probe
+        """
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+            raise TimeoutError("{} sensor on GPIO {} has stopped responding. Next attempt in {:.1f} seconds. Check sensor connection.".format(
+                self.__class__.__name__, self.gpio, self.circuit_breaker.wait_secs()))
 
-        if DEBUG:
-            elapsed_secs = (self._c1 - self._c0) / 1000000
-            _debug("Edge Count", self._edge_count)
-            _debug("Data Length", len(self.data))
-            _debug("Round Trip Secs:", elapsed_secs)
-            _debug("Sensor Response?", self.sensor_responded)
-            _debug("Read Success?", self.read_success)
 
-        if not self.sensor_responded:
-            raise TimeoutError("{} sensor on GPIO {} has not responded in {} seconds. Check sensor connection.".format(self.__class__.__name__, self.gpio, self.timeout_secs))
-        elif not self.read_success:
-                # note: self._edge_count == DHTXX.SUCCESS_EDGE_COUNT when self.read_success == True
-                raise TimeoutError("{} sensor on GPIO {} responded but the response was invalid. Check sensor connection or try increasing timeout (currently {} seconds).".format(self.__class__.__name__, self.gpio, self.timeout_secs))
+    def _breaker_secs(self):
+        """
+        :return: seconds until the circuit breaker allows the sensor to be read, 0 if it does now
+        :rtype: float
+        """
+        return 0.0 if self.circuit_breaker is None else self.circuit_breaker.wait_secs()
 
-        return self._parse_data()
 
+    def _arm_watchdog(self, capture, pulse_millis=0):
+        """
+        Have pigpiod report a timeout (level pigpio.TIMEOUT) to capture's edge callback if the line goes quiet, so a missing or
+        truncated response is noticed within watchdog_ms rather than after timeout_secs. Call once the start pulse is released,
+        or as it starts with pulse_millis set to its length.
+        """
+        if self.watchdog_ms:
+            self._pi.set_watchdog(self.gpio, self.watchdog_ms + pulse_millis)
+            capture.watchdog_armed = True
 
-    def _parse_data(self):
+
+    def _throttle_secs(self):
         """
-        Parse data data from sensor into temperature and humidity.
-        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
-        :rtype: Dictionary
+        Time remaining before the sensor may be read again.
+        :return: seconds to pause, 0 if the sensor can be read now
+        :rtype: float
         """
+        pause_secs = self._rate_limiter.wait_secs(self._max_read_rate_secs)
+        if self.shared is not None:
+            pause_secs = max(pause_secs, self.shared.wait_secs(self._max_read_rate_secs))
+        return pause_secs
 
-        bytes = []
-        byte = 0
 
-        for i in range(len(self.data)):
-            bit = self.data[i]
-            byte = (byte << 1) | bit
-            if ((i + 1) % 8 == 0):
-                bytes.append(byte)
-                byte = 0
+    def _cached(self, max_age):
+        """
+        :return: the newest valid reading up to max_age seconds old, or any age if max_age is None, from this process or,
+                 with shared set, any process
+        :rtype: Reading
+        """
+        reading = self.latest_reading
+        if reading is not None and (max_age is None or monotonic() - reading.at <= max_age):
+            return reading
 
-        assert(len(bytes) == 5)
+        if self.shared is not None:
+            return self.shared.latest(max_age)
 
-        if DEBUG:
-            _debug("len(data) =", len(self.data))
-            _debug("data =", self.data)
-            _debug("bytes =", bytes)
+        return None
 
-        humidity = 0
-        temp_c = 0
-        temp_f = 0
 
-        valid = (bytes[0] + bytes[1] + bytes[2] + bytes[3]) & 255 == bytes[4]
+    def _deadline_fallback(self):
+        """
+        :return: the cached reading read(deadline=...) falls back to, as a copy marked 'cached' True with its 'age_secs', or None
+                 if there is none up to deadline_max_age seconds old
+        :rtype: Dictionary
+        """
+        reading = self._cached(self.deadline_max_age)
+        if reading is None:
+            return None
 
-        if self._datum_byte_count == 1:
-            # Data is single byte, eg DHT11
-            temp_c = round(bytes[2])
-            temp_f = round((temp_c * 9/5) + 32, 1)
-            humidity = round(bytes[0], 1)
+        result = reading.as_dict()
+        result['cached'] = True
+        result['age_secs'] = round(monotonic() - reading.at, 1)
+        return result
 
-        else:
-            # Data is 2 bytes, eg DHT22
-            multiplier = 1  # Positive or negative temp multiplier
 
-            if bytes[2] & 0b10000000:
-                multiplier = -1
-                bytes[2] = bytes[2] ^ 0b10000000
+    def _begin_capture(self):
+        """
+        Start a new frame and listen for its edges.
+        Must be followed by the start pulse and then _end_capture().
+        :rtype: Capture
+        """
+        capture = self._new_capture()
+        capture.start(self._pi, self._pi.get_current_tick())
+        return capture
 
-            temp_c =  round(multiplier * float(bytes[2] * 256 + bytes[3]) / 10, 1)
-            temp_f = round((temp_c * 9/5) + 32, 1)
-            humidity = round(float(bytes[0] * 256 + bytes[1]) / 10, 1)
 
-        if not valid:
-            humidity = 0
-            temp_c = 0
-            temp_f = 0
+    def _reset_capture(self):
+        """
+        Start a new frame whose edges will be collected some other way, and passed to its load_edges().
+        Must be followed by the start pulse and then _end_capture().
+        :rtype: Capture
+        """
+        capture = self._new_capture()
+        capture.begin(self._pi.get_current_tick())
+        return capture
 
-        return {'temp_c': temp_c,
-                'temp_f': temp_f,
-                'humidity': humidity,
-                'valid': valid}
+
+    def _new_capture(self):
+        bit_threshold = self.adaptive_threshold.midpoint if self.adaptive_threshold is not None else decoder.BIT_THRESHOLD_MICROS
+        capture = Capture(self.gpio, bit_threshold, keep_widths=self.adaptive_threshold is not None,
+                          keep_trace=self.recorder is not None, tracer=tracing.get_tracer()) # Tracer fixed for the whole frame.
+        self._capture = capture
+        self._rate_limiter.mark()
+        return capture
 
 
-    def _edge_callback(self, gpio, level, tick):
+    def _end_capture(self, capture, raw=False):
         """
-        pigpio callback handler that monitors GPIO pin and collects sensor response.
+        Stop listening for edges and parse the captured frame.
+        :param raw: return a Reading rather than a dictionary
+        :type raw: boolean
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        :raises TimeoutError: If the sensor did not respond, or the response was invalid
         """
+        self._stop_capture(capture)
+
+        if self.adaptive_threshold is not None and capture.read_success:
+            capture.data = self.adaptive_threshold.resolve(capture.widths, capture.data)
+
+        if capture.tracer is not None:
+            elapsed_secs = (capture.c1 - capture.c0) / 1000000
+            tracing.message("Edge Count", capture.edge_count)
+            tracing.message("Data Length", len(capture.data))
+            tracing.message("Round Trip Secs:", elapsed_secs)
+            tracing.message("Sensor Response?", capture.sensor_responded)
+            tracing.message("Read Success?", capture.read_success)
+
+        reading = self._parse_reading(capture) if capture.read_success else None
+
+        if self.recorder is not None and capture.trace_ticks is not None:
+            result = reading.as_dict() if reading is not None else None
+            self.recorder.record(self.gpio, capture.trace_ticks, capture.trace_levels, result, raw=reading and reading.raw)
+
+        if not capture.sensor_responded:
+            outcome = metrics.OUTCOME_TIMEOUT
+        elif not capture.read_success:
+            outcome = metrics.OUTCOME_INVALID
+        elif not reading.valid:
+            outcome = metrics.OUTCOME_CHECKSUM
+        else:
+            outcome = metrics.OUTCOME_VALID
 
-        hl_text = "HIGH" if level == 1 else "LOW" # For debugging output.
+        self.metrics.record_read(outcome, monotonic() - capture.started_at, capture.edge_count)
 
-        if self._edge_count <= 1:
-          _debug(self._edge_count, "RPI->DHT", "Request Data", hl_text)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(capture.sensor_responded)
 
-        elif self._edge_count <= 3:
-          self.sensor_responded = True
-          _debug(self._edge_count, "RPI<-DHT", "Transmission Starting", hl_text)
+        if self.timeseries is not None and reading is not None:
+            self.timeseries.append(reading)
 
-        elif self._edge_count <= 4:
-          # Initial data stream LOW
-          _debug(self._edge_count, "RPI<-DHT", "Data (Initial LOW)", hl_text)
+        if self.shared is not None:
+            self.shared.record(capture.started_at, reading)
 
-        elif self._edge_count <= 84:
-          _debug(self._edge_count, "RPI<-DHT", "Data", hl_text)
+        if not capture.sensor_responded:
+            raise TimeoutError("{} sensor on GPIO {} has not responded in {} seconds. Check sensor connection.".format(self.__class__.__name__, self.gpio, self.timeout_secs))
+        elif not capture.read_success:
+                # note: capture.edge_count == DHTXX.SUCCESS_EDGE_COUNT when capture.read_success == True
+                raise TimeoutError("{} sensor on GPIO {} responded but the response was invalid. Check sensor connection or try increasing timeout (currently {} seconds).".format(self.__class__.__name__, self.gpio, self.timeout_secs))
 
-          elapsed = tick - self._last_tick
-          self._last_tick = tick
+        if reading.valid:
+            self.latest_time = time()
+            self.latest_reading = reading
 
-          if level == 0:
-              bit = 1 if elapsed >= 70 else 0
-              self.data.append(bit)
-              _debug("  Elapsed microseconds={}, so data[{}]={}".format(elapsed, self._bit_count, bit));
-              self._bit_count += 1
+            if self.history is not None:
+                self.history.append(reading)
 
-        else:
-          _debug(self._edge_count, "RPI<-DHT", "Data (Transmiation Complete)", hl_text)
-          self._edge_callback_fn.cancel()
-          self.read_success = len(self.data) == DHTXX.EXPECTED_DATA_BITS
-          self._c1 = self._pi.get_current_tick()
-          assert(level == pigpio.HIGH)  # GPIO is high when transmission is complete (sensor 'free' state per datasheet)
-          assert(self._edge_count == DHTXX.SUCCESS_EDGE_COUNT-1) # -1 because __edge_count += 1 below.
+        return reading if raw else reading.as_dict()
+
+
+    def _stop_capture(self, capture):
+        """
+        Stop listening for edges and disarm the watchdog. Also used to abandon a read part way through.
+        """
+        capture.stop()
+
+        if capture.watchdog_armed:
+            self._pi.set_watchdog(self.gpio, 0)
+            capture.watchdog_armed = False
 
-        self._last_tick = tick
-        self._edge_count += 1
 
+    def _parse_data(self):
+        """
+        Parse data data from sensor into temperature and humidity.
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        """
+        return self._parse_reading().as_dict()
+
+
+    def _parse_reading(self, capture=None):
+        """
+        Parse data from sensor into a Reading, leaving temperature and humidity to be decoded when used.
+        :param capture: frame to parse. Default the latest.
+        :type capture: Capture
+        :rtype: Reading
+        """
+        if capture is None:
+            capture = self._capture
+
+        raw = decoder.bits_to_bytes(capture.data)
 
-def _debug(*texts):
-    if not DEBUG:
-        return
-    print(' '.join(str(t) for t in texts))
+        if capture.tracer is not None:
+            tracing.message("len(data) =", len(capture.data))
+            tracing.message("data =", capture.data)
+            tracing.message("bytes =", list(raw))
 
+        return Reading(raw, self.gpio, monotonic(), self._datum_byte_count)
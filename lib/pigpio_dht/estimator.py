@@ -0,0 +1,176 @@
+from threading import Lock
+
+"""
+Running estimates of temperature and humidity for DHTXX.read_filtered()
+"""
+class KalmanFilter:
+
+    def __init__(self, measurement_sd, drift_sd):
+        """
+        KalmanFilter Constructor.
+        One dimensional filter for a value that drifts as a random walk and is measured with noise.
+
+        :param measurement_sd: standard deviation of the sensor's noise
+        :type measurement_sd: float
+        :param drift_sd: standard deviation of the true value's change over one second
+        :type drift_sd: float
+        """
+        self.measurement_variance = measurement_sd ** 2
+        self.drift_variance = drift_sd ** 2
+        self.estimate = None
+        self.variance = None
+
+
+    def reset(self, value):
+        """
+        Start again from value, trusting it as much as a single measurement.
+        """
+        self.estimate = value
+        self.variance = self.measurement_variance
+
+
+    def update(self, value, elapsed_secs):
+        """
+        Add a measurement taken elapsed_secs after the previous one.
+
+        :return: the new estimate
+        :rtype: float
+        """
+        if self.estimate is None:
+            self.reset(value)
+            return self.estimate
+
+        variance = self.variance + self.drift_variance * max(0.0, elapsed_secs)
+        gain = variance / (variance + self.measurement_variance)
+        self.estimate += gain * (value - self.estimate)
+        self.variance = (1 - gain) * variance
+        return self.estimate
+
+
+class Estimator:
+
+    def __init__(self, temp_range=(-40, 80), humidity_range=(0, 100), max_temp_rate=0.5, max_humidity_rate=2.0,
+                 temp_tolerance=2.0, humidity_tolerance=5.0, max_rejections=3, temp_sd=0.3, humidity_sd=2.0,
+                 temp_drift_sd=0.1, humidity_drift_sd=0.6):
+        """
+        Estimator Constructor.
+        Smooths single readings with a Kalman filter per value, after gating out readings that are physically
+        implausible: outside the sensor's range, or further from the estimate than the value could have changed
+        since the last accepted reading (tolerance + max rate * elapsed seconds). Such readings are usually bit errors
+        that happened to pass the checksum. If max_rejections readings in a row fail the rate gate the conditions are
+        taken to have really changed, and the estimate restarts from the latest reading.
+        With the defaults, and a reading every 2 seconds, the estimate smooths about as much as averaging the last 5 readings.
+
+        :param temp_range: lowest and highest temperature (C) the sensor can report
+        :type temp_range: tuple
+        :param humidity_range: lowest and highest humidity the sensor can report
+        :type humidity_range: tuple
+        :param max_temp_rate: fastest plausible temperature change, C per second
+        :type max_temp_rate: float
+        :param max_humidity_rate: fastest plausible humidity change, % per second
+        :type max_humidity_rate: float
+        :param temp_tolerance: temperature change (C) always allowed between readings
+        :type temp_tolerance: float
+        :param humidity_tolerance: humidity change (%) always allowed between readings
+        :type humidity_tolerance: float
+        :param max_rejections: consecutive rate gate rejections after which the estimate restarts
+        :type max_rejections: integer
+        :param temp_sd: standard deviation of the sensor's temperature noise (C)
+        :type temp_sd: float
+        :param humidity_sd: standard deviation of the sensor's humidity noise (%)
+        :type humidity_sd: float
+        :param temp_drift_sd: standard deviation of the true temperature's change over one second (C)
+        :type temp_drift_sd: float
+        :param humidity_drift_sd: standard deviation of the true humidity's change over one second (%)
+        :type humidity_drift_sd: float
+        """
+        self.temp_range = temp_range
+        self.humidity_range = humidity_range
+        self.max_temp_rate = max_temp_rate
+        self.max_humidity_rate = max_humidity_rate
+        self.temp_tolerance = temp_tolerance
+        self.humidity_tolerance = humidity_tolerance
+        self.max_rejections = max_rejections
+        self._temp_c = KalmanFilter(temp_sd, temp_drift_sd)
+        self._humidity = KalmanFilter(humidity_sd, humidity_drift_sd)
+        self._lock = Lock()
+        self._updated_at = None # Time of the last accepted reading.
+        self.rejections = 0 # Consecutive readings failing the rate gate.
+        self.rejected = 0 # Readings rejected in total.
+
+
+    def update(self, temp_c, humidity, at):
+        """
+        Add a valid reading.
+
+        :param temp_c: temperature read (C)
+        :type temp_c: float
+        :param humidity: humidity read
+        :type humidity: float
+        :param at: monotonic() time of the reading
+        :type at: float
+        :return: True if the reading was accepted into the estimate
+        :rtype: boolean
+        """
+        with self._lock:
+            if not (self.temp_range[0] <= temp_c <= self.temp_range[1] and self.humidity_range[0] <= humidity <= self.humidity_range[1]):
+                self.rejected += 1
+                return False
+
+            if self._updated_at is None:
+                self._restart(temp_c, humidity, at)
+                return True
+
+            elapsed_secs = max(0.0, at - self._updated_at)
+
+            if (abs(temp_c - self._temp_c.estimate) > self.temp_tolerance + self.max_temp_rate * elapsed_secs or
+                    abs(humidity - self._humidity.estimate) > self.humidity_tolerance + self.max_humidity_rate * elapsed_secs):
+                self.rejected += 1
+                self.rejections += 1
+
+                if self.rejections < self.max_rejections:
+                    return False
+
+                self._restart(temp_c, humidity, at) # Consistently different: the conditions really changed.
+                return True
+
+            self.rejections = 0
+            self._temp_c.update(temp_c, elapsed_secs)
+            self._humidity.update(humidity, elapsed_secs)
+            self._updated_at = at
+            return True
+
+
+    def estimate(self):
+        """
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}, or None before the first accepted reading
+        :rtype: Dictionary
+        """
+        with self._lock:
+            if self._updated_at is None:
+                return None
+
+            temp_c = round(self._temp_c.estimate, 1)
+
+            return {'temp_c': temp_c,
+                    'temp_f': round((temp_c * 9/5) + 32, 1),
+                    'humidity': round(self._humidity.estimate, 1),
+                    'valid': True}
+
+
+    def reset(self):
+        """
+        Forget the estimate.
+        """
+        with self._lock:
+            self._updated_at = None
+            self._temp_c.estimate = None
+            self._humidity.estimate = None
+            self.rejections = 0
+
+
+    def _restart(self, temp_c, humidity, at):
+        self._temp_c.reset(temp_c)
+        self._humidity.reset(humidity)
+        self._updated_at = at
+        self.rejections = 0
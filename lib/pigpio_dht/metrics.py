@@ -0,0 +1,217 @@
+import weakref
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+"""
+Read statistics per sensor and per process
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0) # Seconds, for Prometheus histograms.
+RECENT_LATENCIES = 1024 # Latencies kept for percentiles.
+
+OUTCOME_VALID = 'valid'
+OUTCOME_CHECKSUM = 'checksum_failure'
+OUTCOME_INVALID = 'invalid_response'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOMES = (OUTCOME_VALID, OUTCOME_CHECKSUM, OUTCOME_INVALID, OUTCOME_TIMEOUT)
+
+
+class SensorMetrics:
+
+    def __init__(self, sensor, gpio, host=None):
+        """
+        SensorMetrics Constructor.
+        Counters for one sensor. Every DHTXX has one as its metrics attribute, registered with the process-wide REGISTRY.
+
+        :param sensor: sensor type, eg. 'DHT22'
+        :type sensor: string
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param host: pigpiod the sensor is read through, eg. 'localhost:8888', so sensors on the same GPIO of different Pis are told apart
+        :type host: string
+        """
+        self.sensor = sensor
+        self.gpio = gpio
+        self.host = host
+        self._lock = Lock()
+        self.reset()
+
+
+    def reset(self):
+        with self._lock:
+            self.started_at = monotonic()
+            self.outcomes = dict((outcome, 0) for outcome in OUTCOMES)
+            self.edge_counts = {} # Number of frames seen with each edge count.
+            self.throttled_secs = 0.0
+            self.latency_sum = 0.0
+            self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+            self._recent = deque(maxlen=RECENT_LATENCIES)
+
+
+    def record_throttle(self, secs):
+        """
+        Record time spent paused to honour max_read_rate_secs.
+        """
+        with self._lock:
+            self.throttled_secs += secs
+
+
+    def record_read(self, outcome, latency_secs, edge_count):
+        """
+        Record a completed read attempt.
+
+        :param outcome: one of OUTCOMES
+        :type outcome: string
+        :param latency_secs: time from the start pulse to the result
+        :type latency_secs: float
+        :param edge_count: number of edges captured
+        :type edge_count: integer
+        """
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.edge_counts[edge_count] = self.edge_counts.get(edge_count, 0) + 1
+            self.latency_sum += latency_secs
+            self._recent.append(latency_secs)
+
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency_secs <= bound:
+                    self.latency_buckets[i] += 1
+                    break
+
+
+    @property
+    def reads(self):
+        return sum(self.outcomes.values())
+
+
+    def percentile(self, p):
+        """
+        Latency percentile over the most recent RECENT_LATENCIES reads.
+
+        :param p: percentile, 0..100
+        :type p: float
+        :return: seconds, or None before the first read
+        :rtype: float
+        """
+        with self._lock:
+            recent = sorted(self._recent)
+
+        if not recent:
+            return None
+
+        return recent[min(len(recent) - 1, int(round(p / 100.0 * (len(recent) - 1))))]
+
+
+    def as_dict(self):
+        """
+        :return: Dictionary like {'sensor': 'DHT22', 'gpio': 21, 'host': 'localhost:8888', 'reads': 10, 'reads_per_sec': 0.5, 'latency_p50': 0.023, ...}
+        :rtype: Dictionary
+        """
+        reads = self.reads
+        elapsed_secs = monotonic() - self.started_at
+
+        with self._lock:
+            result = {
+                'sensor': self.sensor,
+                'gpio': self.gpio,
+                'host': self.host,
+                'reads': reads,
+                'reads_per_sec': reads / elapsed_secs if elapsed_secs > 0 else 0.0,
+                'throttled_secs': self.throttled_secs,
+                'checksum_failure_rate': self.outcomes[OUTCOME_CHECKSUM] / reads if reads else 0.0,
+                'edge_counts': dict(self.edge_counts)}
+            result.update(self.outcomes)
+
+        result['latency_p50'] = self.percentile(50)
+        result['latency_p99'] = self.percentile(99)
+        return result
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        """
+        MetricsRegistry Constructor.
+        Collects SensorMetrics for aggregation and export. Use the module level REGISTRY.
+        Metrics are held weakly, so they drop out once their sensor is garbage collected.
+        """
+        self._lock = Lock()
+        self._metrics = weakref.WeakSet()
+
+
+    def register(self, metrics):
+        with self._lock:
+            self._metrics.add(metrics)
+        return metrics
+
+
+    def unregister(self, metrics):
+        with self._lock:
+            self._metrics.discard(metrics)
+
+
+    def sensors(self):
+        with self._lock:
+            return sorted(self._metrics, key=lambda metrics: (metrics.sensor, metrics.gpio, metrics.host or ''))
+
+
+    def as_dict(self):
+        """
+        :return: Dictionary with 'sensors' (a list of SensorMetrics.as_dict()) and 'total' counts across all sensors
+        :rtype: Dictionary
+        """
+        sensors = [metrics.as_dict() for metrics in self.sensors()]
+        total = dict((key, sum(s[key] for s in sensors)) for key in ('reads', 'reads_per_sec', 'throttled_secs') + OUTCOMES)
+        total['checksum_failure_rate'] = total[OUTCOME_CHECKSUM] / total['reads'] if total['reads'] else 0.0
+        return {'sensors': sensors, 'total': total}
+
+
+    def prometheus(self):
+        """
+        :return: all sensor metrics in Prometheus text exposition format
+        :rtype: string
+        """
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, kind))
+
+        sensors = self.sensors()
+
+        family('pigpio_dht_reads_total', 'counter', 'Sensor read attempts by outcome.')
+        for metrics in sensors:
+            for outcome in OUTCOMES:
+                lines.append('pigpio_dht_reads_total{{{},outcome="{}"}} {}'.format(_labels(metrics), outcome, metrics.outcomes[outcome]))
+
+        family('pigpio_dht_throttled_seconds_total', 'counter', 'Time spent paused to honour the sensor read rate.')
+        for metrics in sensors:
+            lines.append('pigpio_dht_throttled_seconds_total{{{}}} {}'.format(_labels(metrics), metrics.throttled_secs))
+
+        family('pigpio_dht_frame_edges_total', 'counter', 'Frames captured by number of edges seen.')
+        for metrics in sensors:
+            for edge_count, frames in sorted(metrics.edge_counts.items()):
+                lines.append('pigpio_dht_frame_edges_total{{{},edges="{}"}} {}'.format(_labels(metrics), edge_count, frames))
+
+        family('pigpio_dht_read_latency_seconds', 'histogram', 'Time from start pulse to result.')
+        for metrics in sensors:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, metrics.latency_buckets):
+                cumulative += count
+                lines.append('pigpio_dht_read_latency_seconds_bucket{{{},le="{}"}} {}'.format(_labels(metrics), bound, cumulative))
+            lines.append('pigpio_dht_read_latency_seconds_bucket{{{},le="+Inf"}} {}'.format(_labels(metrics), metrics.reads))
+            lines.append('pigpio_dht_read_latency_seconds_sum{{{}}} {}'.format(_labels(metrics), metrics.latency_sum))
+            lines.append('pigpio_dht_read_latency_seconds_count{{{}}} {}'.format(_labels(metrics), metrics.reads))
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(metrics):
+    if metrics.host is None:
+        return 'sensor="{}",gpio="{}"'.format(metrics.sensor, metrics.gpio)
+
+    return 'sensor="{}",gpio="{}",host="{}"'.format(metrics.sensor, metrics.gpio, metrics.host)
+
+
+REGISTRY = MetricsRegistry()
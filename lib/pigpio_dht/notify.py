@@ -0,0 +1,127 @@
+import os
+import struct
+from select import select
+from time import monotonic
+
+"""
+Bulk edge capture through a pigpio notification pipe
+"""
+class NotifyCapture:
+
+    REPORT_FORMAT = 'HHII' # seqno, flags, tick, level. See pigpio notify_open().
+    REPORT_SIZE = struct.calcsize(REPORT_FORMAT)
+    READ_REPORTS = 512 # Reports fetched per os.read().
+    NTFY_FLAGS_MASK = 0x60 | 0x80 # PI_NTFY_FLAGS_WDOG | PI_NTFY_FLAGS_ALIVE | PI_NTFY_FLAGS_EVENT
+    NTFY_FLAGS_WDOG = 0x20 # Watchdog report. The low 5 bits of flags are the gpio.
+
+    def __init__(self, pi, gpios):
+        """
+        NotifyCapture Constructor.
+        Opens one notification handle for all gpios. Level changes are read from the pipe in bulk and split
+        into per-gpio edge lists, so no Python code runs per edge while a frame is being received.
+        Pipes are local to the Pi, so this cannot be used against a remote pigpiod.
+
+        :param pi: pigpio.pi() instance connected to the local pigpiod
+        :type pi: pigpio
+        :param gpios: BCM Pins to capture
+        :type gpios: list
+        """
+        self._pi = pi
+        self.gpios = list(gpios)
+        self._bits = 0
+        for gpio in self.gpios:
+            self._bits |= 1 << gpio
+
+        self._handle = self._pi.notify_open()
+        if self._handle < 0:
+            raise IOError("Unable to open pigpio notification handle ({}).".format(self._handle))
+
+        self._fd = os.open("/dev/pigpio{}".format(self._handle), os.O_RDONLY | os.O_NONBLOCK)
+        self._pi.notify_begin(self._handle, self._bits)
+        self._last_level = self._pi.read_bank_1()
+        self._buffer = b''
+
+
+    def drain(self):
+        """
+        Discard any pending reports and resynchronise the GPIO levels. Call just before the start pulse.
+        """
+        while select([self._fd], [], [], 0)[0]:
+            if not os.read(self._fd, self.REPORT_SIZE * self.READ_REPORTS):
+                break
+
+        self._buffer = b''
+        self._last_level = self._pi.read_bank_1()
+
+
+    def capture(self, timeout_secs, edges_per_frame):
+        """
+        Collect edges on every gpio until each has edges_per_frame edges, its watchdog fires, or timeout_secs elapses.
+
+        :param timeout_secs: maximum time to wait for the frames
+        :type timeout_secs: float
+        :param edges_per_frame: number of edges in a complete frame
+        :type edges_per_frame: integer
+        :return: Dictionary keyed by gpio of (ticks, levels) lists
+        :rtype: Dictionary
+        """
+        edges = dict((gpio, ([], [])) for gpio in self.gpios)
+        timed_out = set()
+        pending = set(self.gpios)
+        deadline = monotonic() + timeout_secs
+
+        while pending:
+            remaining_secs = deadline - monotonic()
+            if remaining_secs <= 0 or not select([self._fd], [], [], remaining_secs)[0]:
+                break
+
+            chunk = os.read(self._fd, self.REPORT_SIZE * self.READ_REPORTS)
+            if not chunk:
+                break
+
+            self._decode(self._buffer + chunk, edges, timed_out)
+
+            for gpio in list(pending):
+                if len(edges[gpio][0]) >= edges_per_frame or gpio in timed_out:
+                    pending.discard(gpio)
+
+        return edges
+
+
+    def close(self):
+        """
+        Stop notifications and release the handle.
+        """
+        if self._handle is not None:
+            self._pi.notify_close(self._handle)
+            os.close(self._fd)
+            self._handle = None
+
+
+    def _decode(self, data, edges, timed_out):
+        """
+        Split raw reports into per-gpio edges, adding gpios with a watchdog report to timed_out.
+        A trailing partial report is kept for the next call.
+        """
+        whole = len(data) - len(data) % self.REPORT_SIZE
+        self._buffer = data[whole:]
+        last_level = self._last_level
+
+        for seqno, flags, tick, level in struct.iter_unpack(self.REPORT_FORMAT, data[:whole]):
+            if flags & self.NTFY_FLAGS_MASK:
+                if flags & self.NTFY_FLAGS_WDOG:
+                    timed_out.add(flags & 0x1F)
+                continue # Watchdog, keep-alive or event report. Not a level change.
+
+            changed = (level ^ last_level) & self._bits
+            last_level = level
+
+            while changed: # Visit only the gpios that changed, usually one, however many are captured.
+                bit = changed & -changed
+                changed ^= bit
+                gpio = bit.bit_length() - 1
+                ticks, levels = edges[gpio]
+                ticks.append(tick)
+                levels.append((level >> gpio) & 1)
+
+        self._last_level = last_level
@@ -0,0 +1,111 @@
+from threading import Thread, Event
+
+"""
+Background sensor poller
+"""
+class Poller:
+
+    def __init__(self, target, retries=0, samples=1, on_update=None):
+        """
+        Poller Constructor.
+        Repeatedly reads target in a background (daemon) thread so the latest valid reading can be fetched instantly
+        with get_latest(). Reads are paced by the sensors' max_read_rate_secs.
+
+        :param target: a single sensor, or a DHTBus to poll a group of sensors with sweep()
+        :type target: DHTXX or DHTBus
+        :param retries: number of times to retry each read of a single sensor when checksum validation fails
+        :type retries: integer
+        :param samples: poll a single sensor with sample(samples=samples) instead of read() when more than 1
+        :type samples: integer
+        :param on_update: fn(result) called from the polling thread after every read with its result, ie. sensor data,
+                          the sweep() results of a bus, or the TimeoutError or ConnectionError raised
+        :type on_update: callable
+        """
+        self.target = target
+        self.retries = retries
+        self.samples = samples
+        self.on_update = on_update
+        self.errors = 0 # Count of reads that raised TimeoutError or ConnectionError.
+        self._stop = Event()
+        self._thread = None
+
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def start(self):
+        """
+        Start polling.
+        """
+        if self.running:
+            return
+
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="pigpio-dht-poller")
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop(self, timeout_secs=None):
+        """
+        Stop polling and wait for the current read to finish.
+
+        :param timeout_secs: maximum time to wait for the polling thread to finish
+        :type timeout_secs: float
+        """
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout_secs)
+            self._thread = None
+
+
+    def get_latest(self, max_age=None):
+        """
+        Latest valid reading(s) from the target.
+
+        :param max_age: maximum age of a reading in seconds. Default None accepts any age.
+        :type max_age: float
+        :return: see DHTXX.get_latest() and DHTBus.get_latest()
+        """
+        return self.target.get_latest(max_age=max_age)
+
+
+    def _sensors(self):
+        if hasattr(self.target, 'sweep'):
+            return list(self.target.sensors.values())
+        return [self.target]
+
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Wait out the read throttle here, rather than inside read(), so stop() is not held up by it.
+            pause_secs = max([sensor._throttle_secs() for sensor in self._sensors()] + [0])
+            if not hasattr(self.target, 'sweep'):
+                pause_secs = max(pause_secs, self.target._breaker_secs()) # A bus skips sensors whose breaker is open instead.
+
+            if self._stop.wait(pause_secs):
+                break
+
+            try:
+                if hasattr(self.target, 'sweep'):
+                    result = self.target.sweep()
+                elif self.samples > 1:
+                    result = self.target.sample(samples=self.samples)
+                else:
+                    result = self.target.read(retries=self.retries)
+            except (TimeoutError, ConnectionError) as e:
+                self.errors += 1
+                self._updated(e)
+                # Don't spin against a sensor that fails instantly.
+                self._stop.wait(0.1)
+                continue
+
+            self._updated(result)
+
+
+    def _updated(self, result):
+        if self.on_update is not None:
+            self.on_update(result)
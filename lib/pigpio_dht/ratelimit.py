@@ -0,0 +1,85 @@
+from threading import Lock
+from time import monotonic
+
+"""
+Process-wide, per-GPIO read rate limiting
+"""
+class RateLimiter:
+
+    _by_key = {} # Shared instances, see for_gpio().
+    _by_key_lock = Lock()
+
+    def __init__(self):
+        """
+        RateLimiter Constructor.
+        Tracks when a GPIO was last read using the monotonic clock, so limits are not upset by wall clock changes.
+        Use for_gpio() rather than constructing directly so that every sensor object on a GPIO shares one limiter.
+        """
+        self._lock = Lock()
+        self._last_read_at = None # monotonic() of the last (or next reserved) start pulse.
+
+
+    @classmethod
+    def for_gpio(cls, gpio, pi=None):
+        """
+        The process-wide RateLimiter for gpio on the Pi that pi is connected to.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param pi: pigpio.pi() instance. GPIOs on different pigpiod hosts are limited separately.
+        :type pi: pigpio
+        :rtype: RateLimiter
+        """
+        key = (getattr(pi, '_host', None), getattr(pi, '_port', None), gpio)
+
+        with cls._by_key_lock:
+            if key not in cls._by_key:
+                cls._by_key[key] = cls()
+            return cls._by_key[key]
+
+
+    def next_available_at(self, interval_secs):
+        """
+        :param interval_secs: minimum time between reads
+        :type interval_secs: float
+        :return: monotonic() time from which the GPIO may be read again
+        :rtype: float
+        """
+        if self._last_read_at is None:
+            return monotonic()
+        return self._last_read_at + interval_secs
+
+
+    def wait_secs(self, interval_secs):
+        """
+        :param interval_secs: minimum time between reads
+        :type interval_secs: float
+        :return: seconds until the GPIO may be read again, 0 if it may be read now
+        :rtype: float
+        """
+        return max(0.0, self.next_available_at(interval_secs) - monotonic())
+
+
+    def reserve(self, interval_secs):
+        """
+        Claim the next read slot. Concurrent callers are given successive slots, so two sensor objects on the same GPIO
+        never trigger it back to back.
+
+        :param interval_secs: minimum time between reads
+        :type interval_secs: float
+        :return: seconds to wait before reading
+        :rtype: float
+        """
+        with self._lock:
+            now = monotonic()
+            start_at = now if self._last_read_at is None else max(now, self._last_read_at + interval_secs)
+            self._last_read_at = start_at
+            return start_at - now
+
+
+    def mark(self):
+        """
+        Record that the GPIO is being read now.
+        """
+        with self._lock:
+            self._last_read_at = max(monotonic(), self._last_read_at or 0)
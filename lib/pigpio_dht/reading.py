@@ -0,0 +1,185 @@
+from array import array
+from time import monotonic
+from . import decoder
+
+"""
+Compact sensor readings and reading history
+"""
+class Reading:
+
+    __slots__ = ('raw', 'gpio', 'at', 'valid', 'datum_byte_count', '_values')
+
+    def __init__(self, raw, gpio, at, datum_byte_count):
+        """
+        Reading Constructor.
+        One frame from a sensor, kept as its 5 raw bytes. temp_c, temp_f and humidity are decoded on first use.
+
+        :param raw: the 5 raw bytes, including checksum
+        :type raw: bytes
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param at: monotonic() time of the read
+        :type at: float
+        :param datum_byte_count: 1 for DHT11, 2 for DHT22
+        :type datum_byte_count: integer in range 1..2
+        """
+        self.raw = bytes(raw)
+        self.gpio = gpio
+        self.at = at
+        self.valid = decoder.checksum_valid(self.raw)
+        self.datum_byte_count = datum_byte_count
+        self._values = None
+
+
+    @property
+    def temp_c(self):
+        return self._decode()['temp_c']
+
+
+    @property
+    def temp_f(self):
+        return self._decode()['temp_f']
+
+
+    @property
+    def humidity(self):
+        return self._decode()['humidity']
+
+
+    def as_dict(self):
+        """
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}, as returned by DHTXX.read()
+        :rtype: Dictionary
+        """
+        return dict(self._decode())
+
+
+    def _decode(self):
+        if self._values is None:
+            self._values = decoder.decode_raw(self.raw, self.datum_byte_count)
+        return self._values
+
+
+    def __repr__(self):
+        return "Reading(gpio={}, raw={}, valid={})".format(self.gpio, self.raw.hex(), self.valid)
+
+
+class ReadingHistory:
+
+    FIELDS = ('temp_c', 'humidity')
+
+    def __init__(self, capacity=86400):
+        """
+        ReadingHistory Constructor.
+        A ring buffer of the most recent capacity valid readings, stored in array columns (24 bytes per reading).
+        Assign to a sensor's history attribute to keep every valid reading, eg. sensor.history = ReadingHistory()
+
+        :param capacity: number of readings kept. The default is 2 days at one reading every 2 seconds.
+        :type capacity: integer
+        """
+        self.capacity = capacity
+        self._at = array('d', [0.0]) * capacity
+        self._temp_c = array('d', [0.0]) * capacity
+        self._humidity = array('d', [0.0]) * capacity
+        self._start = 0 # Index of the oldest reading.
+        self._count = 0
+
+
+    def __len__(self):
+        return self._count
+
+
+    def append(self, reading):
+        """
+        Add a reading. Readings must be added in time order. Invalid readings are ignored.
+
+        :param reading: the reading
+        :type reading: Reading
+        :return: True if the reading was added
+        :rtype: boolean
+        """
+        if not reading.valid:
+            return False
+
+        if self._count < self.capacity:
+            i = (self._start + self._count) % self.capacity
+            self._count += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        self._at[i] = reading.at
+        self._temp_c[i] = reading.temp_c
+        self._humidity[i] = reading.humidity
+        return True
+
+
+    def values(self, field, secs=None, now=None):
+        """
+        :param field: 'temp_c' or 'humidity'
+        :type field: string
+        :param secs: only readings from the last secs seconds. Default None for all readings.
+        :type secs: float
+        :param now: monotonic() time the window ends at. Default now.
+        :type now: float
+        :return: values of field, oldest first
+        :rtype: list of float
+        :raises ValueError: If field is not one of FIELDS
+        """
+        if field not in ReadingHistory.FIELDS:
+            raise ValueError("field must be one of {}, not {}.".format(ReadingHistory.FIELDS, field))
+
+        column = getattr(self, '_' + field)
+        first = 0 if secs is None else self._first_since((monotonic() if now is None else now) - secs)
+
+        return [column[(self._start + n) % self.capacity] for n in range(first, self._count)]
+
+
+    def min(self, field, secs=None, now=None):
+        """
+        :return: smallest value of field over the window, or None if there are no readings. See values().
+        :rtype: float
+        """
+        values = self.values(field, secs, now)
+        return min(values) if values else None
+
+
+    def max(self, field, secs=None, now=None):
+        """
+        :return: largest value of field over the window, or None if there are no readings. See values().
+        :rtype: float
+        """
+        values = self.values(field, secs, now)
+        return max(values) if values else None
+
+
+    def mean(self, field, secs=None, now=None):
+        """
+        :return: mean of field over the window, or None if there are no readings. See values().
+        :rtype: float
+        """
+        values = self.values(field, secs, now)
+        return sum(values) / len(values) if values else None
+
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+
+
+    def _first_since(self, since):
+        """
+        Binary search for the oldest reading at or after since.
+        :return: position counting from the oldest reading, len(self) if there are none
+        :rtype: integer
+        """
+        low, high = 0, self._count
+
+        while low < high:
+            middle = (low + high) // 2
+            if self._at[(self._start + middle) % self.capacity] < since:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
@@ -0,0 +1,131 @@
+import statistics
+
+"""
+Early-stopping sampling for DHTXX.sample()
+"""
+
+MAD_SCALE = 1.4826 # Makes the median absolute deviation comparable to a standard deviation for normal data.
+
+
+def median(values):
+    """
+    :return: median of values
+    :rtype: float
+    """
+    return statistics.median(values)
+
+
+def mad_trimmed_mean(values, k=3):
+    """
+    Mean of values after dropping those more than k (scaled) median absolute deviations from the median.
+
+    :return: trimmed mean of values
+    :rtype: float
+    """
+    centre = statistics.median(values)
+    mad = statistics.median([abs(x - centre) for x in values]) * MAD_SCALE
+
+    if mad == 0:
+        return centre # More than half the values agree exactly.
+
+    return statistics.mean([x for x in values if abs(x - centre) <= k * mad])
+
+
+def trimmed_mode(values, trim_sd=1):
+    """
+    The DHTXX.sample() default: values more than trim_sd standard deviations from the mean are trimmed,
+    then the mode (or mean if there is no mode) of the rest is used.
+
+    :return: estimate of values
+    :rtype: float
+    """
+    if len(values) < 2:
+        return values[0]
+
+    sd = statistics.stdev(values)
+    mean = statistics.mean(values)
+    if sd != 0:
+        values = [x for x in values if mean - trim_sd * sd < x < mean + trim_sd * sd]
+
+    mode = None
+    try:
+        mode = statistics.mode(values)
+    except statistics.StatisticsError:
+        pass # no mode.
+
+    return mode if mode else statistics.mean(values)
+
+
+AGGREGATORS = {'median': median, 'mad': mad_trimmed_mean, 'trimmed_mode': trimmed_mode}
+
+
+class Sampler:
+
+    def __init__(self, aggregator=trimmed_mode, tolerance=0.1, min_samples=3, max_samples=5):
+        """
+        Sampler Constructor.
+        Decides when DHTXX.sample() has enough readings and combines them. Sampling stops early, once at least
+        min_samples readings have been taken and adding the latest reading moved neither the temperature nor the
+        humidity estimate by more than tolerance. eg. sensor.sample(sampler=Sampler(aggregator=median))
+
+        :param aggregator: fn(values) giving a robust estimate of values, or the name of one in AGGREGATORS
+        :type aggregator: callable or string
+        :param tolerance: largest change in an estimate (degrees C or %RH) that counts as converged. None never stops early.
+        :type tolerance: float
+        :param min_samples: fewest valid readings to take
+        :type min_samples: integer
+        :param max_samples: most valid readings to take
+        :type max_samples: integer
+        :raises ValueError: If aggregator is not known, or min_samples is greater than max_samples
+        """
+        if not callable(aggregator):
+            if aggregator not in AGGREGATORS:
+                raise ValueError("Unknown aggregator {}. Expected one of {}.".format(aggregator, ', '.join(sorted(AGGREGATORS))))
+            aggregator = AGGREGATORS[aggregator]
+
+        if not 1 <= min_samples <= max_samples:
+            raise ValueError("Expected 1 <= min_samples <= max_samples, not {} and {}.".format(min_samples, max_samples))
+
+        self.aggregator = aggregator
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+
+
+    def done(self, temperatures, humidities):
+        """
+        :param temperatures: valid sampled temperatures (C) so far
+        :type temperatures: list
+        :param humidities: valid sampled humidities so far
+        :type humidities: list
+        :return: True once no more readings are needed
+        :rtype: boolean
+        """
+        count = len(temperatures)
+
+        if count >= self.max_samples:
+            return True
+
+        if self.tolerance is None or count < max(2, self.min_samples):
+            return False
+
+        for values in (temperatures, humidities):
+            if abs(self.aggregator(values) - self.aggregator(values[:-1])) > self.tolerance:
+                return False
+
+        return True
+
+
+    def result(self, temperatures, humidities):
+        """
+        Combine sampled readings.
+
+        :return: Sensor data like {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+        :rtype: Dictionary
+        """
+        temp_c = round(self.aggregator(temperatures), 1)
+
+        return {'temp_c': temp_c,
+                'temp_f': round((temp_c * 9/5) + 32, 1),
+                'humidity': round(self.aggregator(humidities), 1),
+                'valid': True}
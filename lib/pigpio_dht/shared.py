@@ -0,0 +1,171 @@
+import fcntl
+import mmap
+import os
+import re
+import struct
+import tempfile
+from contextlib import contextmanager
+from time import monotonic, time
+from .reading import Reading
+
+"""
+Coordinate reads of a GPIO between processes.
+
+Each GPIO has a small state file, memory-mapped by every process using it:
+
+====== ============= ==========================================================
+Format Field         Notes
+====== ============= ==========================================================
+8s     magic
+I      sequence      odd while being written, so readers never see a half written state
+d      last_read_at  monotonic() of the last start pulse, 0 if never read
+d      reading_at    monotonic() of the latest valid reading, 0 if none
+d      reading_time  time() of the latest valid reading
+B      datum_bytes   1 for DHT11, 2 for DHT22
+5s     raw           the latest valid reading's raw bytes
+====== ============= ==========================================================
+
+monotonic() is the system-wide CLOCK_MONOTONIC on Linux, so times are comparable between processes.
+The file is also locked with flock() for the duration of each read, so start pulses from different processes never collide.
+"""
+
+MAGIC = b'PDHTSHM1'
+STATE = struct.Struct('<8sIdddB5s')
+RETRY_READS = 100 # Attempts to get a consistent snapshot while another process is writing.
+
+
+def default_directory():
+    """
+    :return: /dev/shm if available so the state never touches disk, else the temporary directory
+    :rtype: string
+    """
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+class SharedState:
+
+    def __init__(self, gpio, pi=None, directory=None):
+        """
+        SharedState Constructor.
+        Assign to a sensor's shared attribute to coordinate its reads with other processes, eg. sensor.shared = SharedState(21)
+        Every process reading the GPIO must do the same.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param pi: pigpio.pi() instance. GPIOs on different pigpiod hosts have separate state.
+        :type pi: pigpio
+        :param directory: where state files are kept. Default default_directory().
+        :type directory: string
+        """
+        self.gpio = gpio
+        host = re.sub(r'[^A-Za-z0-9_.-]', '_', str(getattr(pi, '_host', None) or 'localhost'))
+        port = getattr(pi, '_port', None) or 8888
+        self.path = os.path.join(directory or default_directory(), 'pigpio-dht-{}-{}-{}.state'.format(host, port, gpio))
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+
+        with self.lock():
+            if os.fstat(self._fd).st_size < STATE.size:
+                os.ftruncate(self._fd, STATE.size)
+            self._mmap = mmap.mmap(self._fd, STATE.size)
+            fields = STATE.unpack_from(self._mmap, 0)
+            if fields[0] != MAGIC or fields[2] > monotonic():
+                # New file, or left over from before a reboot.
+                STATE.pack_into(self._mmap, 0, MAGIC, 0, 0.0, 0.0, 0.0, 0, bytes(5))
+
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold the GPIO exclusively across processes. Use as: with shared.lock(): ...
+        """
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+
+    def acquire(self):
+        """
+        Wait for and take the GPIO. Prefer lock().
+        """
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+
+    def release(self):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+    def last_read_at(self):
+        """
+        :return: monotonic() of the last start pulse from any process, or None
+        :rtype: float
+        """
+        last_read_at = self._snapshot()[2]
+        return last_read_at or None
+
+
+    def wait_secs(self, interval_secs):
+        """
+        :param interval_secs: minimum time between reads
+        :type interval_secs: float
+        :return: seconds until the GPIO may be read again by any process, 0 if it may be read now
+        :rtype: float
+        """
+        last_read_at = self.last_read_at()
+        if last_read_at is None:
+            return 0.0
+        return max(0.0, last_read_at + interval_secs - monotonic())
+
+
+    def latest(self, max_age=None):
+        """
+        The latest valid reading taken by any process.
+
+        :param max_age: maximum age of the reading in seconds. Default None accepts any age.
+        :type max_age: float
+        :return: the reading, or None if there is no reading (young enough)
+        :rtype: Reading
+        """
+        magic, sequence, last_read_at, reading_at, reading_time, datum_byte_count, raw = self._snapshot()
+
+        if not reading_at or (max_age is not None and monotonic() - reading_at > max_age):
+            return None
+
+        return Reading(raw, self.gpio, reading_at, datum_byte_count)
+
+
+    def record(self, read_at, reading=None):
+        """
+        Publish a read. Call while holding lock().
+
+        :param read_at: monotonic() of the start pulse
+        :type read_at: float
+        :param reading: the reading, if valid
+        :type reading: Reading
+        """
+        fields = list(STATE.unpack_from(self._mmap, 0))
+        sequence = fields[1]
+        fields[2] = read_at
+
+        if reading is not None and reading.valid:
+            fields[3:7] = [reading.at, time(), reading.datum_byte_count, reading.raw]
+
+        fields[1] = (sequence + 1) & 0xFFFFFFFF # Odd: writing.
+        struct.pack_into('<I', self._mmap, 8, fields[1])
+        STATE.pack_into(self._mmap, 0, *fields)
+        struct.pack_into('<I', self._mmap, 8, (sequence + 2) & 0xFFFFFFFF)
+
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+
+    def _snapshot(self):
+        for i in range(RETRY_READS):
+            fields = STATE.unpack_from(self._mmap, 0)
+            if fields[1] % 2 == 0 and struct.unpack_from('<I', self._mmap, 8)[0] == fields[1]:
+                return fields
+        return fields # Writer stalled. Use what we have.
@@ -0,0 +1,331 @@
+import itertools
+import pigpio
+import random
+from time import time
+from . import decoder
+
+"""
+Simulated pigpio.pi() with DHT11/DHT22 sensors attached
+"""
+class FakePi:
+
+    def __init__(self, seed=None):
+        """
+        FakePi Constructor.
+        A drop-in replacement for pigpio.pi() that can be passed as the pi= argument of DHT11, DHT22 and DHTBus.
+        Sensors added with add_sensor() answer start pulses with DHT protocol edge trains. Edges are delivered
+        to callbacks synchronously, before the set_mode() call that releases the start pulse returns.
+
+        :param seed: seed for the random faults, for repeatable runs
+        :type seed: integer
+        """
+        self.connected = True
+        self._host = 'simulated' # Like pigpio.pi(), identifies the daemon. Each FakePi is a separate Pi.
+        self._port = next(_ports)
+        self.sensors = {} # Keyed by gpio.
+        self._random = random.Random(seed)
+        self._modes = {}
+        self._levels = {}
+        self._callbacks = {} # Lists of callbacks, keyed by gpio.
+        self._watchdogs = {} # Milliseconds, keyed by gpio.
+        self.scripts = {} # Stored script text, keyed by script id.
+        self._script_ids = itertools.count()
+        self._started = time()
+
+
+    def add_sensor(self, gpio, temp_c=20.0, humidity=40.0, datum_byte_count=2, **faults):
+        """
+        Attach a simulated sensor to gpio.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param temp_c: temperature to report
+        :type temp_c: float
+        :param humidity: humidity to report
+        :type humidity: float
+        :param datum_byte_count: 1 to behave as a DHT11, 2 for a DHT22
+        :type datum_byte_count: integer in range 1..2
+        :param faults: SimulatedSensor fault settings, eg. jitter_micros=10, drop_rate=0.01
+        :return: the simulated sensor, whose attributes can be changed between reads
+        :rtype: SimulatedSensor
+        """
+        return self.attach(gpio, SimulatedSensor(temp_c, humidity, datum_byte_count, **faults))
+
+
+    def attach(self, gpio, sensor):
+        """
+        Attach any object with a respond(released_tick, rng) method returning (level, tick) edges,
+        eg. a SimulatedSensor or trace.ReplayedSensor.
+
+        :return: sensor
+        """
+        self.sensors[gpio] = sensor
+        self._levels[gpio] = pigpio.HIGH
+        return sensor
+
+
+    def get_current_tick(self):
+        return int((time() - self._started) * 1000000) & 0xFFFFFFFF
+
+
+    def set_pull_up_down(self, gpio, pud):
+        return 0
+
+
+    def set_mode(self, gpio, mode):
+        self._modes[gpio] = mode
+
+        if mode == pigpio.INPUT and self._levels.get(gpio, pigpio.HIGH) == pigpio.LOW:
+            # Released from a start pulse. Pull-up takes the line high, then the sensor answers.
+            released = self.get_current_tick()
+            self._edge(gpio, pigpio.HIGH, released)
+
+            sensor = self.sensors.get(gpio)
+            if sensor is not None:
+                for level, tick in sensor.respond(released, self._random):
+                    self._edge(gpio, level, tick)
+                self._levels[gpio] = pigpio.HIGH
+
+        return 0
+
+
+    def set_watchdog(self, user_gpio, wdog_timeout):
+        """
+        The simulated line is idle once set_mode() returns, so arming a watchdog reports a timeout straight away.
+        """
+        self._watchdogs[user_gpio] = wdog_timeout
+
+        if wdog_timeout:
+            for callback in list(self._callbacks.get(user_gpio, ())):
+                callback.func(user_gpio, pigpio.TIMEOUT, self.get_current_tick())
+
+        return 0
+
+
+    def get_mode(self, gpio):
+        return self._modes.get(gpio, pigpio.INPUT)
+
+
+    def write(self, gpio, level):
+        self._modes[gpio] = pigpio.OUTPUT
+
+        if self._levels.get(gpio, pigpio.HIGH) != level:
+            self._edge(gpio, level, self.get_current_tick())
+
+        return 0
+
+
+    def read(self, gpio):
+        return self._levels.get(gpio, pigpio.HIGH)
+
+
+    def read_bank_1(self):
+        bank = 0
+        for gpio, level in self._levels.items():
+            if level:
+                bank |= 1 << gpio
+        return bank
+
+
+    def store_script(self, script):
+        script_id = next(self._script_ids)
+        self.scripts[script_id] = script.decode() if isinstance(script, bytes) else script
+        return script_id
+
+
+    def script_status(self, script_id):
+        return pigpio.PI_SCRIPT_HALTED, []
+
+
+    def run_script(self, script_id, params=None):
+        """
+        Runs the w (write), m (mode) and mils (delay) commands of a stored script, without the delays.
+        Edges are delivered before run_script() returns.
+        """
+        tokens = self.scripts[script_id].split()
+        i = 0
+        while i < len(tokens):
+            command = tokens[i]
+            if command == 'w':
+                self.write(int(tokens[i + 1]), int(tokens[i + 2]))
+                i += 3
+            elif command == 'm':
+                mode = {'r': pigpio.INPUT, 'w': pigpio.OUTPUT}[tokens[i + 2]]
+                self.set_mode(int(tokens[i + 1]), mode)
+                i += 3
+            elif command == 'mils':
+                i += 2
+            else:
+                raise ValueError("FakePi does not support script command {}".format(command))
+        return 0
+
+
+    def delete_script(self, script_id):
+        del self.scripts[script_id]
+        return 0
+
+
+    def callback(self, user_gpio, edge=pigpio.RISING_EDGE, func=None):
+        callback = _FakeCallback(self, user_gpio, edge, func)
+        self._callbacks.setdefault(user_gpio, []).append(callback)
+        return callback
+
+
+    def stop(self):
+        self.connected = False
+
+
+    def _edge(self, gpio, level, tick):
+        self._levels[gpio] = level
+
+        for callback in list(self._callbacks.get(gpio, ())):
+            if callback.wants(level):
+                callback.func(gpio, level, tick)
+
+
+_ports = itertools.count(1) # Stands in for the port of each FakePi's daemon.
+
+
+class SimulatedSensor:
+    """
+    A DHT11 or DHT22 attached to a FakePi
+    """
+
+    def __init__(self, temp_c, humidity, datum_byte_count=2, jitter_micros=0, skew_micros=0, drop_rate=0.0, flip_rate=0.0, responding=True):
+        """
+        :param temp_c: temperature to report
+        :param humidity: humidity to report
+        :param datum_byte_count: 1 to behave as a DHT11, 2 for a DHT22
+        :param jitter_micros: each pulse width is moved by up to +/- this many microseconds
+        :param skew_micros: added to every HIGH data pulse width, eg. -15 for a sensor on a long cable
+        :param drop_rate: probability of each sensor edge being lost
+        :param flip_rate: probability of each data bit being flipped (the checksum is not corrected)
+        :param responding: False to simulate a disconnected sensor
+        """
+        self.temp_c = temp_c
+        self.humidity = humidity
+        self.datum_byte_count = datum_byte_count
+        self.jitter_micros = jitter_micros
+        self.skew_micros = skew_micros
+        self.drop_rate = drop_rate
+        self.flip_rate = flip_rate
+        self.responding = responding
+        self.reads = 0 # Number of start pulses answered.
+
+
+    def respond(self, released_tick, rng):
+        """
+        Edges sent in response to a start pulse released at released_tick.
+        :return: (level, tick) pairs
+        :rtype: list
+        """
+        if not self.responding:
+            return []
+
+        self.reads += 1
+        raw = encode(self.temp_c, self.humidity, self.datum_byte_count)
+        bits = []
+        for byte in raw:
+            for i in range(8):
+                bit = (byte >> (7 - i)) & 1
+                if self.flip_rate and rng.random() < self.flip_rate:
+                    bit ^= 1
+                bits.append(bit)
+
+        edges = []
+        for level, tick in frame_edges(bits, released_tick, self.jitter_micros, rng, self.skew_micros):
+            if self.drop_rate and rng.random() < self.drop_rate:
+                continue
+            edges.append((level, tick))
+
+        return edges
+
+
+def encode(temp_c, humidity, datum_byte_count=2):
+    """
+    The 5 raw bytes a sensor sends for temp_c and humidity.
+
+    :param datum_byte_count: 1 for DHT11, 2 for DHT22
+    :return: raw bytes, including checksum
+    :rtype: bytes
+    """
+    if datum_byte_count == 1:
+        data = [int(round(humidity)) & 255, 0, int(round(temp_c)) & 255, 0]
+    else:
+        humidity_10 = int(round(humidity * 10))
+        temp_10 = int(round(abs(temp_c) * 10))
+        temp_high = (temp_10 >> 8) & 0b01111111
+        if temp_c < 0:
+            temp_high |= 0b10000000
+        data = [(humidity_10 >> 8) & 255, humidity_10 & 255, temp_high, temp_10 & 255]
+
+    return bytes(data + [sum(data) & 255])
+
+
+def frame_edges(bits, released_tick, jitter_micros=0, rng=random, skew_micros=0):
+    """
+    Sensor edges for bits with datasheet timings, starting after the start pulse is released.
+    Together with the two start pulse edges this gives decoder.EDGES_PER_FRAME edges.
+
+    :return: (level, tick) pairs
+    :rtype: list
+    """
+    def width(micros):
+        if jitter_micros:
+            micros += rng.uniform(-jitter_micros, jitter_micros)
+        return max(1, int(micros))
+
+    tick = released_tick
+    edges = []
+
+    def edge(level, micros):
+        nonlocal tick
+        tick = (tick + width(micros)) & 0xFFFFFFFF
+        edges.append((level, tick))
+
+    edge(pigpio.LOW, 30)   # Sensor pulls low after 20-40us.
+    edge(pigpio.HIGH, 80)  # 80us low response.
+    edge(pigpio.LOW, 80)   # 80us high response, then first bit starts.
+
+    for bit in bits:
+        edge(pigpio.HIGH, 50)                   # 50us low bit start.
+        edge(pigpio.LOW, (70 if bit else 26) + skew_micros) # 26-28us high is 0, 70us high is 1.
+
+    edge(pigpio.HIGH, 50)  # Release the bus.
+
+    assert(len(bits) != decoder.DATA_BITS or len(edges) == decoder.EDGES_PER_FRAME - 2)
+    return edges
+
+
+class _FakeCallback:
+    """
+    Stand-in for the object returned by pigpio.pi().callback()
+    """
+
+    def __init__(self, pi, gpio, edge, func):
+        self._pi = pi
+        self.gpio = gpio
+        self.edge = edge
+        self.count = 0
+        self.func = func if func is not None else self._tally
+
+    def wants(self, level):
+        if self.edge == pigpio.RISING_EDGE:
+            return level == pigpio.HIGH
+        if self.edge == pigpio.FALLING_EDGE:
+            return level == pigpio.LOW
+        return True
+
+    def cancel(self):
+        callbacks = self._pi._callbacks.get(self.gpio, [])
+        if self in callbacks:
+            callbacks.remove(self)
+
+    def tally(self):
+        return self.count
+
+    def reset_tally(self):
+        self.count = 0
+
+    def _tally(self, gpio, level, tick):
+        self.count += 1
@@ -0,0 +1,107 @@
+from collections import deque
+from math import sqrt
+
+"""
+Sliding window statistics with O(1) updates
+"""
+class RollingStats:
+
+    def __init__(self, window=5, trim_sd=1):
+        """
+        RollingStats Constructor.
+        Mean and variance are kept with Welford's algorithm (extended to remove values leaving the window).
+        The trimmed estimate clips each new value to within trim_sd standard deviations of the window mean
+        (as measured before the value arrived) and averages the clipped values, approximating the
+        trim-then-average normalisation used by DHTXX.sample() without re-scanning the window.
+
+        :param window: number of most recent values to keep
+        :type window: integer
+        :param trim_sd: number of standard deviations beyond which a value is clipped
+        :type trim_sd: float
+        """
+        assert(window >= 1)
+
+        self.window = window
+        self.trim_sd = trim_sd
+        self._values = deque()
+        self._clipped = deque()
+        self._clipped_sum = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+
+    def __len__(self):
+        return len(self._values)
+
+
+    @property
+    def mean(self):
+        return self._mean
+
+
+    @property
+    def variance(self):
+        """
+        Sample variance of the window, 0 with fewer than 2 values.
+        """
+        n = len(self._values)
+        if n < 2:
+            return 0.0
+        return max(0.0, self._m2 / (n - 1))
+
+
+    @property
+    def stdev(self):
+        return sqrt(self.variance)
+
+
+    @property
+    def trimmed_mean(self):
+        if not self._clipped:
+            return 0.0
+        return self._clipped_sum / len(self._clipped)
+
+
+    def push(self, x):
+        """
+        Add a value, dropping the oldest if the window is full.
+
+        :param x: new value
+        :type x: float
+        :return: the trimmed estimate after adding x
+        :rtype: float
+        """
+        if len(self._values) >= 2:
+            limit = self.trim_sd * self.stdev
+            clipped = min(max(x, self._mean - limit), self._mean + limit) if limit > 0 else x
+        else:
+            clipped = x
+
+        if len(self._values) == self.window:
+            self._remove(self._values.popleft())
+            self._clipped_sum -= self._clipped.popleft()
+
+        self._add(x)
+        self._values.append(x)
+        self._clipped.append(clipped)
+        self._clipped_sum += clipped
+
+        return self.trimmed_mean
+
+
+    def _add(self, x):
+        n = len(self._values) + 1
+        delta = x - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (x - self._mean)
+
+
+    def _remove(self, x):
+        n = len(self._values) # _values has already had x popped.
+        if n == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = x - self._mean
+        self._mean -= delta / n
+        self._m2 -= delta * (x - self._mean)
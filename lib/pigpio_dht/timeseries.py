@@ -0,0 +1,362 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+from threading import Lock
+from time import time, monotonic
+from .reading import Reading
+
+"""
+Compact on-disk history of readings, for SD cards.
+
+One preallocated file, memory-mapped, never grows:
+
+======= ======================================================================
+Offset  Contents
+======= ======================================================================
+0       HEADER, padded to HEADER_BYTES
+4096    capacity RECORD slots, a ring of every reading in the order appended
+...     rollup_capacity ROLLUP slots, a ring of per-gpio min/mean/max summaries of each rollup_secs of valid readings
+======= ======================================================================
+
+Readings are buffered in memory and written in batches, so the card sees a few page writes per batch rather than
+one (or more, with fsync) per reading. Raw readings are kept until the ring wraps, rollups cover a much longer time
+in the same bounded file.
+"""
+
+MAGIC = b'PDHTTSL1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIdIIIId') # magic, version, capacity, rollup_capacity, rollup_secs, head, count, rollup_head, rollup_count, rolled_until
+HEADER_BYTES = 4096
+RECORD = struct.Struct('<dHBB5s3x') # time, gpio, flags, datum_byte_count, raw
+ROLLUP = struct.Struct('<dIH2x6f') # start, count, gpio, temp_c min/mean/max, humidity min/mean/max
+
+FLAG_VALID = 0x01 # The reading's checksum was valid.
+
+
+class LogRecord(namedtuple('LogRecord', 'time gpio flags datum_byte_count raw')):
+    """
+    A reading as stored. time is time() when it was appended.
+    """
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        return bool(self.flags & FLAG_VALID)
+
+    def reading(self):
+        """
+        :return: the stored reading. Its at is the wall clock time() it was appended, not a monotonic() time.
+        :rtype: Reading
+        """
+        return Reading(self.raw, self.gpio, self.time, self.datum_byte_count)
+
+
+Rollup = namedtuple('Rollup', 'start gpio count temp_c_min temp_c_mean temp_c_max humidity_min humidity_mean humidity_max')
+
+
+class TimeSeriesLog:
+
+    def __init__(self, path, capacity=302400, rollup_capacity=105120, rollup_secs=300, batch_size=30, flush_secs=60, readonly=False):
+        """
+        TimeSeriesLog Constructor.
+        Assign to a sensor's timeseries attribute to store every reading it decodes, eg. sensor.timeseries = TimeSeriesLog('/var/lib/dht.tsl')
+        Several sensors can share one log. An existing file must be reopened with the sizes it was created with.
+
+        :param path: log file, created and preallocated if it does not exist
+        :type path: string
+        :param capacity: readings kept at full resolution. The default is 1 week of 1 sensor read every 2 seconds (6MB).
+        :type capacity: integer
+        :param rollup_capacity: rollups kept. The default is 1 year of 1 sensor's 5 minute rollups (4MB).
+        :type rollup_capacity: integer
+        :param rollup_secs: period summarised by each rollup
+        :type rollup_secs: float
+        :param batch_size: readings buffered before they are written to the file
+        :type batch_size: integer
+        :param flush_secs: maximum time a reading is buffered before being written
+        :type flush_secs: float
+        :param readonly: open an existing log to query it, eg. while another process writes to it
+        :type readonly: boolean
+        :raises ValueError: If rollup_secs is not positive, path is not a log, or path was created with different sizes
+        """
+        if not rollup_secs > 0:
+            raise ValueError("rollup_secs must be positive, not {}.".format(rollup_secs))
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_secs = flush_secs
+        self.readonly = readonly
+        self._lock = Lock()
+        self._pending = [] # Records not yet written.
+        self._pending_rollups = [] # Completed rollups not yet written.
+        self._bucket = None # Start of the rollup period being accumulated.
+        self._totals = {} # Running [count, min, sum, max] for temp_c then humidity, keyed by gpio.
+        self._flushed_at = monotonic()
+
+        self._fd = os.open(path, os.O_RDONLY if readonly else os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(self._fd).st_size == 0 and not readonly:
+                self._create(capacity, rollup_capacity, rollup_secs)
+
+            self._open(readonly)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+        if not readonly and (self.capacity, self.rollup_capacity, self.rollup_secs) != (capacity, rollup_capacity, rollup_secs):
+            self._mmap.close()
+            os.close(self._fd)
+            raise ValueError("{} was created with capacity={}, rollup_capacity={}, rollup_secs={}.".format(
+                path, self.capacity, self.rollup_capacity, self.rollup_secs))
+
+        if not readonly:
+            self._resume_rollups()
+
+
+    def append(self, reading, at=None):
+        """
+        Add a reading. Valid readings are also summarised into rollups.
+
+        :param reading: the reading
+        :type reading: Reading
+        :param at: time() the reading was taken. Default now.
+        :type at: float
+        """
+        at = time() if at is None else at
+        record = LogRecord(at, reading.gpio, FLAG_VALID if reading.valid else 0, reading.datum_byte_count, bytes(reading.raw))
+
+        with self._lock:
+            self._pending.append(record)
+
+            if record.valid:
+                self._accumulate(record, reading)
+
+            if len(self._pending) >= self.batch_size or monotonic() - self._flushed_at >= self.flush_secs:
+                self._flush()
+
+
+    def flush(self):
+        """
+        Write buffered readings and completed rollups to the file.
+        """
+        with self._lock:
+            self._flush()
+
+
+    def close(self):
+        """
+        Flush and close the file. Readings in the rollup period in progress are summarised again when the log is reopened.
+        """
+        with self._lock:
+            if self._mmap is None:
+                return
+            if not self.readonly:
+                self._flush()
+            self._mmap.close()
+            self._mmap = None
+            os.close(self._fd)
+
+
+    def records(self, start=None, end=None, gpio=None):
+        """
+        Stored readings, oldest first. Only the readings in range are read from the file.
+
+        :param start: earliest time() to include. Default the oldest.
+        :type start: float
+        :param end: latest time() to include. Default the newest.
+        :type end: float
+        :param gpio: only readings from this BCM Pin. Default all.
+        :type gpio: integer
+        :return: generator of LogRecord
+        :rtype: Generator
+        """
+        with self._lock:
+            pending = list(self._pending)
+            head, count = self._header()[5:7]
+
+        for record in self._scan(self._record_at, head, count, self.capacity, start, end):
+            if gpio is None or record.gpio == gpio:
+                yield record
+
+        for record in pending:
+            if (start is None or record.time >= start) and (end is None or record.time <= end) and (gpio is None or record.gpio == gpio):
+                yield record
+
+
+    def rollups(self, start=None, end=None, gpio=None):
+        """
+        Completed rollups, oldest first. The rollup period in progress is not included.
+
+        :param start: earliest period start time() to include. Default the oldest.
+        :type start: float
+        :param end: latest period start time() to include. Default the newest.
+        :type end: float
+        :param gpio: only rollups of this BCM Pin. Default all.
+        :type gpio: integer
+        :return: generator of Rollup
+        :rtype: Generator
+        """
+        with self._lock:
+            pending = list(self._pending_rollups)
+            head, count = self._header()[7:9]
+
+        for rollup in self._scan(self._rollup_at, head, count, self.rollup_capacity, start, end):
+            if gpio is None or rollup.gpio == gpio:
+                yield rollup
+
+        for rollup in pending:
+            if (start is None or rollup.start >= start) and (end is None or rollup.start <= end) and (gpio is None or rollup.gpio == gpio):
+                yield rollup
+
+
+    def _create(self, capacity, rollup_capacity, rollup_secs):
+        size = HEADER_BYTES + capacity * RECORD.size + rollup_capacity * ROLLUP.size
+
+        try:
+            os.posix_fallocate(self._fd, 0, size) # Reserve the blocks now, so writes never find the card full.
+        except (AttributeError, OSError):
+            os.ftruncate(self._fd, size)
+
+        os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, capacity, rollup_capacity, rollup_secs, 0, 0, 0, 0, 0.0), 0)
+        os.fsync(self._fd)
+
+
+    def _open(self, readonly):
+        header = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+
+        if header[0] != MAGIC or header[1] != VERSION:
+            raise ValueError("{} is not a pigpio-dht time series log.".format(self.path))
+
+        self.capacity, self.rollup_capacity, self.rollup_secs = header[2:5]
+        self._rollup_offset = HEADER_BYTES + self.capacity * RECORD.size
+        size = self._rollup_offset + self.rollup_capacity * ROLLUP.size
+
+        if os.fstat(self._fd).st_size < size:
+            raise ValueError("{} is truncated.".format(self.path))
+
+        self._mmap = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE)
+
+
+    def _header(self):
+        return HEADER.unpack_from(self._mmap, 0)
+
+
+    def _record_at(self, index):
+        return LogRecord._make(RECORD.unpack_from(self._mmap, HEADER_BYTES + index * RECORD.size))
+
+
+    def _rollup_at(self, index):
+        start, count, gpio, *values = ROLLUP.unpack_from(self._mmap, self._rollup_offset + index * ROLLUP.size)
+        return Rollup(start, gpio, count, *values)
+
+
+    def _scan(self, item_at, head, count, capacity, start, end):
+        """
+        Items of a ring in range, found by binary search on their first field (time).
+        """
+        oldest = (head - count) % capacity
+
+        low, high = 0, count
+        if start is not None:
+            while low < high:
+                middle = (low + high) // 2
+                if item_at((oldest + middle) % capacity)[0] < start:
+                    low = middle + 1
+                else:
+                    high = middle
+
+        for n in range(low, count):
+            item = item_at((oldest + n) % capacity)
+            if end is not None and item[0] > end:
+                break
+            yield item
+
+
+    def _accumulate(self, record, reading):
+        bucket = record.time - record.time % self.rollup_secs
+
+        if self._bucket is None:
+            self._bucket = bucket
+        elif bucket > self._bucket:
+            self._close_bucket()
+            self._bucket = bucket
+        # A reading from before the period in progress (the clock went back) is counted in it.
+
+        totals = self._totals.get(record.gpio)
+        if totals is None:
+            totals = self._totals[record.gpio] = [0, None, 0.0, None, None, 0.0, None]
+
+        totals[0] += 1
+        for i, value in ((1, reading.temp_c), (4, reading.humidity)):
+            totals[i] = value if totals[i] is None else min(totals[i], value)
+            totals[i + 1] += value
+            totals[i + 2] = value if totals[i + 2] is None else max(totals[i + 2], value)
+
+
+    def _close_bucket(self):
+        for gpio, (count, temp_min, temp_sum, temp_max, humidity_min, humidity_sum, humidity_max) in sorted(self._totals.items()):
+            self._pending_rollups.append(Rollup(self._bucket, gpio, count, temp_min, temp_sum / count, temp_max,
+                                                humidity_min, humidity_sum / count, humidity_max))
+        self._totals = {}
+
+
+    def _resume_rollups(self):
+        """
+        Re-accumulate the rollup period that was in progress when the log was last closed, from its stored readings.
+        """
+        head, count, rollup_head, rollup_count, rolled_until = self._header()[5:10]
+
+        for record in self._scan(self._record_at, head, count, self.capacity, rolled_until, None):
+            if record.valid:
+                self._accumulate(record, record.reading())
+
+        if self._pending_rollups:
+            self._flush() # Periods completed by readings written before their rollups were.
+
+
+    def _flush(self):
+        magic, version, capacity, rollup_capacity, rollup_secs, head, count, rollup_head, rollup_count, rolled_until = self._header()
+        dirty = [] # (offset, length) ranges written.
+
+        for record in self._pending[-capacity:]:
+            offset = HEADER_BYTES + head * RECORD.size
+            RECORD.pack_into(self._mmap, offset, *record)
+            dirty.append((offset, RECORD.size))
+            head = (head + 1) % capacity
+        count = min(capacity, count + len(self._pending))
+
+        for rollup in self._pending_rollups[-rollup_capacity:]:
+            offset = self._rollup_offset + rollup_head * ROLLUP.size
+            ROLLUP.pack_into(self._mmap, offset, rollup.start, rollup.count, rollup.gpio, *rollup[3:])
+            dirty.append((offset, ROLLUP.size))
+            rollup_head = (rollup_head + 1) % rollup_capacity
+        rollup_count = min(rollup_capacity, rollup_count + len(self._pending_rollups))
+
+        if self._bucket is not None:
+            rolled_until = self._bucket
+
+        # Header last, so a crash part way through leaves the previous batch intact.
+        self._sync(dirty)
+        HEADER.pack_into(self._mmap, 0, magic, version, capacity, rollup_capacity, rollup_secs, head, count, rollup_head, rollup_count, rolled_until)
+        self._sync([(0, HEADER.size)])
+
+        self._pending = []
+        self._pending_rollups = []
+        self._flushed_at = monotonic()
+
+
+    def _sync(self, dirty):
+        """
+        msync() only the pages written, merging neighbouring ranges.
+        """
+        pages = []
+        for offset, length in sorted(dirty):
+            first = offset - offset % mmap.PAGESIZE
+            end = offset + length
+            if pages and first <= pages[-1][1]:
+                pages[-1][1] = max(pages[-1][1], end)
+            else:
+                pages.append([first, end])
+
+        for first, end in pages:
+            self._mmap.flush(first, end - first)
@@ -0,0 +1,212 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+from time import time
+from . import decoder
+
+"""
+Record and replay raw sensor frames.
+
+A trace file is a 16 byte header followed by fixed size records, one per captured frame:
+
+====== ============ ===========================================================
+Format Field        Notes
+====== ============ ===========================================================
+d      time         time() when the frame was recorded
+I      start_tick   tick of the first edge
+B      gpio
+B      flags        FLAG_RESPONDED | FLAG_COMPLETE | FLAG_VALID
+H      edge_count   number of edges captured (at most decoder.EDGES_PER_FRAME)
+5s     raw          decoded bytes, zero if the frame was incomplete
+f      temp_c       decoded temperature, 0 if not valid
+f      humidity     decoded humidity, 0 if not valid
+11s    levels       level after each edge, one bit per edge (edge 0 is bit 0)
+86H    deltas       microseconds since the previous edge, saturated at 65535
+====== ============ ===========================================================
+
+Records are little endian and never change size, so a trace can be appended to safely and memory-mapped for reading.
+"""
+
+MAGIC = b'PDHTTRC1'
+HEADER = struct.Struct('<8sHH4x')
+RECORD = struct.Struct('<dIBBH5sff11s{}H'.format(decoder.EDGES_PER_FRAME))
+VERSION = 1
+
+FLAG_RESPONDED = 0x01
+FLAG_COMPLETE = 0x02
+FLAG_VALID = 0x04
+
+TraceRecord = namedtuple('TraceRecord', 'time gpio start_tick flags ticks levels raw temp_c humidity')
+
+
+class TraceRecorder:
+
+    def __init__(self, path):
+        """
+        TraceRecorder Constructor.
+        Appends frames to the trace file at path, creating it if necessary.
+        Assign to a sensor's recorder attribute to record every frame it captures, eg. sensor.recorder = TraceRecorder('dht.trace')
+
+        :param path: trace file
+        :type path: string
+        """
+        self.path = path
+        self._file = open(path, 'ab')
+
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self._file.flush()
+
+
+    def record(self, gpio, ticks, levels, result=None, raw=None, when=None):
+        """
+        Append one frame.
+
+        :param gpio: BCM Pin of sensor
+        :type gpio: Integer
+        :param ticks: pigpio tick of each edge
+        :type ticks: sequence of integer
+        :param levels: level after each edge
+        :type levels: sequence of integer
+        :param result: decoded sensor data, or None if the frame could not be decoded
+        :type result: Dictionary
+        :param raw: the 5 raw bytes of the frame, if known
+        :type raw: bytes
+        :param when: time() of the frame. Default now.
+        :type when: float
+        """
+        edge_count = min(len(ticks), decoder.EDGES_PER_FRAME)
+        deltas = [0] * decoder.EDGES_PER_FRAME
+        level_bits = 0
+
+        for i in range(edge_count):
+            if i > 0:
+                deltas[i] = min(decoder.tick_diff(ticks[i - 1], ticks[i]), 0xFFFF)
+            if levels[i]:
+                level_bits |= 1 << i
+
+        flags = FLAG_RESPONDED if edge_count > 2 else 0
+        raw = raw or bytes(5)
+        temp_c = 0
+        humidity = 0
+
+        if result is not None:
+            flags |= FLAG_COMPLETE
+            if result['valid']:
+                flags |= FLAG_VALID
+                temp_c = result['temp_c']
+                humidity = result['humidity']
+            raw = result.get('raw', raw)
+
+        self._file.write(RECORD.pack(time() if when is None else when,
+                                     ticks[0] if edge_count else 0,
+                                     gpio, flags, edge_count, raw, temp_c, humidity,
+                                     level_bits.to_bytes(11, 'little'), *deltas))
+
+
+    def flush(self):
+        self._file.flush()
+
+
+    def close(self):
+        self._file.close()
+
+
+class TraceReader:
+
+    def __init__(self, path):
+        """
+        TraceReader Constructor.
+        Memory-maps the trace file at path. Records are decoded only when accessed.
+
+        :param path: trace file
+        :type path: string
+        :raises ValueError: If path is not a trace file
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+
+        if size < HEADER.size:
+            raise ValueError("{} is not a pigpio_dht trace file.".format(path))
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = HEADER.unpack_from(self._mmap, 0)
+
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError("{} is not a pigpio_dht version {} trace file.".format(path, VERSION))
+
+        self._count = (size - HEADER.size) // RECORD.size # Ignore a partly written last record.
+
+
+    def __len__(self):
+        return self._count
+
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("trace record {} out of range".format(i))
+
+        fields = RECORD.unpack_from(self._mmap, HEADER.size + i * RECORD.size)
+        when, start_tick, gpio, flags, edge_count, raw, temp_c, humidity, level_bytes = fields[:9]
+        deltas = fields[9:9 + edge_count]
+        level_bits = int.from_bytes(level_bytes, 'little')
+
+        ticks = []
+        tick = start_tick
+        for delta in deltas:
+            tick = (tick + delta) & 0xFFFFFFFF
+            ticks.append(tick)
+
+        levels = [(level_bits >> e) & 1 for e in range(edge_count)]
+
+        return TraceRecord(when, gpio, start_tick, flags, ticks, levels, raw, temp_c, humidity)
+
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+
+    def replay(self, datum_byte_count, threshold=decoder.BIT_THRESHOLD_MICROS):
+        """
+        Decode every recorded frame again, eg. to check a decoder change against recorded traffic.
+
+        :param datum_byte_count: 1 for DHT11, 2 for DHT22
+        :type datum_byte_count: integer in range 1..2
+        :param threshold: HIGH pulse width in microseconds at or above which a bit is 1
+        :type threshold: integer
+        :return: generator of (TraceRecord, decoded result) pairs
+        :rtype: Generator
+        """
+        for record in self:
+            yield record, decoder.decode_frame(record.ticks, record.levels, datum_byte_count, threshold)
+
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class ReplayedSensor:
+    """
+    Plays recorded frames back through a simulator.FakePi, one frame per start pulse.
+    eg. pi.attach(21, ReplayedSensor(record for record in TraceReader('dht.trace') if record.gpio == 21))
+    """
+
+    def __init__(self, records):
+        self._records = iter(records)
+        self.reads = 0
+
+    def respond(self, released_tick, rng):
+        record = next(self._records, None)
+        if record is None or len(record.ticks) < 2:
+            return []
+
+        self.reads += 1
+        # Recorded edges 0-1 are the start pulse. Shift the sensor's edges to follow this release.
+        offset = released_tick - record.ticks[1]
+        return [(level, (tick + offset) & 0xFFFFFFFF) for tick, level in zip(record.ticks[2:], record.levels[2:])]
@@ -0,0 +1,146 @@
+from array import array
+from collections import namedtuple
+
+"""
+Pluggable tracing of sensor reads.
+
+With no tracer installed (the default) sensors bind a lean edge callback and no trace text is built.
+Install a tracer before reading, eg. tracing.set_tracer(tracing.PrintTracer()), to follow each frame.
+"""
+
+EdgeEvent = namedtuple('EdgeEvent', 'gpio index level delta bit')
+
+NO_BIT = -1 # EdgeEvent.bit for edges that do not end a data bit.
+
+_tracer = None
+
+
+def set_tracer(tracer):
+    """
+    Install the process-wide tracer. Takes effect from the next read.
+
+    :param tracer: the tracer, or None to disable tracing
+    :type tracer: Tracer
+    :return: the previously installed tracer
+    :rtype: Tracer
+    """
+    global _tracer
+    previous = _tracer
+    _tracer = tracer
+    return previous
+
+
+def get_tracer():
+    """
+    :return: the installed tracer, or None if tracing is disabled
+    :rtype: Tracer
+    """
+    return _tracer
+
+
+def message(*texts):
+    """
+    Send a free-form message to the installed tracer. texts are only joined into a string if a tracer is installed.
+    """
+    tracer = _tracer
+    if tracer is not None:
+        tracer.message(' '.join(str(t) for t in texts))
+
+
+class Tracer:
+    """
+    Base tracer, ignores everything. Subclass and override the events of interest.
+    """
+
+    verbose = False # True to have sample() include its intermediate values in the result.
+
+    def message(self, text):
+        pass
+
+    def edge(self, gpio, index, level, delta, bit):
+        """
+        Called from the pigpio callback thread for every edge of a frame, so keep it short.
+
+        :param gpio: BCM Pin of sensor
+        :param index: edge number within the frame, 0 is the start of the start pulse
+        :param level: level after the edge
+        :param delta: microseconds since the previous edge
+        :param bit: the data bit this edge completed, or NO_BIT
+        """
+        pass
+
+
+class PrintTracer(Tracer):
+    """
+    Prints messages and a line per edge.
+    """
+
+    verbose = True
+
+    def message(self, text):
+        print(text)
+
+    def edge(self, gpio, index, level, delta, bit):
+        hl_text = "HIGH" if level == 1 else "LOW"
+
+        if index <= 1:
+            print(index, "RPI->DHT", "Request Data", hl_text)
+        elif index <= 3:
+            print(index, "RPI<-DHT", "Transmission Starting", hl_text)
+        elif index <= 4:
+            print(index, "RPI<-DHT", "Data (Initial LOW)", hl_text)
+        elif index <= 84:
+            print(index, "RPI<-DHT", "Data", hl_text)
+            if bit != NO_BIT:
+                print("  Elapsed microseconds={}, so bit={}".format(delta, bit))
+        else:
+            print(index, "RPI<-DHT", "Data (Transmission Complete)", hl_text)
+
+
+class RingTracer(Tracer):
+
+    def __init__(self, capacity=4096):
+        """
+        RingTracer Constructor.
+        Keeps the most recent capacity edge events in preallocated arrays, so tracing does not allocate per edge.
+
+        :param capacity: number of edge events kept
+        :type capacity: integer
+        """
+        self.capacity = capacity
+        self._gpios = array('B', bytes(capacity))
+        self._indexes = array('B', bytes(capacity))
+        self._levels = array('B', bytes(capacity))
+        self._deltas = array('L', [0]) * capacity
+        self._bits = array('b', bytes(capacity))
+        self.count = 0 # Total events seen, including those overwritten.
+
+
+    def edge(self, gpio, index, level, delta, bit):
+        i = self.count % self.capacity
+        self._gpios[i] = gpio
+        self._indexes[i] = min(index, 255)
+        self._levels[i] = level
+        self._deltas[i] = delta & 0xFFFFFFFF
+        self._bits[i] = bit
+        self.count += 1
+
+
+    def events(self):
+        """
+        :return: the kept events, oldest first
+        :rtype: list of EdgeEvent
+        """
+        kept = min(self.count, self.capacity)
+        first = self.count - kept
+        result = []
+
+        for n in range(first, self.count):
+            i = n % self.capacity
+            result.append(EdgeEvent(self._gpios[i], self._indexes[i], self._levels[i], self._deltas[i], self._bits[i]))
+
+        return result
+
+
+    def clear(self):
+        self.count = 0
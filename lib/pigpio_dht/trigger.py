@@ -0,0 +1,113 @@
+import pigpio
+from collections import OrderedDict
+from threading import Lock
+from time import sleep, monotonic
+
+"""
+Daemon-timed start pulses
+"""
+class ScriptTrigger:
+
+    PULSE_MILLIS = 18 # Start pulse length as per datasheet.
+    MAX_SCRIPTS = 16 # Cached scripts per daemon. pigpiod allows 32 in total.
+    INIT_TIMEOUT_SECS = 1.0 # Longest wait for pigpiod to initialise a new script.
+
+    _by_key = {} # Shared instances, see for_pi().
+    _by_key_lock = Lock()
+
+    def __init__(self, pi):
+        """
+        ScriptTrigger Constructor.
+        Sends start pulses with a pigpio script run by pigpiod, instead of timing the 18ms low pulse in Python between
+        separate socket calls. Firing is a single call, the pulse length is not stretched by a busy Pi or network, and any
+        number of GPIOs are pulled low and released together. A script is stored once for each set of GPIOs and reused.
+
+        A pigpio waveform cannot be used as it cannot switch the GPIO back to an input: the sensor needs the line
+        released to its pull-up, not driven high.
+
+        Use for_pi() rather than constructing directly so every sensor on a daemon shares one script cache.
+        Assign to a sensor's (or DHTBus's) trigger attribute to use it, eg. sensor.trigger = ScriptTrigger.for_pi(pi)
+
+        :param pi: pigpio.pi() instance
+        :type pi: pigpio
+        """
+        self._pi = pi
+        self._lock = Lock()
+        self._scripts = OrderedDict() # Script id keyed by tuple of gpios, least recently used first.
+
+
+    @classmethod
+    def for_pi(cls, pi):
+        """
+        The process-wide ScriptTrigger for the Pi that pi is connected to.
+
+        :param pi: pigpio.pi() instance
+        :type pi: pigpio
+        :rtype: ScriptTrigger
+        """
+        key = (getattr(pi, '_host', None), getattr(pi, '_port', None))
+
+        with cls._by_key_lock:
+            if key not in cls._by_key:
+                cls._by_key[key] = cls(pi)
+            return cls._by_key[key]
+
+
+    def fire(self, gpios):
+        """
+        Start the start pulse on gpios and return straight away. The GPIOs are released PULSE_MILLIS later.
+
+        :param gpios: BCM Pins of sensors
+        :type gpios: list
+        :return: monotonic() time at which the GPIOs are released
+        :rtype: float
+        """
+        gpios = tuple(sorted(gpios))
+
+        with self._lock:
+            script_id = self._script(gpios)
+            self._pi.run_script(script_id)
+            return monotonic() + self.PULSE_MILLIS / 1000
+
+
+    def close(self):
+        """
+        Delete the stored scripts from pigpiod.
+        """
+        with self._lock:
+            for script_id in self._scripts.values():
+                self._pi.delete_script(script_id)
+            self._scripts.clear()
+
+
+    def _script(self, gpios):
+        if gpios in self._scripts:
+            self._scripts.move_to_end(gpios)
+            return self._scripts[gpios]
+
+        if len(self._scripts) >= self.MAX_SCRIPTS:
+            unused_gpios, unused_id = self._scripts.popitem(last=False)
+            self._pi.delete_script(unused_id)
+
+        script_id = self._pi.store_script(script_text(gpios, self.PULSE_MILLIS).encode())
+
+        # pigpiod checks a new script in the background. It cannot be run until then.
+        give_up_at = monotonic() + self.INIT_TIMEOUT_SECS
+        while self._pi.script_status(script_id)[0] == pigpio.PI_SCRIPT_INITING and monotonic() < give_up_at:
+            sleep(0.001)
+
+        self._scripts[gpios] = script_id
+        return script_id
+
+
+def script_text(gpios, pulse_millis=ScriptTrigger.PULSE_MILLIS):
+    """
+    pigpio script that pulls gpios low for pulse_millis, then releases them (switches them to inputs).
+
+    :param gpios: BCM Pins
+    :type gpios: sequence of integer
+    :rtype: string
+    """
+    low = ' '.join('w {} 0'.format(gpio) for gpio in gpios)
+    release = ' '.join('m {} r'.format(gpio) for gpio in gpios)
+    return '{} mils {} {}'.format(low, pulse_millis, release)
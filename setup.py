@@ -24,9 +24,19 @@ setup(
   url = 'https://github.com/garyns/pigpio-dht',
   download_url = 'https://github.com/garyns/pigpio-dht/archive/master.zip',
   keywords = ['DHT11', 'DHT22', 'pigpio', 'Raspberry Pi', 'RaspberryPi'],
+  python_requires = '>=3.5.2', # pigpio_dht.aio, imported by the package, uses async/await and a synchronous __aiter__.
   install_requires = [
           'pigpio'
       ],
+  extras_require = {
+          'numpy': ['numpy'], # Vectorised decoder.decode_frames()
+      },
+  entry_points = {
+          'console_scripts': [
+              'pigpio-dht = pigpio_dht.cli:main',
+              'pigpio-dht-collector = pigpio_dht.collector:main',
+          ],
+      },
   setup_requires = ['wheel'],
   classifiers=[
     'Development Status :: 4 - Beta',  # "3 - Alpha", "4 - Beta" or "5 - Production/Stable" 
@@ -34,7 +44,6 @@ setup(
     'Topic :: Software Development :: Libraries :: Python Modules',
     'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
     'Programming Language :: Python :: 3',  
-    'Programming Language :: Python :: 3.4',
     'Programming Language :: Python :: 3.5',
     'Programming Language :: Python :: 3.6',
   ],
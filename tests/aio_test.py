@@ -0,0 +1,174 @@
+import asyncio
+import pigpio
+import pytest
+from threading import Thread, Timer
+from time import monotonic, sleep
+from pigpio_dht import AsyncDHT
+from pigpio_dht.trigger import ScriptTrigger
+
+GPIO = 21
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_read(make_sensor):
+    dht, simulated = make_sensor(temp_c=19.5, humidity=45.0)
+
+    assert run(AsyncDHT(dht).read()) == {'temp_c': 19.5, 'temp_f': 67.1, 'humidity': 45.0, 'valid': True}
+    assert dht.get_latest()['temp_c'] == 19.5
+    assert dht.metrics.reads == 1
+    assert dht._pi._callbacks[GPIO] == [] # Stopped listening.
+    assert dht._pi._watchdogs[GPIO] == 0
+
+
+def test_read_with_trigger(make_sensor):
+    dht, simulated = make_sensor(temp_c=19.5, humidity=45.0)
+    dht.trigger = ScriptTrigger(dht._pi)
+
+    assert run(AsyncDHT(dht).read())['temp_c'] == 19.5
+    assert list(dht._pi.scripts.values()) == ['w 21 0 mils 18 m 21 r']
+
+
+def test_read_timeout(make_sensor):
+    dht, simulated = make_sensor(responding=False)
+    dht.timeout_secs = 0.05
+
+    with pytest.raises(TimeoutError):
+        run(AsyncDHT(dht).read())
+
+
+def test_reads_are_throttled(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=0.1)
+    sensor = AsyncDHT(dht)
+
+    async def main():
+        await sensor.read()
+        started = monotonic()
+        await sensor.read()
+        return monotonic() - started
+
+    assert run(main()) >= 0.09
+    assert dht.metrics.throttled_secs > 0
+
+
+def test_cancelled_read_releases_the_line(make_sensor):
+    dht, simulated = make_sensor()
+
+    async def main():
+        task = asyncio.ensure_future(AsyncDHT(dht).read())
+        await asyncio.sleep(0.005) # Part way through the start pulse.
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run(main())
+
+    assert dht._pi.get_mode(GPIO) == pigpio.INPUT
+    assert dht._pi._callbacks[GPIO] == []
+    assert dht._pi._watchdogs[GPIO] == 0
+
+
+def test_concurrent_reads_share_one_read(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=0.3, temp_c=19.5, humidity=45.0)
+    sensor = AsyncDHT(dht)
+
+    async def main():
+        return await asyncio.gather(sensor.read(), sensor.read(), sensor.read_filtered())
+
+    first, second, filtered = run(main())
+
+    assert first == second == {'temp_c': 19.5, 'temp_f': 67.1, 'humidity': 45.0, 'valid': True}
+    assert filtered['temp_c'] == 19.5
+    assert dht.metrics.reads == 1
+
+
+def test_read_waits_for_the_sensor(make_sensor):
+    dht, simulated = make_sensor(temp_c=19.5)
+    dht._read_lock.acquire() # As a DHTBus sweep does.
+    Timer(0.05, dht._read_lock.release).start()
+
+    started = monotonic()
+    assert run(AsyncDHT(dht).read())['temp_c'] == 19.5
+    assert monotonic() - started >= 0.04
+
+
+def test_async_read_joins_thread_read(make_sensor):
+    dht, simulated = make_sensor(responding=False)
+    dht.watchdog_ms = 0
+    dht.timeout_secs = 0.3
+    errors = []
+
+    def read():
+        try:
+            dht.read()
+        except TimeoutError as e:
+            errors.append(e)
+
+    thread = Thread(target=read)
+    thread.start()
+    while dht._flight is None:
+        sleep(0.001)
+
+    with pytest.raises(TimeoutError):
+        run(AsyncDHT(dht).read())
+    thread.join()
+
+    assert len(errors) == 1
+    assert dht.metrics.reads == 1
+
+
+def test_cancelled_async_read_fails_joined_reads(make_sensor):
+    dht, simulated = make_sensor(responding=False)
+    dht.watchdog_ms = 0
+    dht.timeout_secs = 5
+    errors = []
+
+    def read():
+        try:
+            dht.read()
+        except TimeoutError as e:
+            errors.append(e)
+
+    async def main():
+        task = asyncio.ensure_future(AsyncDHT(dht).read())
+        await asyncio.sleep(0.05)
+        thread = Thread(target=read) # Joins the async read.
+        thread.start()
+        while dht._flight.joined == 0:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return thread
+
+    started = monotonic()
+    run(main()).join()
+
+    assert monotonic() - started < 1
+    assert len(errors) == 1 and 'cancelled' in str(errors[0])
+    assert dht._flight is None
+    assert dht._read_lock.acquire(False) # Released.
+
+
+def test_stream_smooths_and_skips_invalid_reads(make_sensor):
+    dht, simulated = make_sensor(temp_c=22.5, humidity=50.0)
+    stream = AsyncDHT(dht).stream(window=3)
+
+    async def main():
+        first = await stream.__anext__()
+        simulated.temp_c = 23.0
+        simulated.flip_rate = 1.0 # Fails the checksum until reset.
+        asyncio.get_event_loop().call_later(0.05, setattr, simulated, 'flip_rate', 0.0)
+        return first, await stream.__anext__()
+
+    first, second = run(main())
+
+    assert first == {'temp_c': 22.5, 'temp_f': 72.5, 'humidity': 50.0, 'valid': True}
+    assert 22.5 < second['temp_c'] < 23.0 and second['valid']
+    assert dht.metrics.as_dict()['checksum_failure'] >= 1
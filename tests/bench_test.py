@@ -0,0 +1,38 @@
+import json
+from pigpio_dht import bench
+
+
+def test_main_writes_json(tmp_path):
+    path = str(tmp_path / 'bench.json')
+
+    regressions = bench.main(['--only', 'edge_callback', '--only', 'parse_data', '--only', 'sweep', '--repeat', '1',
+                              '--max-sensors', '4', '--output', path])
+
+    assert regressions == []
+    output = json.load(open(path))
+    assert output['simulated'] is True
+    results = output['results']
+    assert sorted(results) == ['edge_callback_ns', 'parse_data_fps', 'sweep_1_ms', 'sweep_2_ms', 'sweep_4_ms']
+    assert results['parse_data_fps']['better'] == bench.HIGHER
+    assert all(result['value'] > 0 for result in results.values())
+
+
+def test_main_reports_regressions(tmp_path):
+    path = str(tmp_path / 'baseline.json')
+    json.dump({'results': {'edge_callback_ns': {'value': 0.001, 'unit': 'ns/edge', 'better': bench.LOWER}}}, open(path, 'w'))
+
+    regressions = bench.main(['--only', 'edge_callback', '--repeat', '1', '--baseline', path, '--output', str(tmp_path / 'out.json')])
+
+    assert [regression['name'] for regression in regressions] == ['edge_callback_ns']
+
+
+def test_compare_thresholds():
+    baseline = {'read_ms': {'value': 20.0, 'unit': 'ms', 'better': bench.LOWER},
+                'parse_data_fps': {'value': 1000.0, 'unit': 'frames/s', 'better': bench.HIGHER}}
+    results = {'read_ms': {'value': 24.0, 'unit': 'ms', 'better': bench.LOWER},
+               'parse_data_fps': {'value': 700.0, 'unit': 'frames/s', 'better': bench.HIGHER},
+               'sample_secs': {'value': 1.0, 'unit': 's', 'better': bench.LOWER}} # Not in the baseline.
+
+    assert [r['name'] for r in bench.compare(results, baseline, threshold=0.25)] == ['parse_data_fps']
+    assert [r['name'] for r in bench.compare(results, baseline, threshold=0.1)] == ['parse_data_fps', 'read_ms']
+    assert bench.compare(results, baseline, threshold=0.1, thresholds={'read_ms': 0.5, 'parse_data_fps': 0.5}) == []
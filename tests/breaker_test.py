@@ -0,0 +1,73 @@
+import pytest
+from time import time
+from pigpio_dht import DHT22, DHTBus
+from pigpio_dht.breaker import CircuitBreaker
+from pigpio_dht.simulator import FakePi
+
+GPIO = 21
+
+
+def test_breaker_backoff(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('pigpio_dht.breaker.monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, backoff_secs=5, max_backoff_secs=12)
+
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.wait_secs() == 5
+
+    now[0] += 5
+    assert breaker.allow() # Probe.
+    assert not breaker.allow() # Only one probe at a time.
+    breaker.record(False)
+    assert breaker.wait_secs() == 10 # Backoff doubled.
+
+    now[0] += 10
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.wait_secs() == 12 # Capped.
+
+    now[0] += 12
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_dead_sensor_fails_fast(make_sensor):
+    dht, simulated = make_sensor(responding=False)
+    dht.timeout_secs = 5
+
+    for i in range(3):
+        started = time()
+        with pytest.raises(TimeoutError, match="has not responded"):
+            dht.read()
+        assert time() - started < 1 # Watchdog, not timeout_secs.
+
+    assert dht.circuit_breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(TimeoutError, match="stopped responding"):
+        dht.read()
+    assert dht.metrics.as_dict()['timeout'] == 3
+
+
+def test_bus_skips_dead_sensor():
+    pi = FakePi()
+    pi.add_sensor(4, responding=False)
+    pi.add_sensor(GPIO)
+    bus = DHTBus(pi=pi)
+    dead = bus.add(DHT22, 4, max_read_rate_secs=0)
+    dead.circuit_breaker.failure_threshold = 1
+    bus.add(DHT22, GPIO, max_read_rate_secs=0)
+
+    results = bus.sweep()
+    assert isinstance(results[4], TimeoutError)
+    assert results[GPIO]['valid']
+
+    results = bus.sweep()
+    assert "stopped responding" in str(results[4])
+    assert results[GPIO]['valid']
+    assert dead.metrics.as_dict()['timeout'] == 1
@@ -0,0 +1,87 @@
+import pytest
+from time import monotonic
+from pigpio_dht import DHT11, DHT22, DHTBus
+from pigpio_dht.simulator import FakePi
+from pigpio_dht.trigger import ScriptTrigger
+
+
+def make_bus(dht22_rate_secs=0, dht11_rate_secs=0):
+    pi = FakePi(seed=1)
+    bus = DHTBus(pi=pi)
+    pi.add_sensor(21, temp_c=21.5, humidity=45.0)
+    pi.add_sensor(4, temp_c=18.0, humidity=60.0, datum_byte_count=1)
+    bus.add(DHT22, 21, max_read_rate_secs=dht22_rate_secs)
+    bus.add(DHT11, 4, max_read_rate_secs=dht11_rate_secs)
+    return bus
+
+
+def test_add_and_remove():
+    bus = make_bus()
+
+    assert bus.sensors[21]._pi is bus.pi
+    with pytest.raises(ValueError):
+        bus.add(DHT22, 21)
+
+    bus.remove(4)
+    assert list(bus.sweep()) == [21]
+
+    bus.remove(21)
+    assert bus.sweep() == {}
+
+
+def test_sweep():
+    bus = make_bus()
+
+    results = bus.sweep()
+
+    assert results == {21: {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': True},
+                       4: {'temp_c': 18, 'temp_f': 64.4, 'humidity': 60, 'valid': True}}
+    assert bus.get_latest(max_age=60) == results
+    assert bus.sensors[21].metrics.reads == 1
+
+
+def test_sweep_reports_timeouts_per_sensor():
+    bus = make_bus()
+    bus.pi.add_sensor(5, responding=False)
+    bus.add(DHT22, 5).timeout_secs = 0.05
+
+    results = bus.sweep()
+
+    assert results[21]['valid'] and results[4]['valid']
+    assert isinstance(results[5], TimeoutError)
+    assert bus.get_latest()[5] is None
+
+
+def test_sweep_pauses_once_for_read_rate():
+    bus = make_bus(dht22_rate_secs=0.2, dht11_rate_secs=0.1)
+
+    bus.sweep()
+    started = monotonic()
+    bus.sweep()
+    elapsed = monotonic() - started
+
+    assert 0.15 < elapsed < 0.4 # The slowest sensor's interval, paid once.
+    assert bus.sensors[21].metrics.throttled_secs > 0
+    assert bus.sensors[21].metrics.reads == 2
+
+
+def test_sweep_with_trigger():
+    bus = make_bus()
+    bus.trigger = ScriptTrigger(bus.pi)
+
+    results = bus.sweep()
+
+    assert results[21]['temp_c'] == 21.5 and results[4]['humidity'] == 60
+    assert list(bus.pi.scripts.values()) == ['w 4 0 w 21 0 mils 18 m 4 r m 21 r']
+
+
+def test_get_latest_max_age():
+    bus = make_bus()
+    assert bus.get_latest() == {21: None, 4: None}
+
+    bus.sweep()
+    bus.sensors[4].latest_reading.at -= 10
+
+    latest = bus.get_latest(max_age=5)
+    assert latest[21]['temp_c'] == 21.5
+    assert latest[4] is None
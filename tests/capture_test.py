@@ -0,0 +1,82 @@
+import pytest
+import threading
+from pigpio_dht import DHT22
+from pigpio_dht.capture import Flight
+from pigpio_dht.simulator import FakePi, SimulatedSensor
+
+GPIO = 21
+CALLERS = 8
+
+
+class BlockingSensor(SimulatedSensor):
+    """
+    Holds each response until released, so callers can pile up behind a read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def respond(self, released_tick, rng):
+        assert self.release.wait(5)
+        return super().respond(released_tick, rng)
+
+
+def test_concurrent_reads_share_one_frame():
+    pi = FakePi(seed=1)
+    simulated = pi.attach(GPIO, BlockingSensor(21.5, 45.0))
+    dht = DHT22(GPIO, pi=pi)
+    results = []
+
+    def read():
+        results.append(dht.read())
+
+    threads = [threading.Thread(target=read) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+
+    # Wait for every other caller to join the first one's read.
+    for i in range(500):
+        flight = dht._flight
+        if flight is not None and flight.joined == CALLERS - 1:
+            break
+        threading.Event().wait(0.01)
+
+    simulated.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert simulated.reads == 1
+    assert len(results) == CALLERS
+    assert all(result == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': True} for result in results)
+    assert dht._flight is None
+
+
+def test_joined_callers_get_the_exception():
+    flight = Flight()
+    error = TimeoutError("not responding")
+    flight.finish(error=error)
+
+    with pytest.raises(TimeoutError) as e:
+        flight.wait()
+    assert e.value is error
+
+
+def test_joined_caller_gives_up():
+    with pytest.raises(TimeoutError):
+        Flight().wait(0.01)
+
+
+def test_frames_do_not_share_state(make_sensor):
+    dht, simulated = make_sensor()
+
+    dht.read()
+    first = dht._capture
+    dht.read()
+
+    assert dht._capture is not first
+    assert first.edge_count == DHT22.SUCCESS_EDGE_COUNT
+
+    first.edge(GPIO, 0, 0) # A stray edge for a finished frame is ignored.
+    assert first.edge_count == DHT22.SUCCESS_EDGE_COUNT
+    assert len(first.data) == DHT22.EXPECTED_DATA_BITS
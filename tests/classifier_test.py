@@ -0,0 +1,61 @@
+import pytest
+from pigpio_dht import DHT22, decoder
+from pigpio_dht.classifier import AdaptiveThreshold
+from pigpio_dht.simulator import FakePi
+
+GPIO = 21
+
+
+def test_split_threshold():
+    assert decoder.split_threshold([24, 27, 55, 26, 58, 25, 56]) == pytest.approx(40.92, abs=0.01)
+    assert decoder.split_threshold([26, 27, 25, 26]) is None
+    assert decoder.split_threshold([]) is None
+
+
+def test_resolve_recovers_skewed_frame():
+    threshold = AdaptiveThreshold()
+    raw = bytes([2, 146, 1, 13, 162])
+    bits = [(byte >> (7 - i)) & 1 for byte in raw for i in range(8)]
+    widths = [52 if bit else 12 for bit in bits] # 1s too short for the fixed 70us threshold.
+
+    resolved = threshold.resolve(widths, threshold.classify(widths))
+
+    assert resolved == bits
+    assert threshold.recovered == 1
+    assert threshold.midpoint < decoder.BIT_THRESHOLD_MICROS
+
+
+def test_adaptive_threshold_reads_skewed_sensor():
+    pi = FakePi(seed=5)
+    pi.add_sensor(GPIO, temp_c=24.6, humidity=51.3, skew_micros=-18, jitter_micros=4)
+
+    fixed = DHT22(gpio=GPIO, pi=pi, max_read_rate_secs=0)
+    assert fixed.read() != {'temp_c': 24.6, 'temp_f': 76.3, 'humidity': 51.3, 'valid': True}
+
+    adaptive = DHT22(gpio=GPIO, pi=pi, adaptive_threshold=True, max_read_rate_secs=0)
+
+    for _ in range(10):
+        assert adaptive.read() == {'temp_c': 24.6, 'temp_f': 76.3, 'humidity': 51.3, 'valid': True}
+
+    assert adaptive.adaptive_threshold.midpoint < 60
+    assert adaptive.adaptive_threshold is AdaptiveThreshold.for_gpio(GPIO, pi) # Learnt for this Pi only.
+    assert AdaptiveThreshold.for_gpio(GPIO, FakePi()).midpoint == decoder.BIT_THRESHOLD_MICROS
+
+
+def test_midpoint_saved_across_restarts(monkeypatch, tmpdir):
+    monkeypatch.setattr(AdaptiveThreshold, 'directory', str(tmpdir))
+    monkeypatch.setattr(AdaptiveThreshold, '_by_key', {})
+    pi = FakePi()
+    widths = [52 if i % 3 else 12 for i in range(decoder.DATA_BITS)]
+
+    threshold = AdaptiveThreshold.for_gpio(GPIO, pi)
+    for _ in range(10):
+        threshold.learn(widths)
+    assert threshold.path == str(tmpdir.join('pigpio-dht-simulated-{}-{}.threshold'.format(pi._port, GPIO)))
+
+    monkeypatch.setattr(AdaptiveThreshold, '_by_key', {}) # As a new process.
+    restarted = AdaptiveThreshold.for_gpio(GPIO, pi)
+
+    assert restarted is not threshold
+    assert abs(restarted.midpoint - threshold.midpoint) < AdaptiveThreshold.SAVE_CHANGE_MICROS
+    assert restarted.midpoint < 40
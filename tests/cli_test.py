@@ -0,0 +1,59 @@
+import json
+import os
+from pigpio_dht import DHT11, DHT22, DHTBus, Sampler
+from pigpio_dht.cli import main, read_round, ReadingWriter, FORMAT_CSV
+from pigpio_dht.simulator import FakePi
+
+
+def make_pi():
+    pi = FakePi()
+    pi.add_sensor(21, temp_c=21.5, humidity=45.0)
+    pi.add_sensor(4, temp_c=18.0, humidity=60.0, datum_byte_count=1)
+    pi.add_sensor(5, responding=False)
+    return pi
+
+
+def test_main_writes_jsonl(tmp_path):
+    path = str(tmp_path / 'dht.jsonl')
+
+    main(['--dht22', '21', '--dht11', '4', '--dht22', '5', '--interval', '0', '--retries', '0', '--format', 'jsonl',
+          '--output', path, '--count', '1'], pi=make_pi())
+
+    rows = [json.loads(line) for line in open(path)]
+    assert [row['gpio'] for row in rows] == [4, 5, 21]
+    assert rows[0]['sensor'] == 'DHT11' and rows[0]['humidity'] == 60
+    assert rows[1]['valid'] is False and rows[1]['temp_c'] is None
+    assert rows[2]['temp_c'] == 21.5
+
+
+def test_read_round_combines_samples():
+    bus = DHTBus(pi=make_pi())
+    bus.add(DHT22, 21, max_read_rate_secs=0)
+    bus.add(DHT11, 4, max_read_rate_secs=0)
+    bus.add(DHT22, 5, max_read_rate_secs=0)
+
+    results = read_round(bus, samples=3, max_retries=0, sampler=Sampler(aggregator='median'))
+    bus.close()
+
+    assert results[21] == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': True}
+    assert results[4]['humidity'] == 60
+    assert results[5]['valid'] is False
+
+
+def test_writer_buffers_and_rotates(tmp_path):
+    path = str(tmp_path / 'dht.csv')
+    writer = ReadingWriter(path, FORMAT_CSV, flush_secs=3600, rotate_bytes=100, backup_count=2)
+    row = {'time': '2020-01-01T00:00:00', 'sensor': 'DHT22', 'gpio': 21, 'temp_c': 20.0, 'temp_f': 68.0, 'humidity': 40.0, 'valid': True}
+
+    writer.write(row)
+    assert not os.path.exists(path) # Still buffered.
+
+    for i in range(3):
+        writer.write(row)
+        writer.flush()
+    writer.close()
+
+    assert os.path.exists(path + '.1')
+    assert not os.path.exists(path + '.3')
+    with open(path + '.1') as f:
+        assert f.readline().startswith('time,sensor,gpio')
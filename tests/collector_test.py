@@ -0,0 +1,112 @@
+import json
+import pytest
+from time import sleep
+from threading import Thread
+from urllib.request import urlopen
+from pigpio_dht import connection
+from pigpio_dht.collector import Collector, CollectorClient, UnixSocketServer, HTTPCollectorServer
+from pigpio_dht.connection import ConnectionPool
+from pigpio_dht.simulator import FakePi
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    def connect(host, port):
+        pi = FakePi()
+        pi.add_sensor(21, temp_c=21.5, humidity=45.0)
+        pi.add_sensor(4, temp_c=18.0, humidity=60.0, datum_byte_count=1)
+        return pi
+
+    monkeypatch.setattr(connection, 'POOL', ConnectionPool(factory=connect))
+
+    collector = Collector([
+        {'name': 'attic', 'type': 'DHT22', 'gpio': 21, 'max_read_rate_secs': 0.01},
+        {'name': 'garage', 'type': 'DHT11', 'gpio': 4, 'host': 'garage-pi', 'samples': 2, 'max_read_rate_secs': 0.01}])
+
+    collector.start()
+    for i in range(100):
+        if all(entry.result is not None for entry in collector.sensors):
+            break
+        sleep(0.01)
+
+    yield collector
+    collector.stop()
+    assert connection.POOL.connections() == []
+
+
+def serve(server):
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def test_collector_polls_sensors(collector):
+    latest = collector.latest()
+
+    assert sorted(latest) == ['attic', 'garage']
+    assert latest['attic']['temp_c'] == 21.5
+    assert latest['garage']['humidity'] == 60
+    assert latest['garage']['host'] == 'garage-pi'
+    assert collector.latest('cellar') is None
+
+
+def test_unix_socket_client(collector, tmp_path):
+    path = str(tmp_path / 'dht.sock')
+    server = UnixSocketServer(collector, path)
+    serve(server)
+
+    try:
+        with CollectorClient(path) as client:
+            assert client.read('attic')['humidity'] == 45.0
+            assert sorted(client.read()) == ['attic', 'garage']
+            assert client.get_latest('garage', max_age=60)['temp_c'] == 18
+            with pytest.raises(KeyError):
+                client.read('cellar')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unix_socket_takeover(collector, tmp_path):
+    path = str(tmp_path / 'dht.sock')
+    server = UnixSocketServer(collector, path)
+    serve(server)
+
+    try:
+        with pytest.raises(OSError, match="in use"):
+            UnixSocketServer(collector, path) # Still served.
+    finally:
+        server.shutdown()
+        server.socket.close() # Exits without removing the socket file.
+
+    UnixSocketServer(collector, path).server_close() # Stale, so replaced.
+
+
+def test_http(collector):
+    server = HTTPCollectorServer(collector, ('127.0.0.1', 0))
+    serve(server)
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    try:
+        assert json.loads(urlopen(url + '/readings/attic').read())['temp_c'] == 21.5
+        assert 'pigpio_dht_reads_total' in urlopen(url + '/metrics').read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_invalid_config():
+    with pytest.raises(ValueError):
+        Collector([{'type': 'DHT33', 'gpio': 4}])
+
+
+def test_invalid_config_releases_connections(monkeypatch):
+    monkeypatch.setattr(connection, 'POOL', ConnectionPool(factory=lambda host, port: FakePi()))
+
+    with pytest.raises(ValueError):
+        Collector([{'name': 'attic', 'gpio': 21}, {'name': 'garage', 'gpio': 4, 'host': 'garage-pi'}, {'name': 'attic', 'gpio': 5}])
+    with pytest.raises(ValueError):
+        Collector([{'name': 'attic', 'gpio': 21}, {'name': 'cellar', 'gpio': 5, 'colour': 'red'}])
+
+    assert connection.POOL.connections() == []
@@ -1,4 +1,6 @@
 import pytest
+from pigpio_dht import DHT11, DHT22
+from pigpio_dht.simulator import FakePi
 
 def pytest_addoption(parser):
     parser.addoption("--dht11gpio", action="store", default=None)
@@ -17,3 +19,18 @@ def dht22gpio(request):
       return int(gpio)
 
 
+
+@pytest.fixture
+def make_sensor():
+    """
+    Factory for a sensor on its own FakePi: make_sensor(sensor_class=DHT22, gpio=21, **settings) returns (sensor, simulated).
+    settings are SimulatedSensor settings, eg. temp_c=21.5, responding=False, plus seed for the FakePi, max_read_rate_secs
+    (default 0, simulated sensors need no settling time) and sensor_options passed to the sensor's constructor.
+    """
+    def make(sensor_class=DHT22, gpio=21, seed=1, max_read_rate_secs=0, sensor_options=None, **settings):
+        pi = FakePi(seed=seed)
+        settings.setdefault('datum_byte_count', 1 if issubclass(sensor_class, DHT11) else 2)
+        simulated = pi.add_sensor(gpio, **settings)
+        sensor = sensor_class(gpio, pi=pi, max_read_rate_secs=max_read_rate_secs, **(sensor_options or {}))
+        return sensor, simulated
+    return make
@@ -0,0 +1,112 @@
+import pytest
+from pigpio_dht import DHT22, connection
+from pigpio_dht.connection import ConnectionPool
+from pigpio_dht.simulator import FakePi
+
+GPIO = 21
+
+
+class Daemon:
+    """
+    Opens FakePi connections that share one simulated sensor, like pigpiod would.
+    """
+
+    def __init__(self):
+        self.connections = []
+        self.attempts = 0
+        self.running = True
+
+    def connect(self, host, port):
+        self.attempts += 1
+        pi = FakePi()
+        if not self.running:
+            pi.connected = False # As pigpio.pi() when pigpiod is not running.
+            return pi
+        pi.add_sensor(GPIO, temp_c=19.5, humidity=55.0)
+        self.connections.append(pi)
+        return pi
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    daemon = Daemon()
+    monkeypatch.setattr(connection, 'POOL', ConnectionPool(factory=daemon.connect))
+    return daemon
+
+
+def test_sensors_share_one_connection(daemon):
+    sensors = [DHT22(gpio=GPIO) for i in range(3)]
+
+    assert len(daemon.connections) == 1
+    assert all(sensor._pi is sensors[0]._pi for sensor in sensors)
+    assert connection.POOL.connections()[0]._refs == 3
+
+    for sensor in sensors:
+        sensor.close()
+
+    assert connection.POOL.connections() == []
+    assert not daemon.connections[0].connected
+
+
+def test_connection_released_when_sensor_collected(daemon):
+    sensor = DHT22(gpio=GPIO)
+    del sensor
+
+    assert connection.POOL.connections() == []
+
+
+def test_reconnect_after_daemon_restart(daemon):
+    sensor = DHT22(gpio=GPIO, max_read_rate_secs=0)
+    assert sensor.read()['valid']
+
+    daemon.connections[0].stop() # pigpiod went away.
+
+    assert sensor.read()['valid']
+    assert len(daemon.connections) == 2
+    assert sensor._pi.reconnects == 1
+    sensor.close()
+
+
+def test_reconnect_on_socket_error(daemon):
+    shared = connection.POOL.acquire()
+
+    def broken(gpio):
+        raise ConnectionResetError()
+
+    daemon.connections[0].read = broken
+
+    assert shared.read(GPIO) == 1
+    assert len(daemon.connections) == 2
+    connection.POOL.release(shared)
+
+
+def test_daemon_not_running(daemon):
+    daemon.running = False
+
+    with pytest.raises(ConnectionError) as e:
+        DHT22(gpio=GPIO)
+
+    assert 'Is pigpiod running?' in str(e.value)
+    assert daemon.attempts == 1
+    assert connection.POOL.connections() == []
+
+
+def test_reconnects_back_off(daemon):
+    sensor = DHT22(gpio=GPIO, max_read_rate_secs=0)
+
+    daemon.running = False
+    daemon.connections[0].stop() # pigpiod went away.
+
+    with pytest.raises(ConnectionError):
+        sensor.read()
+    with pytest.raises(ConnectionError) as e:
+        sensor.read() # Within the backoff, so not attempted.
+    assert 'Retrying in' in str(e.value)
+    assert daemon.attempts == 2
+
+    daemon.running = True
+    sensor._pi._retry_at = 0 # The backoff has elapsed.
+
+    assert sensor.read()['valid']
+    assert daemon.attempts == 3
+    sensor.close()
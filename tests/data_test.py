@@ -1,5 +1,6 @@
 import pytest
 from pigpio_dht import DHT11, DHT22
+from pigpio_dht.simulator import FakePi
 from time import sleep
 
 def test_dht22_data_parsing():
@@ -7,7 +8,7 @@ def test_dht22_data_parsing():
     data22 = [0,0,0,0,0,0,1,0, 1,0,0,1,0,0,1,0, 0,0,0,0,0,0,0,1, 0,0,0,0,1,1,0,1, 1,0,1,0,0,0,1,0]
    
     GPIO = 21 # GPIO for constructor, but never queried. 
-    dht = DHT22(gpio=GPIO)
+    dht = DHT22(gpio=GPIO, pi=FakePi())
     dht.data = data22
 
     result = dht._parse_data()
@@ -24,7 +25,7 @@ def test_dht22_data_parsing_fail_checksum():
     data22 = [0,0,0,0,0,0,1,0, 1,0,0,1,0,0,1,0, 0,0,0,0,0,0,0,1, 0,0,0,0,1,1,0,1, 1,0,1,0,1,1,1,1]
     
     GPIO = 21 # GPIO for constructor, but never queried. 
-    dht = DHT22(gpio=GPIO)
+    dht = DHT22(gpio=GPIO, pi=FakePi())
     dht.data = data22
 
     result = dht._parse_data()
@@ -41,7 +42,7 @@ def test_dht22_negative_data_parsing():
     data22 = [0,0,0,0,0,0,1,0, 1,0,0,1,0,0,1,0, 1,0,0,0,0,0,0,0, 0,1,1,0,0,1,0,1, 0,1,1,1,1,0,0,1]
 
     GPIO = 21 # GPIO for constructor, but never queried. 
-    dht = DHT22(gpio=GPIO)
+    dht = DHT22(gpio=GPIO, pi=FakePi())
     dht.data = data22
 
     result = dht._parse_data()
@@ -0,0 +1,80 @@
+from pigpio_dht import decoder
+
+def frame_ticks(raw, start=1000):
+    """
+    Edge ticks for a frame carrying raw bytes, with datasheet timings.
+    """
+    ticks = [start, start + 18000, start + 18030, start + 18110, start + 18190]
+    tick = ticks[-1]
+    for byte in raw:
+        for i in range(8):
+            bit = (byte >> (7 - i)) & 1
+            tick += 50 # LOW
+            ticks.append(tick)
+            tick += 70 if bit else 26 # HIGH
+            ticks.append(tick)
+    ticks.append(tick + 50)
+    return ticks
+
+LEVELS = [i % 2 for i in range(decoder.EDGES_PER_FRAME)]
+DHT22_RAW = bytes([0b00000010, 0b10010010, 0b00000001, 0b00001101, 0b10100010])
+
+
+def test_decode_frame_dht22():
+    ticks = frame_ticks(DHT22_RAW)
+    assert len(ticks) == decoder.EDGES_PER_FRAME
+
+    result = decoder.decode_frame(ticks, LEVELS, datum_byte_count=2)
+
+    assert result['raw'] == DHT22_RAW
+    assert result['temp_c'] == 26.9
+    assert result['temp_f'] == 80.4
+    assert result['humidity'] == 65.8
+    assert result['valid'] == True
+
+
+def test_decode_frame_tick_wrap():
+    ticks = frame_ticks(DHT22_RAW, start=0xFFFFFFFF - 18100)
+    ticks = [t & 0xFFFFFFFF for t in ticks]
+
+    result = decoder.decode_frame(ticks, LEVELS, datum_byte_count=2)
+
+    assert result['valid'] == True
+    assert result['temp_c'] == 26.9
+
+
+def test_decode_frame_missing_edge():
+    ticks = frame_ticks(DHT22_RAW)
+    del ticks[40]
+
+    result = decoder.decode_frame(ticks, LEVELS, datum_byte_count=2)
+
+    assert result['valid'] == False
+    assert result['raw'] is None
+
+
+def test_decode_raw_dht11():
+    result = decoder.decode_raw(bytes([35, 0, 20, 0, 55]), datum_byte_count=1)
+
+    assert result == {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+
+
+def test_decode_frames_matches_decode_frame():
+    frames = [frame_ticks(DHT22_RAW), frame_ticks(bytes([2, 146, 128, 101, 121])), frame_ticks(bytes([2, 146, 1, 13, 0]))]
+
+    columns = decoder.decode_frames(frames, datum_byte_count=2)
+
+    for i, ticks in enumerate(frames):
+        expected = decoder.decode_frame(ticks, LEVELS, datum_byte_count=2)
+        assert bool(columns['valid'][i]) == expected['valid']
+        assert columns['temp_c'][i] == expected['temp_c']
+        assert columns['humidity'][i] == expected['humidity']
+
+
+def test_decode_frames_python_fallback(monkeypatch):
+    monkeypatch.setattr(decoder, 'numpy', None)
+
+    columns = decoder.decode_frames([frame_ticks(DHT22_RAW)], datum_byte_count=2)
+
+    assert columns['valid'] == [True]
+    assert columns['temp_c'] == [26.9]
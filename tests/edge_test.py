@@ -4,7 +4,7 @@ from time import time, sleep
 
 EXPECTED_SUCCESS_EDGE_COUNT = 86
 
-pi = pigpio.pi()
+pi = None # Connected on first use so collection does not need pigpiod.
 
 timeout_secs = 0.5
 pause_secs = 2
@@ -33,9 +33,12 @@ def test_count_edges_dht22(dht22gpio):
 
 
 def count(gpio):
-    global edge_count
+    global edge_count, pi
     edge_count = 0
 
+    if pi is None:
+        pi = pigpio.pi()
+
     edge_callback_fn = pi.callback(gpio, pigpio.EITHER_EDGE, edge_callback)
 
     pi.set_mode(gpio, pigpio.OUTPUT)
@@ -0,0 +1,86 @@
+import asyncio
+from pigpio_dht import DHT11
+from pigpio_dht.aio import AsyncDHT
+from pigpio_dht.estimator import Estimator, KalmanFilter
+
+
+def test_kalman_filter_smooths():
+    kalman = KalmanFilter(measurement_sd=0.3, drift_sd=0.1)
+
+    for value in [20.0, 20.6, 19.4, 20.6, 19.4, 20.6, 19.4, 20.6, 19.4]:
+        estimate = kalman.update(value, 2)
+
+    assert abs(estimate - 20.0) < 0.3
+    assert kalman.variance < kalman.measurement_variance
+
+
+def test_rate_gate_rejects_jumps():
+    estimator = Estimator()
+    assert estimator.update(20.0, 40.0, at=0)
+    assert estimator.update(20.2, 41.0, at=2)
+
+    assert not estimator.update(45.6, 41.0, at=4) # A high bit flipped.
+    assert not estimator.update(20.1, 70.0, at=6)
+    assert estimator.estimate()['temp_c'] < 20.2
+    assert estimator.rejected == 2
+
+    assert estimator.update(30.0, 41.0, at=60) # Plausible after long enough.
+
+
+def test_consistent_change_restarts_estimate():
+    estimator = Estimator(max_rejections=3)
+    estimator.update(20.0, 40.0, at=0)
+
+    assert not estimator.update(30.0, 40.0, at=1)
+    assert not estimator.update(30.0, 40.0, at=2)
+    assert estimator.update(30.0, 40.0, at=3)
+    assert estimator.estimate()['temp_c'] == 30.0
+
+
+def test_range_gate():
+    estimator = Estimator(temp_range=(0, 50), humidity_range=(20, 90))
+
+    assert not estimator.update(-10.0, 40.0, at=0)
+    assert not estimator.update(20.0, 95.0, at=0)
+    assert estimator.estimate() is None
+    assert estimator.update(20.0, 40.0, at=0)
+
+
+def test_read_filtered(make_sensor):
+    sensor, simulated = make_sensor(temp_c=21.5, humidity=45.0)
+
+    assert sensor.read_filtered() == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': True}
+
+    simulated.temp_c = 74.3 # Passes the checksum, but cannot be right.
+    assert sensor.read_filtered() == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': False, 'rejected': True}
+
+    simulated.flip_rate = 1.0 # Fails the checksum.
+    assert sensor.read_filtered() == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': False}
+    simulated.flip_rate = 0.0
+
+    simulated.temp_c = 21.7
+    assert 21.5 < sensor.read_filtered()['temp_c'] < 21.7
+
+
+def test_read_filtered_rejects_first_reading_out_of_range(make_sensor):
+    sensor, simulated = make_sensor(temp_c=95.0, humidity=45.0)
+
+    assert sensor.read_filtered() == {'temp_c': 95.0, 'temp_f': 203.0, 'humidity': 45.0, 'valid': False, 'rejected': True}
+
+    simulated.temp_c = 21.5
+    assert sensor.read_filtered()['valid']
+
+
+def test_dht11_outside_datasheet_range(make_sensor):
+    sensor, simulated = make_sensor(DHT11, temp_c=18.0, humidity=95.0)
+
+    for _ in range(5): # Less accurate above 90%, but a real reading.
+        assert sensor.read_filtered() == {'temp_c': 18.0, 'temp_f': 64.4, 'humidity': 95.0, 'valid': True}
+
+
+def test_async_read_filtered(make_sensor):
+    dht, simulated = make_sensor(temp_c=19.0, humidity=50.0)
+    sensor = AsyncDHT(dht)
+
+    result = asyncio.new_event_loop().run_until_complete(sensor.read_filtered())
+    assert result == {'temp_c': 19.0, 'temp_f': 66.2, 'humidity': 50.0, 'valid': True}
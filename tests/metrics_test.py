@@ -0,0 +1,49 @@
+import pytest
+from pigpio_dht import DHT22, METRICS
+from pigpio_dht.simulator import FakePi
+
+GPIO = 21
+
+
+def test_sensor_metrics(make_sensor):
+    dht, simulated = make_sensor()
+    dht.timeout_secs = 0.05
+
+    dht.read()
+    dht.read()
+    simulated.flip_rate = 1.0
+    dht.read()
+    simulated.responding = False
+    with pytest.raises(TimeoutError):
+        dht.read()
+
+    metrics = dht.metrics.as_dict()
+
+    assert metrics['reads'] == 4
+    assert metrics['valid'] == 2
+    assert metrics['checksum_failure'] == 1
+    assert metrics['timeout'] == 1
+    assert metrics['checksum_failure_rate'] == 0.25
+    assert metrics['edge_counts'] == {86: 3, 2: 1}
+    assert 0 < metrics['latency_p50'] <= metrics['latency_p99']
+
+    assert dht.metrics in METRICS.sensors()
+    assert METRICS.as_dict()['total']['reads'] >= 4
+
+    text = METRICS.prometheus()
+    assert '# TYPE pigpio_dht_read_latency_seconds histogram' in text
+    labels = 'sensor="DHT22",gpio="21",host="simulated:{}"'.format(dht._pi._port)
+    assert 'pigpio_dht_reads_total{' + labels + ',outcome="checksum_failure"} 1' in text
+    assert 'pigpio_dht_read_latency_seconds_count{' + labels + '} 4' in text
+
+
+def test_sensors_on_different_pis_are_labelled_apart():
+    first = DHT22(gpio=GPIO, pi=FakePi())
+    second = DHT22(gpio=GPIO, pi=FakePi())
+
+    assert first.metrics.host != second.metrics.host
+    assert first.metrics.as_dict()['host'] == 'simulated:{}'.format(first._pi._port)
+
+    text = METRICS.prometheus()
+    assert 'pigpio_dht_reads_total{{sensor="DHT22",gpio="21",host="{}",outcome="valid"}} 0'.format(first.metrics.host) in text
+    assert 'pigpio_dht_reads_total{{sensor="DHT22",gpio="21",host="{}",outcome="valid"}} 0'.format(second.metrics.host) in text
@@ -0,0 +1,154 @@
+import os
+import struct
+import pytest
+from pigpio_dht import DHT11, DHT22, DHTBus
+from pigpio_dht import notify
+from pigpio_dht.notify import NotifyCapture
+from pigpio_dht.simulator import FakePi
+
+PIPE_PATH = '/dev/pigpio0'
+
+
+class NotifyingPi(FakePi):
+    """
+    FakePi with a pigpio notification pipe: every level change and watchdog is also written to the pipe as a report.
+    """
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self._pipe = None
+        self._notify_bits = 0
+        self._seqno = 0
+
+    def notify_open(self):
+        self._pipe = os.pipe()
+        return 0
+
+    def notify_begin(self, handle, bits):
+        self._notify_bits = bits
+        return 0
+
+    def notify_close(self, handle):
+        os.close(self._pipe[0])
+        os.close(self._pipe[1])
+        self._pipe = None
+        return 0
+
+    def set_watchdog(self, user_gpio, wdog_timeout):
+        if wdog_timeout and self._notify_bits & (1 << user_gpio):
+            self._report(NotifyCapture.NTFY_FLAGS_WDOG | user_gpio, self.get_current_tick())
+        return super().set_watchdog(user_gpio, wdog_timeout)
+
+    def _edge(self, gpio, level, tick):
+        super()._edge(gpio, level, tick)
+        if self._notify_bits & (1 << gpio):
+            self._report(0, tick)
+
+    def _report(self, flags, tick):
+        os.write(self._pipe[1], struct.pack('HHII', self._seqno & 0xFFFF, flags, tick, self.read_bank_1()))
+        self._seqno += 1
+
+
+@pytest.fixture
+def pipe_open(monkeypatch):
+    """
+    Opens the NotifyingPi's pipe in place of /dev/pigpio0.
+    """
+    opened = []
+    real_open = os.open
+
+    def fake_open(path, flags, *args):
+        if path == PIPE_PATH:
+            return os.dup(opened[0]._pipe[0])
+        return real_open(path, flags, *args)
+
+    monkeypatch.setattr(notify.os, 'open', fake_open)
+    return opened
+
+
+def report(tick, level, flags=0, seqno=0):
+    return struct.pack('HHII', seqno, flags, tick, level)
+
+
+def make_capture(pipe_open, gpios):
+    pi = NotifyingPi()
+    pipe_open.append(pi)
+    return NotifyCapture(pi, gpios)
+
+
+def test_decode_splits_reports_by_gpio(pipe_open):
+    capture = make_capture(pipe_open, [4, 21])
+    capture._last_level = (1 << 4) | (1 << 21)
+    edges = {4: ([], []), 21: ([], [])}
+    timed_out = set()
+
+    data = (report(100, 1 << 4) + # 21 low
+            report(150, 0) + # 4 low
+            report(180, 0) + # No change
+            report(200, (1 << 4) | (1 << 21) | (1 << 7))) # Both high. Other gpios are ignored.
+
+    capture._decode(data, edges, timed_out)
+
+    assert edges[4] == ([150, 200], [0, 1])
+    assert edges[21] == ([100, 200], [0, 1])
+    assert not timed_out
+    assert capture._last_level == (1 << 4) | (1 << 21) | (1 << 7)
+    capture.close()
+
+
+def test_decode_flags(pipe_open):
+    capture = make_capture(pipe_open, [4, 21])
+    capture._last_level = 0
+    edges = {4: ([], []), 21: ([], [])}
+    timed_out = set()
+
+    data = (report(100, 0, flags=NotifyCapture.NTFY_FLAGS_WDOG | 21) +
+            report(110, 1 << 4, flags=0x40) + # Keep-alive, not a level change.
+            report(120, 1 << 4, flags=0x80 | 3) + # Event.
+            report(130, 1 << 21))
+
+    capture._decode(data, edges, timed_out)
+
+    assert timed_out == {21}
+    assert edges[4] == ([], [])
+    assert edges[21] == ([130], [1])
+    capture.close()
+
+
+def test_decode_buffers_partial_report(pipe_open):
+    capture = make_capture(pipe_open, [21])
+    capture._last_level = 0
+    edges = {21: ([], [])}
+    data = report(100, 1 << 21) + report(200, 0) + report(300, 1 << 21)
+
+    capture._decode(data[:17], edges, set())
+    assert capture._buffer == data[12:17]
+    assert edges[21] == ([100], [1])
+
+    capture._decode(capture._buffer + data[17:], edges, set())
+    assert capture._buffer == b''
+    assert edges[21] == ([100, 200, 300], [1, 0, 1])
+    capture.close()
+
+
+def test_notify_bus_sweep(pipe_open):
+    pi = NotifyingPi(seed=1)
+    pipe_open.append(pi)
+    pi.add_sensor(21, temp_c=21.5, humidity=45.0)
+    pi.add_sensor(4, temp_c=18.0, humidity=60.0, datum_byte_count=1)
+    pi.add_sensor(5, responding=False)
+
+    bus = DHTBus(pi=pi, capture=DHTBus.CAPTURE_NOTIFY)
+    for sensor_class, gpio in ((DHT22, 21), (DHT11, 4), (DHT22, 5)):
+        bus.add(sensor_class, gpio, max_read_rate_secs=0)
+
+    for _ in range(2): # The second sweep reuses the open pipe.
+        results = bus.sweep()
+
+        assert results[21] == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': True}
+        assert results[4] == {'temp_c': 18, 'temp_f': 64.4, 'humidity': 60, 'valid': True}
+        assert isinstance(results[5], TimeoutError)
+
+    assert bus._notify is not None
+    bus.close()
+    assert bus._notify is None and pi._pipe is None
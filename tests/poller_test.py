@@ -0,0 +1,103 @@
+from time import monotonic, sleep
+from pigpio_dht import DHT22, DHTBus
+from pigpio_dht.poller import Poller
+from pigpio_dht.simulator import FakePi
+
+
+def wait_until(condition, timeout_secs=2.0):
+    deadline = monotonic() + timeout_secs
+    while not condition():
+        assert monotonic() < deadline, "Timed out waiting for the poller."
+        sleep(0.005)
+
+
+def test_get_latest_max_age(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=0.02, temp_c=22.5, humidity=50.0)
+    assert dht.get_latest() is None
+
+    dht.read()
+    assert dht.get_latest(max_age=60) == {'temp_c': 22.5, 'temp_f': 72.5, 'humidity': 50.0, 'valid': True}
+
+    dht.latest_reading.at -= 10 # Make the reading 10 seconds old.
+    assert dht.get_latest(max_age=5) is None
+    assert dht.get_latest()['temp_c'] == 22.5
+
+
+def test_start_and_stop_polling(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=0.02, temp_c=22.5, humidity=50.0)
+
+    dht.start_polling()
+    wait_until(lambda: dht.get_latest(max_age=1) is not None)
+    assert dht.get_latest()['temp_c'] == 22.5
+
+    simulated.temp_c = 23.0
+    wait_until(lambda: dht.get_latest()['temp_c'] == 23.0)
+
+    poller = dht._poller
+    dht.stop_polling()
+    assert dht._poller is None and not poller.running
+
+    reads = dht.metrics.reads
+    sleep(0.1)
+    assert dht.metrics.reads == reads
+
+
+def test_stop_is_not_held_up_by_the_read_throttle(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=10)
+    poller = Poller(dht)
+    poller.start()
+    wait_until(lambda: dht.get_latest() is not None)
+
+    started = monotonic()
+    poller.stop(timeout_secs=2)
+    assert monotonic() - started < 1
+    assert not poller.running
+    assert dht.metrics.reads == 1
+
+
+def test_poller_counts_errors(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=0.02, responding=False)
+    dht.timeout_secs = 0.02
+    dht.circuit_breaker = None
+    poller = Poller(dht)
+
+    poller.start()
+    wait_until(lambda: poller.errors >= 2)
+    poller.stop()
+
+    assert poller.get_latest() is None
+
+
+def test_on_update_and_samples(make_sensor):
+    dht, simulated = make_sensor(max_read_rate_secs=0.02, temp_c=22.5, humidity=50.0)
+    results = []
+    poller = Poller(dht, samples=3, on_update=results.append)
+
+    poller.start()
+    wait_until(lambda: len(results) >= 2)
+    simulated.responding = False
+    dht.timeout_secs = 0.02
+    dht.circuit_breaker = None
+    wait_until(lambda: poller.errors >= 1)
+    poller.stop()
+
+    assert results[0] == {'temp_c': 22.5, 'temp_f': 72.5, 'humidity': 50.0, 'valid': True}
+    assert dht.metrics.reads >= 6 # sample() reads 3 times per update.
+    assert isinstance(results[-1], TimeoutError)
+
+
+def test_bus_polling():
+    pi = FakePi(seed=1)
+    bus = DHTBus(pi=pi)
+    for gpio in (4, 21):
+        pi.add_sensor(gpio, temp_c=gpio, humidity=40.0)
+        bus.add(DHT22, gpio, max_read_rate_secs=0.02)
+
+    poller = Poller(bus)
+    poller.start()
+    poller.start() # Already running.
+    wait_until(lambda: None not in poller.get_latest(max_age=1).values())
+    poller.stop()
+
+    assert poller.get_latest() == {4: {'temp_c': 4.0, 'temp_f': 39.2, 'humidity': 40.0, 'valid': True},
+                                   21: {'temp_c': 21.0, 'temp_f': 69.8, 'humidity': 40.0, 'valid': True}}
@@ -0,0 +1,48 @@
+import pytest
+from time import monotonic
+from pigpio_dht import DHT11, DHT22
+from pigpio_dht.ratelimit import RateLimiter
+from pigpio_dht.simulator import FakePi
+
+GPIO = 21
+
+
+def test_reserve_gives_successive_slots():
+    limiter = RateLimiter()
+
+    assert limiter.reserve(2) == 0
+    assert limiter.reserve(2) == pytest.approx(2, abs=0.05)
+    assert limiter.reserve(2) == pytest.approx(4, abs=0.05)
+
+
+def test_sensors_on_same_gpio_share_limiter():
+    pi = FakePi()
+    pi.add_sensor(GPIO)
+    first = DHT22(gpio=GPIO, pi=pi)
+    second = DHT22(gpio=GPIO, pi=pi)
+    other_pi = DHT22(gpio=GPIO, pi=FakePi())
+
+    first.read()
+
+    assert second._rate_limiter is first._rate_limiter
+    assert other_pi._rate_limiter is not first._rate_limiter
+    assert second.next_available_at() == pytest.approx(monotonic() + 2, abs=0.1)
+    assert other_pi.next_available_at() <= monotonic()
+
+
+def test_read_budget_stops_retrying(make_sensor):
+    dht, simulated = make_sensor(DHT11, max_read_rate_secs=0.1, flip_rate=1.0)
+
+    started = monotonic()
+    result = dht.read(budget_secs=0.35)
+
+    assert result['valid'] == False
+    assert simulated.reads >= 3
+    assert monotonic() - started < 0.6
+
+
+def test_sample_budget_raises(make_sensor):
+    dht, simulated = make_sensor(DHT11, max_read_rate_secs=0.1, flip_rate=1.0)
+
+    with pytest.raises(TimeoutError, match="Time budget"):
+        dht.sample(samples=3, budget_secs=0.35)
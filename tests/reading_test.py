@@ -0,0 +1,61 @@
+import pytest
+from pigpio_dht import Reading, ReadingHistory
+from pigpio_dht.simulator import encode
+
+GPIO = 21
+
+
+def test_reading_decodes_lazily():
+    reading = Reading(encode(-3.5, 61.2), GPIO, 100.0, 2)
+
+    assert reading.valid
+    assert reading._values is None
+    assert reading.temp_c == -3.5
+    assert reading.humidity == 61.2
+    assert reading.as_dict() == {'temp_c': -3.5, 'temp_f': 25.7, 'humidity': 61.2, 'valid': True}
+
+    with pytest.raises(AttributeError):
+        reading.extra = 1 # __slots__
+
+
+def test_read_raw(make_sensor):
+    dht, simulated = make_sensor(temp_c=22.5, humidity=50.0)
+    dht.history = ReadingHistory(capacity=10)
+
+    reading = dht.read_raw()
+
+    assert isinstance(reading, Reading)
+    assert reading.gpio == GPIO
+    assert reading.raw == encode(22.5, 50.0)
+    assert dht.latest_reading is reading
+    assert dht.get_latest() == {'temp_c': 22.5, 'temp_f': 72.5, 'humidity': 50.0, 'valid': True}
+    assert dht.read()['valid']
+    assert len(dht.history) == 2
+
+
+def test_history_window_queries():
+    history = ReadingHistory(capacity=4)
+
+    for at, temp_c in enumerate([10.0, 20.0, 30.0, 40.0, 50.0, 60.0]):
+        history.append(Reading(encode(temp_c, 40.0), GPIO, float(at), 2))
+
+    assert len(history) == 4
+    assert history.values('temp_c') == [30.0, 40.0, 50.0, 60.0]
+    assert history.min('temp_c', secs=1.5, now=5.0) == 50.0
+    assert history.max('temp_c', secs=1.5, now=5.0) == 60.0
+    assert history.mean('humidity') == pytest.approx(40.0)
+    assert history.mean('temp_c', secs=0.5, now=10.0) is None
+
+    assert not history.append(Reading(bytes(4) + b'\x01', GPIO, 6.0, 2))
+    with pytest.raises(ValueError):
+        history.values('temp_f')
+
+
+def test_history_values_exact():
+    history = ReadingHistory(capacity=4)
+    history.append(Reading(encode(21.7, 45.3), GPIO, 1.0, 2))
+    history.append(Reading(encode(21.9, 45.1), GPIO, 2.0, 2))
+
+    assert history.values('humidity') == [45.3, 45.1]
+    assert history.max('temp_c') == 21.9
+    assert history.min('humidity') == 45.1
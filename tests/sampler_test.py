@@ -0,0 +1,41 @@
+import pytest
+from pigpio_dht import Sampler
+from pigpio_dht.sampler import median, mad_trimmed_mean, trimmed_mode
+
+
+def test_aggregators():
+    values = [20.0, 20.1, 20.0, 35.0, 20.2]
+
+    assert median(values) == 20.1
+    assert mad_trimmed_mean(values) == pytest.approx(20.075)
+    assert trimmed_mode(values) == 20.0
+    assert mad_trimmed_mean([20.0, 20.0, 20.0, 25.0]) == 20.0
+
+
+def test_done():
+    sampler = Sampler(tolerance=0.1, min_samples=3, max_samples=6)
+
+    assert not sampler.done([20.0, 20.0], [40.0, 40.0])
+    assert sampler.done([20.0, 20.0, 20.0], [40.0, 40.0, 40.0])
+    assert not sampler.done([20.0, 21.0, 22.0], [40.0, 40.0, 40.0])
+    assert sampler.done([20.0, 21.0, 22.0, 23.0, 24.0, 25.0], [40.0] * 6)
+    assert not Sampler(tolerance=None, min_samples=3, max_samples=6).done([20.0] * 5, [40.0] * 5)
+
+
+def test_invalid_sampler():
+    with pytest.raises(ValueError):
+        Sampler(aggregator='mean')
+    with pytest.raises(ValueError):
+        Sampler(min_samples=5, max_samples=3)
+
+
+def test_sample_stops_early(make_sensor):
+    dht, simulated = make_sensor(temp_c=22.4, humidity=51.0)
+
+    result = dht.sample(sampler=Sampler(aggregator='median', min_samples=3, max_samples=10))
+
+    assert result == {'temp_c': 22.4, 'temp_f': 72.3, 'humidity': 51.0, 'valid': True}
+    assert simulated.reads == 3
+
+    dht.sample(samples=4)
+    assert simulated.reads == 7
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+import pigpio_dht
+from pigpio_dht import DHT22
+from pigpio_dht.shared import SharedState
+from pigpio_dht.simulator import FakePi
+
+GPIO = 21
+
+
+def make_sensor(pi, directory):
+    dht = DHT22(gpio=GPIO, pi=pi)
+    dht.shared = SharedState(GPIO, pi, directory=str(directory))
+    return dht
+
+
+def test_cached_reading_shared(tmp_path):
+    pi = FakePi()
+    simulated = pi.add_sensor(GPIO, temp_c=23.1, humidity=48.0)
+    first = make_sensor(pi, tmp_path)
+    second = make_sensor(pi, tmp_path) # As if in another process.
+
+    assert first.read()['valid']
+    assert simulated.reads == 1
+
+    assert second.read(max_age=10) == {'temp_c': 23.1, 'temp_f': 73.6, 'humidity': 48.0, 'valid': True}
+    assert simulated.reads == 1
+    assert second._throttle_secs() > 1 # The other process read the GPIO moments ago.
+
+
+def test_state_visible_to_other_processes(tmp_path):
+    pi = FakePi()
+    pi.add_sensor(GPIO, temp_c=-4.2, humidity=81.5)
+    dht = DHT22(gpio=GPIO, pi=pi)
+    dht.shared = SharedState(GPIO, directory=str(tmp_path)) # Not keyed by pi, to match the other process.
+    dht.read()
+
+    code = ("import sys; from pigpio_dht.shared import SharedState; "
+            "state = SharedState(int(sys.argv[1]), directory=sys.argv[2]); "
+            "print(state.latest(max_age=60).temp_c)")
+    lib = os.path.dirname(os.path.dirname(os.path.abspath(pigpio_dht.__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(path for path in (lib, env.get('PYTHONPATH')) if path)
+    output = subprocess.check_output([sys.executable, '-c', code, str(GPIO), str(tmp_path)], env=env)
+
+    assert output.decode().strip() == '-4.2'
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from pigpio_dht import DHT11, DHT22, DHTBus, AsyncDHT
+from pigpio_dht.simulator import FakePi
+
+
+def test_simulated_dht22_read(make_sensor):
+    dht, simulated = make_sensor(DHT22, temp_c=-10.1, humidity=65.8)
+
+    result = dht.read()
+
+    assert result == {'temp_c': -10.1, 'temp_f': 13.8, 'humidity': 65.8, 'valid': True}
+    assert simulated.reads == 1
+    assert dht._capture.edge_count == DHT22.SUCCESS_EDGE_COUNT
+
+
+def test_simulated_dht11_read(make_sensor):
+    dht, simulated = make_sensor(DHT11, temp_c=20, humidity=35)
+
+    for _ in range(20):
+        assert dht.read() == {'temp_c': 20, 'temp_f': 68.0, 'humidity': 35, 'valid': True}
+
+
+def test_simulated_flipped_bits_fail_checksum(make_sensor):
+    dht, simulated = make_sensor(DHT22, flip_rate=1.0)
+
+    result = dht.read()
+
+    assert result['valid'] == False
+
+
+def test_simulated_dropped_edge_is_invalid_response(make_sensor):
+    dht, simulated = make_sensor(DHT22, drop_rate=0.05)
+
+    with pytest.raises(TimeoutError, match="response was invalid"):
+        for _ in range(10):
+            dht.read()
+
+
+def test_simulated_not_responding(make_sensor):
+    dht, simulated = make_sensor(DHT22, responding=False)
+    dht.timeout_secs = 0.05
+
+    with pytest.raises(TimeoutError, match="has not responded"):
+        dht.read()
+
+
+def test_simulated_sample_and_stream(make_sensor):
+    dht, simulated = make_sensor(DHT22, temp_c=22.5, humidity=50.0)
+
+    assert dht.sample(samples=3) == {'temp_c': 22.5, 'temp_f': 72.5, 'humidity': 50.0, 'valid': True}
+
+    stream = dht.stream(window=3)
+    assert next(stream)['temp_c'] == 22.5
+    simulated.temp_c = 23.0
+    assert 22.5 < next(stream)['temp_c'] <= 23.0
+
+
+def test_simulated_bus_sweep():
+    pi = FakePi()
+    bus = DHTBus(pi=pi)
+
+    for gpio in range(2, 28):
+        pi.add_sensor(gpio, temp_c=gpio, humidity=40, datum_byte_count=2)
+        bus.add(DHT22, gpio)
+    pi.sensors[27].responding = False
+    bus.sensors[27].timeout_secs = 0.05
+
+    results = bus.sweep()
+
+    assert results[2] == {'temp_c': 2.0, 'temp_f': 35.6, 'humidity': 40.0, 'valid': True}
+    assert results[26]['temp_c'] == 26.0
+    assert isinstance(results[27], TimeoutError)
+    assert bus.get_latest()[26]['temp_c'] == 26.0
+    assert bus.get_latest()[27] is None
+
+
+def test_simulated_async_read(make_sensor):
+    dht, simulated = make_sensor(DHT22, temp_c=19.5, humidity=45.0)
+    sensor = AsyncDHT(dht)
+
+    async def main():
+        first = await sensor.read()
+        sampled = await sensor.sample(samples=2)
+        return first, sampled
+
+    first, sampled = asyncio.new_event_loop().run_until_complete(main())
+
+    assert first['temp_c'] == 19.5
+    assert sampled['humidity'] == 45.0
+
+
+def test_simulated_read_deadline_uses_cache(make_sensor):
+    dht, simulated = make_sensor(DHT22, temp_c=18.0)
+    dht.read()
+
+    simulated.responding = False
+    dht.timeout_secs = 5
+
+    result = dht.read(deadline=0.05)
+    assert result['temp_c'] == 18.0 and result['cached'] and result['age_secs'] >= 0
+    assert dht.get_latest(max_age=60) == {'temp_c': 18.0, 'temp_f': 64.4, 'humidity': 40.0, 'valid': True} # Not modified.
+
+
+def test_simulated_read_deadline_ignores_old_cache(make_sensor):
+    dht, simulated = make_sensor(DHT22, temp_c=18.0)
+    dht.read()
+    dht.latest_reading.at -= 120 # Older than deadline_max_age.
+
+    simulated.responding = False
+    dht.timeout_secs = 0.05
+
+    with pytest.raises(TimeoutError):
+        dht.read(deadline=0.01)
@@ -0,0 +1,36 @@
+import pytest
+import statistics
+from pigpio_dht.stats import RollingStats
+
+def test_rolling_mean_and_stdev_match_window():
+    values = [20.1, 20.3, 19.8, 25.0, 20.2, 20.0, 20.4, 19.9]
+    stats = RollingStats(window=4)
+
+    for i, x in enumerate(values):
+        stats.push(x)
+        window = values[max(0, i - 3):i + 1]
+        assert len(stats) == len(window)
+        assert stats.mean == pytest.approx(statistics.mean(window))
+        if len(window) >= 2:
+            assert stats.stdev == pytest.approx(statistics.stdev(window))
+
+
+def test_rolling_trimmed_mean_clips_outlier():
+    stats = RollingStats(window=5)
+
+    for x in [20, 21, 20, 21]:
+        stats.push(x)
+
+    trimmed = stats.push(40)
+
+    assert trimmed < 22
+    assert stats.mean > 23
+
+
+def test_rolling_constant_values():
+    stats = RollingStats(window=3)
+
+    for _ in range(10):
+        assert stats.push(35) == 35
+
+    assert stats.stdev == 0
@@ -0,0 +1,116 @@
+import os
+import pytest
+from pigpio_dht import TimeSeriesLog
+from pigpio_dht.reading import Reading
+from pigpio_dht.simulator import encode
+
+GPIO = 21
+START = 1599999960.0 # A time() on a 60 second rollup period boundary.
+
+
+def reading(temp_c, humidity, gpio=GPIO, valid=True):
+    raw = bytearray(encode(temp_c, humidity))
+    if not valid:
+        raw[4] ^= 0xFF
+    return Reading(bytes(raw), gpio, 0.0, 2)
+
+
+def test_batches_are_written_together(tmp_path):
+    path = str(tmp_path / 'dht.tsl')
+    log = TimeSeriesLog(path, capacity=100, rollup_capacity=10, rollup_secs=60, batch_size=3)
+    size = os.path.getsize(path)
+
+    log.append(reading(20.0, 40.0), at=START)
+    log.append(reading(21.0, 41.0), at=START + 2)
+    assert TimeSeriesLog(path, readonly=True)._header()[6] == 0 # Still buffered.
+    assert [r.time for r in log.records()] == [START, START + 2] # But visible to the writer.
+
+    log.append(reading(22.0, 42.0), at=START + 4)
+    reader = TimeSeriesLog(path, readonly=True)
+    assert [r.reading().temp_c for r in reader.records()] == [20.0, 21.0, 22.0]
+    assert os.path.getsize(path) == size # Preallocated.
+
+    log.close()
+    reader.close()
+
+
+def test_ring_wraps_and_range_queries(tmp_path):
+    log = TimeSeriesLog(str(tmp_path / 'dht.tsl'), capacity=10, rollup_capacity=10, rollup_secs=60, batch_size=4)
+
+    for i in range(25):
+        log.append(reading(20.0 + i / 10, 40.0, gpio=4 if i % 2 else GPIO), at=START + i)
+    log.flush()
+
+    assert [r.time - START for r in log.records()] == list(range(15, 25))
+    assert [r.time - START for r in log.records(start=START + 18, end=START + 21)] == [18, 19, 20, 21]
+    assert [r.time - START for r in log.records(start=START + 18, gpio=4)] == [19, 21, 23]
+    log.close()
+
+
+def test_rollups(tmp_path):
+    path = str(tmp_path / 'dht.tsl')
+    log = TimeSeriesLog(path, capacity=100, rollup_capacity=10, rollup_secs=60, batch_size=100)
+
+    log.append(reading(20.0, 40.0), at=START)
+    log.append(reading(99.0, 99.0, valid=False), at=START + 1) # Stored, but not rolled up.
+    log.append(reading(22.0, 50.0), at=START + 30)
+    log.append(reading(18.0, 45.0, gpio=4), at=START + 40)
+    log.append(reading(25.0, 60.0), at=START + 60) # Starts the next period.
+
+    rollups = list(log.rollups())
+    assert [(r.start, r.gpio, r.count) for r in rollups] == [(START, 4, 1), (START, GPIO, 2)]
+    assert (rollups[1].temp_c_min, rollups[1].temp_c_mean, rollups[1].temp_c_max) == (20.0, 21.0, 22.0)
+    assert (rollups[1].humidity_min, rollups[1].humidity_mean, rollups[1].humidity_max) == (40.0, 45.0, 50.0)
+    assert not list(log.records())[1].valid
+
+    log.close()
+
+    # The period in progress is rebuilt from stored readings on reopening.
+    log = TimeSeriesLog(path, capacity=100, rollup_capacity=10, rollup_secs=60, batch_size=100)
+    log.append(reading(27.0, 60.0), at=START + 120)
+    rollups = list(log.rollups(start=START + 60))
+    assert [(r.start, r.gpio, r.count, r.temp_c_mean) for r in rollups] == [(START + 60, GPIO, 1, 25.0)]
+    assert len(list(log.rollups())) == 3
+    log.close()
+
+
+def test_reopen_with_different_sizes(tmp_path):
+    path = str(tmp_path / 'dht.tsl')
+    TimeSeriesLog(path, capacity=10, rollup_capacity=10).close()
+
+    with pytest.raises(ValueError):
+        TimeSeriesLog(path, capacity=20, rollup_capacity=10)
+
+    with open(str(tmp_path / 'other'), 'wb') as f:
+        f.write(b'x' * 100)
+    with pytest.raises(ValueError):
+        TimeSeriesLog(str(tmp_path / 'other'))
+
+
+def test_fractional_rollup_secs(tmp_path):
+    path = str(tmp_path / 'dht.tsl')
+    TimeSeriesLog(path, capacity=10, rollup_capacity=10, rollup_secs=2.5).close()
+
+    log = TimeSeriesLog(path, capacity=10, rollup_capacity=10, rollup_secs=2.5) # Stored exactly, so the sizes match.
+    assert log.rollup_secs == 2.5
+    log.close()
+
+    with pytest.raises(ValueError):
+        TimeSeriesLog(path, capacity=10, rollup_capacity=10, rollup_secs=2)
+
+    with pytest.raises(ValueError):
+        TimeSeriesLog(str(tmp_path / 'zero.tsl'), rollup_secs=0)
+    assert not os.path.exists(str(tmp_path / 'zero.tsl'))
+
+
+def test_sensor_writes_readings(tmp_path, make_sensor):
+    sensor, simulated = make_sensor(temp_c=21.5, humidity=45.0)
+    sensor.timeseries = TimeSeriesLog(str(tmp_path / 'dht.tsl'), capacity=10, rollup_capacity=10)
+
+    sensor.read()
+    sensor.read()
+
+    records = list(sensor.timeseries.records(gpio=GPIO))
+    assert len(records) == 2
+    assert records[0].reading().as_dict() == {'temp_c': 21.5, 'temp_f': 70.7, 'humidity': 45.0, 'valid': True}
+    sensor.timeseries.close()
@@ -0,0 +1,48 @@
+import pytest
+from pigpio_dht import DHT22
+from pigpio_dht.simulator import FakePi
+from pigpio_dht.trace import TraceRecorder, TraceReader, ReplayedSensor, FLAG_VALID
+
+GPIO = 21
+
+
+def test_record_and_replay(tmpdir, make_sensor):
+    path = str(tmpdir.join('dht.trace'))
+
+    dht, simulated = make_sensor(seed=3, temp_c=21.4, humidity=48.2)
+    dht.recorder = TraceRecorder(path)
+
+    dht.read()
+    simulated.flip_rate = 1.0
+    dht.read()
+    simulated.flip_rate = 0
+    simulated.drop_rate = 0.2
+    with pytest.raises(TimeoutError):
+        dht.read()
+    dht.recorder.close()
+
+    reader = TraceReader(path)
+    assert len(reader) == 3
+
+    first = reader[0]
+    assert first.gpio == GPIO
+    assert first.flags & FLAG_VALID
+    assert first.temp_c == pytest.approx(21.4)
+    assert len(first.ticks) == DHT22.SUCCESS_EDGE_COUNT
+    assert not reader[1].flags & FLAG_VALID
+
+    decoded = [result for record, result in reader.replay(datum_byte_count=2)]
+    assert decoded[0]['temp_c'] == 21.4
+    assert decoded[0]['raw'] == first.raw
+    assert decoded[1]['valid'] == False
+    assert decoded[2]['valid'] == False
+
+    # Feed the recording back through a sensor.
+    replay_pi = FakePi()
+    replay_pi.attach(GPIO, ReplayedSensor(reader))
+    replay = DHT22(gpio=GPIO, pi=replay_pi, max_read_rate_secs=0)
+
+    assert replay.read()['humidity'] == 48.2
+    assert replay.read()['valid'] == False
+
+    reader.close()
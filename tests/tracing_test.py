@@ -0,0 +1,45 @@
+from pigpio_dht import tracing
+
+GPIO = 21
+
+
+def test_untraced_read_binds_lean_callback(make_sensor):
+    dht, simulated = make_sensor(temp_c=21.5, humidity=45.0)
+    assert tracing.get_tracer() is None
+
+    result = dht.read()
+
+    assert result['valid']
+    assert dht._capture.tracer is None
+
+
+def test_ring_tracer_records_edges(make_sensor):
+    dht, simulated = make_sensor(temp_c=21.5, humidity=45.0)
+    tracer = tracing.RingTracer(capacity=128)
+    previous = tracing.set_tracer(tracer)
+
+    try:
+        result = dht.read()
+    finally:
+        tracing.set_tracer(previous)
+
+    assert result['valid']
+    events = tracer.events()
+    assert len(events) == 86
+    assert [event.index for event in events] == list(range(86))
+    assert all(event.gpio == GPIO for event in events)
+
+    bits = [event.bit for event in events if event.bit != tracing.NO_BIT]
+    assert bits == dht.data
+    assert all(event.delta >= 70 for event in events if event.bit == 1)
+
+
+def test_ring_tracer_wraps():
+    tracer = tracing.RingTracer(capacity=4)
+
+    for index in range(6):
+        tracer.edge(GPIO, index, index % 2, 50, tracing.NO_BIT)
+
+    assert [event.index for event in tracer.events()] == [2, 3, 4, 5]
+    tracer.clear()
+    assert tracer.events() == []
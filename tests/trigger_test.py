@@ -0,0 +1,64 @@
+import asyncio
+from pigpio_dht import DHT22, DHTBus
+from pigpio_dht.aio import AsyncDHT
+from pigpio_dht.simulator import FakePi
+from pigpio_dht.trigger import ScriptTrigger, script_text
+
+
+def test_script_text():
+    assert script_text([21]) == 'w 21 0 mils 18 m 21 r'
+    assert script_text([4, 17], 20) == 'w 4 0 w 17 0 mils 20 m 4 r m 17 r'
+
+
+def test_sensor_with_trigger(make_sensor):
+    sensor, simulated = make_sensor(temp_c=21.5, humidity=45.0)
+    sensor.trigger = ScriptTrigger.for_pi(sensor._pi)
+
+    for i in range(2):
+        result = sensor.read(retries=0)
+        assert result['valid']
+        assert result['temp_c'] == 21.5
+        assert result['humidity'] == 45.0
+
+    assert len(sensor._pi.scripts) == 1 # Stored once, then reused.
+
+
+def test_async_sensor_with_trigger(make_sensor):
+    dht, simulated = make_sensor(temp_c=19.0, humidity=50.0)
+    sensor = AsyncDHT(dht)
+    dht.trigger = ScriptTrigger.for_pi(dht._pi)
+
+    result = asyncio.new_event_loop().run_until_complete(sensor.read(retries=0))
+    assert result['valid']
+    assert result['temp_c'] == 19.0
+
+
+def test_bus_one_script_for_all_sensors():
+    pi = FakePi(seed=1)
+    gpios = [4, 17, 27]
+    for gpio in gpios:
+        pi.add_sensor(gpio, temp_c=gpio, humidity=40.0)
+
+    bus = DHTBus(pi=pi)
+    for gpio in gpios:
+        bus.add(DHT22, gpio)
+    bus.trigger = ScriptTrigger.for_pi(pi)
+
+    results = bus.sweep()
+    assert [results[gpio]['temp_c'] for gpio in gpios] == [4, 17, 27]
+    assert list(pi.scripts.values()) == [script_text(gpios)]
+
+
+def test_least_recently_used_scripts_deleted():
+    pi = FakePi()
+    trigger = ScriptTrigger(pi)
+    trigger.MAX_SCRIPTS = 2
+
+    trigger.fire([1])
+    trigger.fire([2])
+    trigger.fire([1])
+    trigger.fire([3]) # Evicts [2]
+    assert sorted(pi.scripts.values()) == [script_text([1]), script_text([3])]
+
+    trigger.close()
+    assert pi.scripts == {}